@@ -1,6 +1,56 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
 
-from .models import UserProfile
+from superlists.deletion import delete_accounts, delete_users
+from .models import QueuedEmail, UserProfile
 
 
-admin.site.register(UserProfile)
+class AccountDeletionMixin(object):
+    """
+    Replaces deleting of users or profiles, which would collect and delete
+    every list and task of theirs row by row, by ``delete_accounts``
+    action: lists are only marked deleted and left to ``purge_lists``
+    command.
+    """
+
+    def get_actions(self, request):
+        actions = super(AccountDeletionMixin, self).get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def has_delete_permission(self, request, obj=None):
+        # The delete view collects and shows every list and task as well
+        return False
+
+    def delete_accounts(self, request, queryset):
+        request.performance_budget = "delete_accounts"
+        todo_list_ids = self.delete_queryset_accounts(queryset)
+        self.message_user(request, "Accounts deleted, %d lists will be purged." % len(todo_list_ids))
+    delete_accounts.short_description = "Delete selected accounts with their lists"
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(AccountDeletionMixin, admin.ModelAdmin):
+    """
+    Profiles are deleted with their users by ``delete_accounts`` action.
+    """
+    actions = ("delete_accounts",)
+
+    def delete_queryset_accounts(self, queryset):
+        return delete_accounts(queryset, using=queryset.db)
+
+
+class AccountUserAdmin(AccountDeletionMixin, UserAdmin):
+    """
+    Users are deleted with their profiles by ``delete_accounts`` action.
+    """
+    actions = ("delete_accounts",)
+
+    def delete_queryset_accounts(self, queryset):
+        return delete_users(queryset, using=queryset.db)
+
+
+admin.site.unregister(User)
+admin.site.register(User, AccountUserAdmin)
+admin.site.register(QueuedEmail)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+from .models import UserProfile
+
+
+def user_profile_key(user_id):
+    return "accounts:user:%d:profile" % int(user_id)
+
+
+def get_user_profile(user):
+    """
+    Returns :model:`accounts.UserProfile` of ``user``, cached for
+    ``ACCOUNTS_USER_PROFILE_CACHE_TIMEOUT`` seconds.
+    Raises UserProfile.DoesNotExist if the user has no profile.
+    """
+    key = user_profile_key(user.pk)
+    user_profile = cache.get(key)
+    if user_profile is None:
+        # Read from the primary, a replica could cache an outdated profile
+        using = router.db_for_write(UserProfile)
+        user_profile = UserProfile.objects.using(using).get(user_id=user.pk)
+        cache.set(key, user_profile, settings.ACCOUNTS_USER_PROFILE_CACHE_TIMEOUT)
+    # Cached without the user, which is already loaded by the request
+    user_profile.user = user
+    return user_profile
+
+
+def invalidate_user_profile(user_id):
+    cache.delete(user_profile_key(user_id))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import UserProfile
+from superlists.deletion import delete_accounts, purge_list
+
+
+class Command(BaseCommand):
+    help = "Deletes user accounts and purges their to-do lists in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="+", help="Usernames of the deleted accounts.")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of tasks deleted in one transaction.",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Seconds to wait between batches, to spread the load on the database.",
+        )
+
+    def handle(self, *args, **options):
+        user_profiles = UserProfile.objects.filter(user__username__in=options["usernames"])
+        found = set(user_profiles.values_list("user__username", flat=True))
+        missing = set(options["usernames"]) - found
+        if missing:
+            raise CommandError("Unknown users: %s" % ", ".join(sorted(missing)))
+        todo_list_ids = delete_accounts(user_profiles)
+        items = 0
+        for todo_list_id in todo_list_ids:
+            items += purge_list(todo_list_id, options["batch_size"], options["sleep"])
+        self.stdout.write("Deleted %d accounts, purged %d lists with %d tasks." % (
+            len(found), len(todo_list_ids), items))
@@ -0,0 +1,32 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Deletes expired database sessions in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of sessions deleted by one query.",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Seconds to wait between batches, to spread the load on the database.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while True:
+            keys = list(expired.values_list("session_key", flat=True)[:options["batch_size"]])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write("Deleted %d expired sessions." % deleted)
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Sends emails waiting in the queue in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.EMAIL_QUEUE_BATCH_SIZE,
+            help="Number of emails sent over one connection.",
+        )
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep polling the queue instead of exiting once it is empty.",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5,
+            help="Seconds to wait between polls when the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(options["batch_size"])
+            if sent or failed:
+                self.stdout.write("Sent %d, failed %d" % (sent, failed))
+            elif not options["loop"]:
+                return
+            else:
+                time.sleep(options["interval"])
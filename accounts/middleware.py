@@ -0,0 +1,50 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_user_profile
+from .models import UserProfile
+
+
+def attach_user_profile(user):
+    """
+    Sets ``user_profile`` attribute of ``user`` to its lazily fetched
+    :model:`accounts.UserProfile`, or None for anonymous users.
+    """
+    if user.is_authenticated():
+        user.user_profile = SimpleLazyObject(lambda: get_user_profile(user))
+    else:
+        user.user_profile = None
+    return user
+
+
+def get_user_profile_or_none(user):
+    """
+    Returns ``user_profile`` of ``user`` set by :class:`UserProfileMiddleware`,
+    or None for anonymous users and users without a profile, such as
+    superusers created by ``manage.py createsuperuser``.
+    """
+    user_profile = user.user_profile
+    if user_profile is None:
+        return None
+    try:
+        # Evaluates the lazy profile, a missing one raises here
+        user_profile.pk
+    except UserProfile.DoesNotExist:
+        return None
+    return user_profile
+
+
+class UserProfileMiddleware(object):
+    """
+    Makes :model:`accounts.UserProfile` of the logged in user available as
+    ``request.user.user_profile``. Neither the user nor the profile is
+    fetched until used; the profile comes from cache when possible.
+    Must be placed after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = request.user
+        request.user = SimpleLazyObject(lambda: attach_user_profile(user))
+        return self.get_response(request)
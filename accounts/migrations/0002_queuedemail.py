@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 13:48
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Subject')),
+                ('body', models.TextField(verbose_name='Body')),
+                ('to', models.EmailField(max_length=254, verbose_name='Recipient')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', help_text='delivery status', max_length=8, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='number of failed delivery attempts', verbose_name='Attempts')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, help_text='email is not sent before this time', verbose_name='Next attempt')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last error')),
+                ('creation_date', models.DateTimeField(auto_now_add=True, verbose_name='Creation date')),
+                ('sent_date', models.DateTimeField(blank=True, null=True, verbose_name='Sent date')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='queuedemail',
+            index=models.Index(fields=['status', 'next_attempt'], name='queuedemail_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:02
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0002_queuedemail'),
+    ]
+
+    # Help texts and verbose names only, nothing changes in the database
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='userprofile',
+                    name='confirmation_code',
+                    field=models.CharField(blank=True, help_text='used in account confirmation process', max_length=32, verbose_name='Confirmation code'),
+                ),
+                migrations.AlterField(
+                    model_name='userprofile',
+                    name='user',
+                    field=models.OneToOneField(help_text='user owning the profile', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
@@ -1,7 +1,11 @@
+from datetime import timedelta
+
 from django.db import models
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.mail import EmailMessage
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -26,18 +30,25 @@ class UserProfile(models.Model):
         """Returns URL associated with UserProfile"""
         return reverse("user", kwargs={"user_id": self.user.pk})
 
-    def send_confirmation_code(self):
+    def get_confirmation_email(self):
+        """
+        Builds subject and body of email with confirmation code.
+        """
+        return ("Superlists - Email Verification",
+                "Please confirm your registration by clicking this link: "
+                + "http://"
+                + settings.ALLOWED_HOSTS[0]
+                + reverse("register_confirm", kwargs={
+                    "user_profile_id": self.id,
+                    "code": self.confirmation_code}))
+
+    def queue_confirmation_code(self):
         """
-        Builds and sends email with confirmation code to user.
-        Uses associated User `email_user` method.
+        Puts email with confirmation code to user in :model:`accounts.QueuedEmail`.
+        The email is sent later by `send_queued_email` management command.
         """
-        self.user.email_user("Superlists - Email Verification",
-                             "Please confirm your registration by clicking this link: "
-                             + "http://"
-                             + settings.ALLOWED_HOSTS[0]
-                             + reverse("register_confirm", kwargs={
-                                 "user_profile_id": self.id,
-                                 "code": self.confirmation_code}))
+        subject, body = self.get_confirmation_email()
+        return QueuedEmail.objects.create(subject=subject, body=body, to=self.user.email)
 
     def activate_user(self):
         """
@@ -46,3 +57,90 @@ class UserProfile(models.Model):
         """
         self.user.is_active = True
         self.user.save()
+
+
+class QueuedEmail(models.Model):
+    """
+    Outgoing email waiting in the database to be sent by a worker.
+    """
+    QUEUED = "queued"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+
+    subject = models.CharField(
+        max_length=255,
+        verbose_name="Subject"
+    )
+    body = models.TextField(
+        verbose_name="Body"
+    )
+    to = models.EmailField(
+        verbose_name="Recipient"
+    )
+    status = models.CharField(
+        max_length=8,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name="Status",
+        help_text="delivery status"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Attempts",
+        help_text="number of failed delivery attempts"
+    )
+    next_attempt = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Next attempt",
+        help_text="email is not sent before this time"
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="Last error"
+    )
+    creation_date = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Creation date"
+    )
+    sent_date = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Sent date"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt"], name="queuedemail_pending_idx"),
+        ]
+
+    def __str__(self):
+        return "%s: %s (%s)" % (self.to, self.subject, self.status)
+
+    def to_message(self, connection=None):
+        """Returns :class:`EmailMessage` ready to be sent."""
+        return EmailMessage(self.subject, self.body, settings.DEFAULT_FROM_EMAIL, [self.to],
+                            connection=connection)
+
+    def mark_sent(self):
+        self.status = self.SENT
+        self.sent_date = timezone.now()
+        self.save(update_fields=["status", "sent_date"])
+
+    def mark_failed(self, error):
+        """
+        Schedules next delivery attempt with exponential backoff.
+        Gives up after `EMAIL_QUEUE_MAX_ATTEMPTS` attempts.
+        """
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            self.status = self.FAILED
+        else:
+            delay = settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.next_attempt = timezone.now() + timedelta(seconds=delay)
+        self.save(update_fields=["attempts", "last_error", "status", "next_attempt"])
@@ -0,0 +1,51 @@
+import logging
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+def send_queued_emails(batch_size=None):
+    """
+    Sends one batch of due :model:`accounts.QueuedEmail`\s over a single
+    connection to the mail server. Returns numbers of sent and failed emails.
+
+    Rows of the batch stay locked until it is done, so several workers
+    may run at once on databases supporting `SKIP LOCKED`.
+    """
+    batch_size = batch_size or settings.EMAIL_QUEUE_BATCH_SIZE
+    sent = failed = 0
+    with transaction.atomic():
+        queryset = QueuedEmail.objects.filter(status=QueuedEmail.QUEUED, next_attempt__lte=timezone.now())
+        skip_locked = db_connection.features.has_select_for_update_skip_locked
+        batch = list(queryset.select_for_update(skip_locked=skip_locked).order_by("next_attempt")[:batch_size])
+        if not batch:
+            return sent, failed
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as error:
+            logger.warning("Could not connect to the mail server: %s", error)
+            for email in batch:
+                email.mark_failed(error)
+            return sent, len(batch)
+        try:
+            for email in batch:
+                try:
+                    connection.send_messages([email.to_message(connection)])
+                except Exception as error:
+                    logger.warning("Sending email %d failed: %s", email.pk, error)
+                    email.mark_failed(error)
+                    failed += 1
+                else:
+                    email.mark_sent()
+                    sent += 1
+        finally:
+            connection.close()
+    return sent, failed
@@ -0,0 +1,87 @@
+"""
+Session engine reading sessions from the cache and writing them through
+to the database, enabled with ``SESSION_ENGINE = "accounts.sessions"``.
+
+Compared to ``django.contrib.sessions.backends.cached_db`` it skips saving
+sessions whose data did not change and counts database reads and writes
+it avoided, see :meth:`SessionStore.stats`.
+"""
+import collections
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.core.exceptions import SuspiciousOperation
+from django.utils import timezone
+
+
+class SessionStore(cached_db.SessionStore):
+    counters = collections.Counter()
+    lock = threading.Lock()
+
+    def __init__(self, session_key=None):
+        super(SessionStore, self).__init__(session_key)
+        self._loaded_data = None
+
+    @classmethod
+    def count(cls, name):
+        with cls.lock:
+            cls.counters[name] += 1
+
+    @classmethod
+    def stats(cls):
+        """
+        Returns counters of the worker process: ``cache_hits`` (database
+        reads avoided), ``db_reads``, ``db_writes`` and ``writes_skipped``.
+        """
+        with cls.lock:
+            return dict(cls.counters)
+
+    def serialize(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        # Same as cached_db.SessionStore.load, with a single cache lookup
+        # also telling hits from database reads
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends (e.g. memcache) raise an exception on invalid
+            # cache keys, the session is reset then
+            data = None
+        if data is not None:
+            self.count("cache_hits")
+        else:
+            self.count("db_reads")
+            data = self.load_from_db()
+        self._loaded_data = self.serialize(data)
+        return data
+
+    def load_from_db(self):
+        try:
+            session = self.model.objects.get(session_key=self.session_key, expire_date__gt=timezone.now())
+            data = self.decode(session.session_data)
+            self._cache.set(self.cache_key, data, self.get_expiry_age(expiry=session.expire_date))
+        except (self.model.DoesNotExist, SuspiciousOperation) as error:
+            if isinstance(error, SuspiciousOperation):
+                logging.getLogger("django.security.%s" % error.__class__.__name__).warning(str(error))
+            self._session_key = None
+            data = {}
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            # Saved with must_create set
+            return self.create()
+        # Unchanged data only needs saving to extend expiry on every request
+        unchanged = (
+            not must_create and not settings.SESSION_SAVE_EVERY_REQUEST and self._loaded_data is not None and
+            self._loaded_data == self.serialize(self._get_session(no_load=True))
+        )
+        if unchanged:
+            self.count("writes_skipped")
+            return
+        super(SessionStore, self).save(must_create)
+        self.count("db_writes")
+        self._loaded_data = self.serialize(self._session)
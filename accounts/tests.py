@@ -1,15 +1,27 @@
+from datetime import timedelta
+
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.crypto import get_random_string
+from io import StringIO
 from unittest.mock import patch
 from functools import partial
 from typing import Callable
 
+from superlists.models import ToDoList, ToDoListItem
 from superlists.tests import (
-    create_todo_list
+    create_todo_list,
+    create_todo_list_item,
 )
-from .models import UserProfile
+from .models import QueuedEmail, UserProfile
+from .sessions import SessionStore
 from .forms import RegisterForm
 
 
@@ -73,6 +85,45 @@ class UserProfileViewTest(TestCase):
         self.assertContains(response, "Test todo list")
 
 
+class UserProfileMiddlewareTest(TestCase):
+    """
+    Collection of tests for UserProfileMiddleware class.
+    """
+
+    def setUp(self):
+        self.user_profile = create_test_user_profile()
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+
+    def test_profile_is_cached(self):
+        """
+        Profile should be fetched from the database once and then from the cache.
+        """
+        url = reverse("user")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if "accounts_userprofile" in query["sql"]])
+
+    def test_saved_profile_is_invalidated(self):
+        """
+        Saving the profile should drop it from the cache.
+        """
+        self.client.get(reverse("user"))
+        self.user_profile.confirmation_code = "changed"
+        self.user_profile.save()
+        response = self.client.get(reverse("user"))
+        self.assertEqual(response.context["user"].user_profile.confirmation_code, "changed")
+
+    def test_anonymous_user(self):
+        """
+        Anonymous user should have no profile.
+        """
+        self.client.logout()
+        response = self.client.get(reverse("index"))
+        self.assertIsNone(response.context["user"].user_profile)
+
+
 class LoginViewTest(TestCase):
     """
     Collection of tests for user_login method.
@@ -215,8 +266,7 @@ class ConfirmViewTest(TestCase):
 
 class RegisterViewTest(TestCase):
 
-    @patch('django.contrib.auth.models.User.email_user')
-    def test_is_confirmation_code_in_sent_email(self, mock_email_user_method):
+    def register(self):
         form = {
             'username': TEST_USERNAME,
             'email': TEST_EMAIL,
@@ -224,8 +274,194 @@ class RegisterViewTest(TestCase):
             'confirm_password': TEST_PASSWORD
         }
         url = reverse('register')
-        self.client.post(url, form)
+        return self.client.post(url, form)
+
+    def test_is_confirmation_code_in_sent_email(self):
+        self.register()
+        call_command('send_queued_email', stdout=StringIO())
         created_profile = UserProfile.objects.get(user__username=TEST_USERNAME)
         confirmation_code = created_profile.confirmation_code
-        called_argument = mock_email_user_method.call_args_list[0][0][1]
-        self.assertTrue(confirmation_code in called_argument)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(confirmation_code in mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].to, [TEST_EMAIL])
+
+    def test_register_does_not_send_email_inline(self):
+        """
+        Registration should only queue the confirmation email.
+        """
+        response = self.register()
+        self.assertRedirects(response, reverse('register_success'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.QUEUED)
+
+
+class SendQueuedEmailTest(TestCase):
+    """
+    Collection of tests for send_queued_email management command.
+    """
+
+    def setUp(self):
+        self.user_profile = create_test_user_profile()
+
+    def test_batch_sent_over_one_connection(self):
+        """
+        All queued emails should be sent and marked as sent.
+        """
+        for i in range(3):
+            self.user_profile.queue_confirmation_code()
+        with patch('django.core.mail.backends.locmem.EmailBackend.open') as mock_open:
+            call_command('send_queued_email', stdout=StringIO())
+        self.assertEqual(mock_open.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.SENT).count(), 3)
+
+    @override_settings(EMAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_failed_email_is_retried_later(self):
+        """
+        Email which could not be sent should be postponed and given up eventually.
+        """
+        queued_email = self.user_profile.queue_confirmation_code()
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=OSError('Connection refused')):
+            call_command('send_queued_email', stdout=StringIO())
+            queued_email.refresh_from_db()
+            self.assertEqual(queued_email.status, QueuedEmail.QUEUED)
+            self.assertEqual(queued_email.attempts, 1)
+            self.assertGreater(queued_email.next_attempt, timezone.now())
+            QueuedEmail.objects.update(next_attempt=timezone.now())
+            call_command('send_queued_email', stdout=StringIO())
+        queued_email.refresh_from_db()
+        self.assertEqual(queued_email.status, QueuedEmail.FAILED)
+        self.assertEqual(queued_email.last_error, 'Connection refused')
+
+
+class SessionStoreTest(TestCase):
+    """
+    Collection of tests for accounts.sessions engine and purge_sessions command.
+    """
+
+    def setUp(self):
+        SessionStore.counters.clear()
+
+    def test_session_read_from_cache(self):
+        """
+        Session saved through the engine should be read back without a query.
+        """
+        session = SessionStore()
+        session["key"] = "value"
+        session.save()
+        session = SessionStore(session.session_key)
+        with self.assertNumQueries(0), patch.object(session._cache, "get", wraps=session._cache.get) as get:
+            self.assertEqual(session["key"], "value")
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(SessionStore.stats(), {"db_writes": 1, "cache_hits": 1})
+
+    def test_session_read_from_database_on_cache_miss(self):
+        """
+        Session missing from the cache should be read from the database and cached again.
+        """
+        session = SessionStore()
+        session["key"] = "value"
+        session.save()
+        session._cache.delete(session.cache_key)
+        self.assertEqual(SessionStore(session.session_key)["key"], "value")
+        self.assertEqual(SessionStore.stats()["db_reads"], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session.session_key)["key"], "value")
+
+    def test_unchanged_session_is_not_saved(self):
+        """
+        Session modified with the same data should not be written to the database.
+        """
+        session = SessionStore()
+        session["key"] = "value"
+        session.save()
+        session = SessionStore(session.session_key)
+        session["key"] = "value"
+        with self.assertNumQueries(0):
+            session.save()
+        session["key"] = "changed"
+        session.save()
+        self.assertEqual(SessionStore.stats()["writes_skipped"], 1)
+        self.assertEqual(SessionStore.stats()["db_writes"], 2)
+
+    @override_settings(SESSION_ENGINE="accounts.sessions")
+    def test_login(self):
+        """
+        Logged in user should be recognized with the session engine.
+        """
+        create_test_user_profile()
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+        response = self.client.get(reverse("user"))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(SessionStore.stats()["cache_hits"], 1)
+
+    def test_purge_sessions(self):
+        """
+        purge_sessions command should delete expired sessions only.
+        """
+        for number in range(3):
+            Session.objects.create(session_key="expired%d" % number, session_data="",
+                                   expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.create(session_key="active", session_data="", expire_date=timezone.now() + timedelta(days=1))
+        out = StringIO()
+        call_command("purge_sessions", batch_size=2, stdout=out)
+        self.assertIn("Deleted 3 expired sessions.", out.getvalue())
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["active"])
+
+
+class AccountDeletionTest(TestCase):
+    """
+    Collection of tests for purge_accounts command and UserProfile admin.
+    """
+
+    def setUp(self):
+        self.user_profile = create_test_user_profile()
+        self.todo_list = create_todo_list("Groceries", True, self.user_profile)
+        create_todo_list_item("Milk", False, self.todo_list)
+        self.other_list = create_todo_list("Chores", False)
+
+    def test_purge_accounts(self):
+        """
+        purge_accounts command should delete the user with their lists and tasks.
+        """
+        out = StringIO()
+        call_command("purge_accounts", TEST_USERNAME, batch_size=1, stdout=out)
+        self.assertIn("Deleted 1 accounts, purged 1 lists with 1 tasks.", out.getvalue())
+        self.assertFalse(User.objects.filter(username=TEST_USERNAME).exists())
+        self.assertEqual(list(ToDoList.all_objects.all()), [self.other_list])
+        self.assertFalse(ToDoListItem.objects.exists())
+
+    def test_admin_deletes_accounts_without_lists(self):
+        """
+        Admin should delete accounts at once and leave their lists to purge_lists.
+        """
+        User.objects.create_superuser("admin", "admin@test.test", "admin123")
+        self.client.login(username="admin", password="admin123")
+        url = reverse("admin:accounts_userprofile_changelist")
+        self.assertNotContains(self.client.get(url), 'value="delete_selected"')
+        self.client.post(url, {"action": "delete_accounts", "_selected_action": [self.user_profile.pk]})
+        self.assertFalse(User.objects.filter(username=TEST_USERNAME).exists())
+        self.assertFalse(ToDoList.objects.filter(pk=self.todo_list.pk).exists())
+        self.assertTrue(ToDoListItem.objects.exists())
+        call_command("purge_lists", stdout=StringIO())
+        self.assertFalse(ToDoListItem.objects.exists())
+        self.assertTrue(ToDoList.objects.filter(pk=self.other_list.pk).exists())
+
+    def test_user_admin_deletes_accounts(self):
+        """
+        User admin should delete accounts like the profile admin, users
+        without a profile included, and offer no delete view.
+        """
+        admin_user = User.objects.create_superuser("admin", "admin@test.test", "admin123")
+        other_admin = User.objects.create_superuser("other", "other@test.test", "admin123")
+        self.client.login(username="admin", password="admin123")
+        delete_url = reverse("admin:auth_user_delete", args=(other_admin.pk,))
+        self.assertEqual(self.client.get(delete_url).status_code, 403)
+        url = reverse("admin:auth_user_changelist")
+        self.assertNotContains(self.client.get(url), 'value="delete_selected"')
+        self.client.post(url, {"action": "delete_accounts",
+                               "_selected_action": [self.user_profile.user_id, other_admin.pk]})
+        self.assertEqual(list(User.objects.all()), [admin_user])
+        self.assertFalse(ToDoList.objects.filter(pk=self.todo_list.pk).exists())
+        self.assertTrue(ToDoListItem.objects.exists())
@@ -2,13 +2,14 @@ from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 from django.utils.crypto import get_random_string
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView, TemplateView, FormView
 
-from superlists.models import ToDoList
+from superlists.models import ArchivedToDoList, ToDoList
 from .forms import RegisterForm
 from .models import UserProfile
 
@@ -21,16 +22,17 @@ class RegisterView(FormView):
     model = User
 
     def form_valid(self, form):
-        user = form.save()
-        user.set_password(user.password)
-        if self.EMAIL_VERIFICATON:
-            user.is_active = False
-        user.save()
-        user_profile = UserProfile(
-            user=user, confirmation_code=get_random_string(32))
-        user_profile.save()
-        if self.EMAIL_VERIFICATON:
-            user_profile.send_confirmation_code()
+        with transaction.atomic():
+            user = form.save()
+            user.set_password(user.password)
+            if self.EMAIL_VERIFICATON:
+                user.is_active = False
+            user.save()
+            user_profile = UserProfile(
+                user=user, confirmation_code=get_random_string(32))
+            user_profile.save()
+            if self.EMAIL_VERIFICATON:
+                user_profile.queue_confirmation_code()
         return super(RegisterView, self).form_valid(form)
 
     def get_success_url(self):
@@ -68,8 +70,16 @@ class UserProfileView(ListView):
         return super(UserProfileView, self).dispatch(*args, **kwargs)
 
     def get_queryset(self):
-        user_profile = UserProfile.objects.get(user_id=self.request.user.id)
-        return ToDoList.objects.all().filter(user_profile=user_profile)
+        # Most recently changed lists first, see ToDoList.last_modified
+        user_profile_id = self.request.user.user_profile.id
+        return ToDoList.objects.all().filter(user_profile_id=user_profile_id).order_by("-last_modified")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Listed from their own table, visiting one restores it
+        archived_lists = ArchivedToDoList.objects.filter(user_profile_id=self.request.user.user_profile.id)
+        context["archived_lists"] = archived_lists.defer("data").order_by("-last_modified")
+        return context
 
 
 def user_login(request):
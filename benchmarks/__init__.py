@@ -0,0 +1,13 @@
+"""
+Throughput and latency benchmarks of the superlists and accounts views.
+
+Seeds a throwaway test database and drives the WSGI application in
+process with concurrent workers::
+
+    DJANGO_SETTINGS_MODULE=settings.local python -m benchmarks --output before.json
+    DJANGO_SETTINGS_MODULE=settings.local python -m benchmarks --output after.json
+    python -m benchmarks.compare before.json after.json
+
+Clients accept compressed responses, ``--accept-encoding identity`` runs
+the same scenarios uncompressed to compare bytes sent and server time.
+"""
@@ -0,0 +1,99 @@
+"""
+Command line entry point running the benchmark suite, see
+:mod:`benchmarks`. With ``--concurrency`` above 1 on SQLite, requests of
+writing scenarios are serialized, concurrent writes need PostgreSQL.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import django
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--users", type=int, default=20, help="Number of seeded users.")
+    parser.add_argument("--lists", type=int, default=200, help="Number of seeded lists.")
+    parser.add_argument("--items", type=int, default=20, help="Number of seeded items per list.")
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent workers.")
+    parser.add_argument("--scenario", action="append", help="Run only given scenarios.")
+    parser.add_argument("--accept-encoding", default="br, gzip",
+                        help="Accept-Encoding sent by clients, 'identity' to measure uncompressed responses.")
+    parser.add_argument("--output", help="Save results as JSON to this file.")
+    return parser.parse_args(argv)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings.local")
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+
+    # Same adjustments as the test runner, without its template instrumentation
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ["testserver"]
+    settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    # All simulated clients share one address and would be throttled
+    settings.RATE_LIMITS = {}
+
+    from iotodolists.wsgi import application
+    from .runner import SCENARIOS, run_benchmark
+    from .seed import seed
+
+    scenarios = [scenario for scenario in SCENARIOS if not args.scenario or scenario.name in args.scenario]
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        list_ids = seed(args.users, args.lists, args.items)
+        results = run_benchmark(application, list_ids, args.requests, args.concurrency, scenarios,
+                                args.accept_encoding)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "dataset": {"users": args.users, "lists": args.lists, "items": args.items},
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "accept_encoding": args.accept_encoding,
+        "results": results,
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+
+def format_value(value, scale=1, precision=1):
+    return "-" if value is None else "%.*f" % (precision, value * scale)
+
+
+def print_results(results):
+    print("%-12s %8s %7s %9s %9s %9s %9s %9s" % (
+        "scenario", "req/s", "errors", "p50 ms", "p95 ms", "p99 ms", "queries", "bytes"))
+    for name, result in results.items():
+        print("%-12s %8s %7d %9s %9s %9s %9s %9s" % (
+            name, format_value(result["requests_per_second"]), result["errors"],
+            format_value(result["p50"], 1000), format_value(result["p95"], 1000),
+            format_value(result["p99"], 1000), format_value(result["queries_per_request"]),
+            format_value(result["bytes_per_request"], precision=0),
+        ))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
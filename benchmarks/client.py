@@ -0,0 +1,79 @@
+import io
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+
+class WSGIClient(object):
+    """
+    Minimal HTTP client calling a WSGI application in process.
+    Keeps cookies and sends CSRF token with every request. Like a browser
+    it remembers validators of responses and sends them with conditional
+    requests, and accepts encodings given by ``accept_encoding``.
+    """
+    host = "testserver"
+    VALIDATORS = {"etag": "HTTP_IF_NONE_MATCH", "last-modified": "HTTP_IF_MODIFIED_SINCE"}
+
+    def __init__(self, application, accept_encoding=""):
+        self.application = application
+        self.accept_encoding = accept_encoding
+        self.cookies = {}
+        self.validators = {}
+
+    def request(self, method, path, data=None, conditional=False):
+        """Returns status code and body, as sent on the wire, of the response."""
+        path, _, query_string = path.partition("?")
+        body = urlencode(data).encode() if data else b""
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": query_string,
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": self.host,
+            "CONTENT_TYPE": "application/x-www-form-urlencoded",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": io.StringIO(),
+            "wsgi.url_scheme": "http",
+            "wsgi.version": (1, 0),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        if self.cookies:
+            environ["HTTP_COOKIE"] = "; ".join("%s=%s" % item for item in self.cookies.items())
+        if "csrftoken" in self.cookies:
+            environ["HTTP_X_CSRFTOKEN"] = self.cookies["csrftoken"]
+        if self.accept_encoding:
+            environ["HTTP_ACCEPT_ENCODING"] = self.accept_encoding
+        if conditional:
+            environ.update(self.validators.get(path, {}))
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = headers
+
+        result = self.application(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        validators = {}
+        for name, value in response["headers"]:
+            if name.lower() == "set-cookie":
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+            elif name.lower() in self.VALIDATORS:
+                validators[self.VALIDATORS[name.lower()]] = value
+        if validators:
+            self.validators[path] = validators
+        return response["status"], content
+
+    def get(self, path, conditional=False):
+        return self.request("GET", path, conditional=conditional)
+
+    def post(self, path, data):
+        return self.request("POST", path, data)
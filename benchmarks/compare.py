@@ -0,0 +1,51 @@
+"""
+Compares two JSON files saved by ``python -m benchmarks --output``::
+
+    python -m benchmarks.compare before.json after.json
+"""
+import json
+import sys
+
+METRICS = (
+    ("requests_per_second", "req/s", 1),
+    ("p50", "p50 ms", 1000),
+    ("p95", "p95 ms", 1000),
+    ("p99", "p99 ms", 1000),
+    ("queries_per_request", "queries", 1),
+    ("bytes_per_request", "bytes", 1),
+)
+
+
+def change(before, after):
+    if before is None or after is None:
+        return "-"
+    if not before:
+        return "n/a"
+    return "%+.1f%%" % ((after - before) * 100.0 / before)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(__doc__.strip())
+        return 2
+    reports = []
+    for path in argv:
+        with open(path) as report:
+            reports.append(json.load(report))
+    before, after = (report["results"] for report in reports)
+    print("%-12s %-8s %10s %10s %9s" % ("scenario", "metric", "before", "after", "change"))
+    for name in sorted(set(before) & set(after)):
+        for key, label, scale in METRICS:
+            old, new = before[name].get(key), after[name].get(key)
+            print("%-12s %-8s %10s %10s %9s" % (
+                name, label,
+                "-" if old is None else "%.2f" % (old * scale),
+                "-" if new is None else "%.2f" % (new * scale),
+                change(old, new),
+            ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
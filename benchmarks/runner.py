@@ -0,0 +1,189 @@
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.urls import reverse
+
+from iotodolists import metrics
+from superlists.models import ToDoListItem
+from .client import WSGIClient
+from .seed import PASSWORD, USERNAME_PREFIX
+
+
+class Context(object):
+    """Data shared by workers of a benchmark run."""
+
+    def __init__(self, list_ids, deletable_items):
+        self.list_ids = list_ids
+        self.list_id_cycle = itertools.cycle(list_ids)
+        self.deletable_items = iter(deletable_items)
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def next_list_id(self):
+        with self.lock:
+            return next(self.list_id_cycle)
+
+    def next_deletable_item(self):
+        with self.lock:
+            return next(self.deletable_items, (0, 0))
+
+
+def index(client, context):
+    return client.get(reverse("index"))
+
+
+def todo_list(client, context):
+    return client.get(reverse("list", args=(context.next_list_id(),)))
+
+
+def create_item(client, context):
+    return client.post(reverse("create_item", args=(context.next_list_id(),)), {"name": "Benchmark item"})
+
+
+def create_item_fragment(client, context):
+    return client.post(reverse("items", args=(context.next_list_id(),)), {"name": "Benchmark item"})
+
+
+def delete_item(client, context):
+    item_id, todo_list_id = context.next_deletable_item()
+    return client.get(reverse("delete_item", args=(todo_list_id, item_id)))
+
+
+def login(client, context):
+    return client.post(reverse("login"), {"username": USERNAME_PREFIX + "0", "password": PASSWORD})
+
+
+def user(client, context):
+    return client.get(reverse("user"))
+
+
+def visit_list(client, context):
+    client.revisited_list = reverse("list", args=(context.next_list_id(),))
+    client.get(client.revisited_list)
+
+
+def revisit_list(client, context):
+    return client.get(client.revisited_list, conditional=True)
+
+
+class Scenario(object):
+    """
+    Requests sent by ``function``, ``prepare`` runs for every worker before
+    the clock starts. ``view`` is the URL name whose queries per request
+    recorded by PerformanceMiddleware are reported, the name by default.
+    ``writes`` marks requests writing to the database.
+    """
+
+    def __init__(self, name, function, expected_status, logged_in=False, prepare=None, view=None, writes=False):
+        self.name = name
+        self.function = function
+        self.expected_status = expected_status
+        self.logged_in = logged_in
+        self.prepare = prepare
+        self.view = view or name
+        self.writes = writes
+
+
+SCENARIOS = (
+    Scenario("index", index, 200),
+    Scenario("list", todo_list, 200),
+    Scenario("list_revisit", revisit_list, 304, prepare=visit_list, view="list"),
+    Scenario("create_item", create_item, 302, writes=True),
+    Scenario("items", create_item_fragment, 201, writes=True),
+    Scenario("delete_item", delete_item, 302, writes=True),
+    Scenario("login", login, 302, writes=True),
+    Scenario("user", user, 200, logged_in=True),
+)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return None
+    index = max(0, int(math.ceil(fraction * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def queries_per_request(view):
+    counts, total = metrics.DB_QUERIES.values.get(view, (None, 0))
+    if counts is None:
+        return None
+    return total / sum(counts)
+
+
+def run_scenario(application, scenario, context, requests, concurrency, accept_encoding=""):
+    """
+    Sends ``requests`` requests of ``scenario`` from ``concurrency`` workers,
+    each with its own session. Returns summary of latencies in seconds and
+    of response sizes in bytes.
+
+    SQLite allows a single writer and fails concurrent ones with "database
+    is locked", so writing scenarios are sent one at a time there and
+    their latency includes waiting for the other workers. Measure writes
+    under concurrency on PostgreSQL.
+    """
+    serialize = scenario.writes and concurrency > 1 and connections["default"].vendor == "sqlite"
+
+    counts = [requests // concurrency + (1 if number < requests % concurrency else 0)
+              for number in range(concurrency)]
+    # Workers log in and get CSRF cookie first, metrics are reset and the
+    # clock started once all of them are ready.
+    barrier = threading.Barrier(concurrency, action=lambda: [h.reset() for h in metrics.HISTOGRAMS])
+
+    def worker(count):
+        client = WSGIClient(application, accept_encoding)
+        client.get(reverse("index"))
+        if scenario.logged_in:
+            login(client, context)
+        if scenario.prepare is not None:
+            scenario.prepare(client, context)
+        barrier.wait()
+        started = time.perf_counter()
+        samples = []
+        for _ in range(count):
+            request_started = time.perf_counter()
+            if serialize:
+                with context.write_lock:
+                    status, content = scenario.function(client, context)
+            else:
+                status, content = scenario.function(client, context)
+            samples.append((time.perf_counter() - request_started, status == scenario.expected_status,
+                            len(content)))
+        finished = time.perf_counter()
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+        return started, finished, samples
+
+    if concurrency == 1:
+        results = [worker(counts[0])]
+    else:
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(worker, counts))
+    elapsed = max(result[1] for result in results) - min(result[0] for result in results)
+    samples = [sample for result in results for sample in result[2]]
+    latencies = sorted(latency for latency, _, _ in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, ok, _ in samples if not ok),
+        "requests_per_second": len(samples) / elapsed if elapsed else None,
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "queries_per_request": queries_per_request(scenario.view),
+        "bytes_per_request": sum(size for _, _, size in samples) / len(samples) if samples else None,
+    }
+
+
+def run_benchmark(application, list_ids, requests, concurrency, scenarios=SCENARIOS, accept_encoding=""):
+    """Runs every scenario in turn, returns results by scenario name."""
+    deletable_items = ToDoListItem.objects.filter(todo_list_id__in=list_ids).values_list("id", "todo_list_id")
+    context = Context(list_ids, list(deletable_items[:requests]))
+    return {
+        scenario.name: run_scenario(application, scenario, context, requests, concurrency, accept_encoding)
+        for scenario in scenarios
+    }
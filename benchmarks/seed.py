@@ -0,0 +1,58 @@
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils.crypto import get_random_string
+
+from accounts.models import UserProfile
+from superlists.models import ToDoList, ToDoListItem
+from superlists.search import index_list_items, index_lists
+
+
+USERNAME_PREFIX = "bench_user_"
+PASSWORD = "bench_password"
+
+
+def _batches(iterable, size):
+    batch = []
+    for element in iterable:
+        batch.append(element)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(users, lists, items_per_list, batch_size=1000):
+    """
+    Inserts ``users`` users with profiles, ``lists`` lists spread evenly
+    among them (every other one private) and ``items_per_list`` items on
+    every list, all with bulk inserts. Returns ids of created lists.
+    """
+    # Hashing is deliberately slow, all users share a single hash.
+    password = make_password(PASSWORD)
+    User.objects.bulk_create((
+        User(username="%s%d" % (USERNAME_PREFIX, number), email="%s%d@bench.test" % (USERNAME_PREFIX, number),
+             password=password)
+        for number in range(users)
+    ), batch_size)
+    user_ids = User.objects.filter(username__startswith=USERNAME_PREFIX).values_list("id", flat=True)
+    UserProfile.objects.bulk_create((
+        UserProfile(user_id=user_id, confirmation_code=get_random_string(32)) for user_id in user_ids
+    ), batch_size)
+    profile_ids = list(UserProfile.objects.filter(user_id__in=user_ids).values_list("id", flat=True))
+    ToDoList.objects.bulk_create((
+        ToDoList(name="Bench list %d" % number, is_private=number % 2 == 1,
+                 item_count=items_per_list, completed_item_count=len(range(0, items_per_list, 3)),
+                 user_profile_id=profile_ids[number % len(profile_ids)] if profile_ids else None)
+        for number in range(lists)
+    ), batch_size)
+    list_ids = list(ToDoList.objects.filter(name__startswith="Bench list ").values_list("id", flat=True))
+    items = (
+        ToDoListItem(todo_list_id=list_id, name="Bench item %d" % number, completed=number % 3 == 0)
+        for list_id in list_ids for number in range(items_per_list)
+    )
+    for batch in _batches(items, batch_size):
+        ToDoListItem.objects.bulk_create(batch)
+    index_lists(list_ids)
+    index_list_items(list_ids)
+    return list_ids
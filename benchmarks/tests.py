@@ -0,0 +1,58 @@
+from django.test import TestCase
+
+from accounts.models import UserProfile
+from iotodolists.wsgi import application
+from superlists.models import ToDoList, ToDoListItem
+from .runner import SCENARIOS, percentile, run_benchmark
+from .seed import seed
+
+
+class SeedTest(TestCase):
+
+    def test_seed(self):
+        """
+        Seed should spread lists evenly among users, every other one private.
+        """
+        list_ids = seed(users=2, lists=4, items_per_list=3, batch_size=5)
+        self.assertEqual(len(list_ids), 4)
+        self.assertEqual(UserProfile.objects.count(), 2)
+        self.assertEqual(ToDoList.objects.filter(is_private=True).count(), 2)
+        self.assertEqual(ToDoListItem.objects.count(), 12)
+        for profile in UserProfile.objects.all():
+            self.assertEqual(profile.todolist_set.count(), 2)
+
+
+class RunnerTest(TestCase):
+
+    def test_percentile(self):
+        """
+        Percentile should use the nearest-rank method.
+        """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.95), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_run_benchmark(self):
+        """
+        Every scenario should complete without errors and report query counts.
+        """
+        list_ids = seed(users=1, lists=2, items_per_list=3)
+        results = run_benchmark(application, list_ids, requests=3, concurrency=1)
+        self.assertEqual(set(results), {scenario.name for scenario in SCENARIOS})
+        for name, result in results.items():
+            self.assertEqual(result["requests"], 3, name)
+            self.assertEqual(result["errors"], 0, name)
+            self.assertIsNotNone(result["queries_per_request"], name)
+        self.assertEqual(results["list_revisit"]["bytes_per_request"], 0)
+
+    def test_compressed_responses_are_smaller(self):
+        """
+        Pages sent to clients accepting gzip should take fewer bytes.
+        """
+        list_ids = seed(users=1, lists=2, items_per_list=3)
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name == "list"]
+        identity = run_benchmark(application, list_ids, 2, 1, scenarios, accept_encoding="identity")
+        compressed = run_benchmark(application, list_ids, 2, 1, scenarios, accept_encoding="gzip")
+        self.assertLess(compressed["list"]["bytes_per_request"], identity["list"]["bytes_per_request"] / 2)
@@ -0,0 +1,62 @@
+"""
+Compression of dynamic responses, see ``COMPRESSION_CONTENT_TYPES``.
+"""
+import gzip
+import io
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .staticfiles import accepted_encodings, brotli
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses responses of ``COMPRESSION_CONTENT_TYPES`` larger than
+    ``COMPRESSION_MIN_SIZE`` bytes with brotli, if installed and accepted,
+    or gzip. Streamed responses, like server-sent events and exports, and
+    responses already encoded, like precompressed static files, are sent
+    as they are.
+
+    Like GZipMiddleware it relies on CSRF tokens being masked differently
+    in every response to keep pages safe from BREACH.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header("Content-Encoding")
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+            content = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif "gzip" in accepted:
+            encoding = "gzip"
+            content = self.gzip(response.content)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        # Compressed body is no longer byte for byte what a strong ETag promised
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+    def gzip(self, content):
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=settings.COMPRESSION_GZIP_LEVEL,
+                           mtime=0) as gzip_file:
+            gzip_file.write(content)
+        return buffer.getvalue()
@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from iotodolists.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """PostgreSQL backend taking its connections from an in-process pool."""
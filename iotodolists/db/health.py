@@ -0,0 +1,53 @@
+"""
+Health checks of persistent database connections, see ``HEALTH_CHECK_INTERVAL``.
+"""
+import collections
+import threading
+import time
+
+from django.db import connections
+
+
+class ConnectionHealthCheckMiddleware(object):
+    """
+    Validates persistent database connections before the view uses them.
+
+    A connection idle for longer than ``HEALTH_CHECK_INTERVAL`` seconds
+    (set per database in ``DATABASES``) is pinged and closed if it is
+    broken, so the view transparently reconnects instead of failing.
+    """
+    counters = collections.Counter()
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for connection in connections.all():
+            self.check(connection)
+        response = self.get_response(request)
+        now = time.time()
+        for connection in connections.all():
+            connection.health_checked_at = now
+        return response
+
+    @classmethod
+    def check(cls, connection):
+        interval = connection.settings_dict.get("HEALTH_CHECK_INTERVAL")
+        if interval is None or connection.connection is None or connection.in_atomic_block:
+            return
+        if time.time() - getattr(connection, "health_checked_at", 0) < interval:
+            return
+        usable = connection.is_usable()
+        connection.health_checked_at = time.time()
+        with cls.lock:
+            cls.counters["checks"] += 1
+            if not usable:
+                cls.counters["reconnects"] += 1
+        if not usable:
+            connection.close()
+
+    @classmethod
+    def stats(cls):
+        with cls.lock:
+            return dict(cls.counters)
@@ -0,0 +1,170 @@
+"""
+In-process database connection pool.
+
+Connections closed by Django at the end of a request are handed back to
+a pool shared by all threads of the process instead of being closed, so
+the next request skips TCP setup and authentication.
+"""
+import collections
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of at most ``max_size`` DB-API connections.
+
+    Connections idle for longer than ``check_interval`` seconds are
+    validated with ``check`` before being handed out and replaced
+    when the check fails.
+    """
+
+    def __init__(self, max_size=10, timeout=5, check=None, check_interval=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.check_interval = check_interval
+        self.size = 0
+        self.idle = collections.deque()
+        self.condition = threading.Condition()
+        self.counters = collections.Counter()
+
+    def checkout(self, connect):
+        """
+        Returns idle connection or a new one made with ``connect``.
+        Waits up to ``timeout`` seconds when the pool is exhausted.
+        """
+        with self.condition:
+            self.counters["checkouts"] += 1
+            if not self.idle and self.size >= self.max_size:
+                self.counters["waits"] += 1
+                deadline = time.time() + self.timeout
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.counters["timeouts"] += 1
+                        raise PoolTimeout("No database connection available in %s seconds" % self.timeout)
+                    self.condition.wait(remaining)
+            if self.idle:
+                connection, returned_at = self.idle.pop()
+            else:
+                connection, returned_at = None, None
+                self.size += 1
+        if connection is None:
+            return self._connect(connect)
+        if self.check is not None and time.time() - returned_at >= self.check_interval:
+            if not self.check(connection):
+                self._close(connection)
+                with self.condition:
+                    self.counters["reconnects"] += 1
+                return self._connect(connect)
+        return connection
+
+    def checkin(self, connection, discard=False):
+        """Returns ``connection`` to the pool, or closes it if ``discard`` is set."""
+        if discard:
+            self._close(connection)
+            with self.condition:
+                self.size -= 1
+                self.counters["discards"] += 1
+                self.condition.notify()
+        else:
+            with self.condition:
+                self.idle.append((connection, time.time()))
+                self.condition.notify()
+
+    def stats(self):
+        with self.condition:
+            stats = dict(self.counters)
+            stats.update(size=self.size, idle=len(self.idle), in_use=self.size - len(self.idle))
+            return stats
+
+    def _connect(self, connect):
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.counters["connects"] += 1
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, **options):
+    """Returns pool of connections to database ``alias``, creating it on first use."""
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(**options)
+        return _pools[alias]
+
+
+def get_stats():
+    """Returns statistics of all pools of this process, by database alias."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def check_connection(connection):
+    try:
+        connection.cursor().execute("SELECT 1")
+    except Exception:
+        return False
+    return True
+
+
+class PooledDatabaseWrapperMixin(object):
+    """
+    Mixin for Django database backends taking connections from
+    :class:`ConnectionPool`. Configured with ``POOL`` key of the database
+    settings, e.g. ``{"MAX_SIZE": 10, "TIMEOUT": 5, "CHECK_INTERVAL": 30}``.
+    """
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get("POOL", {})
+        return get_pool(
+            self.alias,
+            max_size=options.get("MAX_SIZE", 10),
+            timeout=options.get("TIMEOUT", 5),
+            check=check_connection,
+            check_interval=options.get("CHECK_INTERVAL", 30),
+        )
+
+    def get_new_connection(self, conn_params):
+        parent = super(PooledDatabaseWrapperMixin, self)
+        try:
+            return self.pool.checkout(lambda: parent.get_new_connection(conn_params))
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # A connection abandoned inside a transaction stays referenced by
+        # this wrapper, it must not be handed to another thread.
+        discard = self.in_atomic_block
+        if not discard:
+            try:
+                self.connection.rollback()
+            except self.Database.Error:
+                discard = True
+        if not discard and self.errors_occurred:
+            discard = not check_connection(self.connection)
+        self.pool.checkin(self.connection, discard=discard)
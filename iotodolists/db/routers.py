@@ -0,0 +1,154 @@
+"""
+Routing of read queries to database replicas.
+
+Replicas listed in ``DATABASE_REPLICAS`` are only used while
+:class:`ReplicaMiddleware` handles a safe request to one of
+``DATABASE_REPLICA_VIEWS``; everything else, including all writes, goes
+to the ``default`` database.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class ReplicaHealth(object):
+    """
+    Remembers per process which replicas are usable. A replica is checked
+    at most once in ``DATABASE_REPLICA_CHECK_INTERVAL`` seconds and is
+    unusable when it does not answer or lags more than
+    ``DATABASE_REPLICA_MAX_LAG`` seconds behind the primary.
+    """
+    lock = threading.Lock()
+    checked = {}
+
+    # pg_last_xact_replay_timestamp() does not move while the primary is
+    # idle, which then looks like lag and only costs reads on the primary.
+    POSTGRESQL_LAG_SQL = (
+        "SELECT CASE WHEN pg_is_in_recovery() "
+        "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+        "ELSE 0 END"
+    )
+
+    @classmethod
+    def is_usable(cls, alias):
+        with cls.lock:
+            usable, checked_at = cls.checked.get(alias, (None, 0))
+        if usable is None or time.time() - checked_at >= settings.DATABASE_REPLICA_CHECK_INTERVAL:
+            usable = cls.check(alias)
+            cls.mark(alias, usable)
+        return usable
+
+    @classmethod
+    def check(cls, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor != "postgresql":
+                    cursor.execute("SELECT 1")
+                    return True
+                cursor.execute(cls.POSTGRESQL_LAG_SQL)
+                return cursor.fetchone()[0] <= settings.DATABASE_REPLICA_MAX_LAG
+        except DatabaseError:
+            connection.close()
+            return False
+
+    @classmethod
+    def mark(cls, alias, usable):
+        with cls.lock:
+            cls.checked[alias] = (usable, time.time())
+
+
+def choose_replica():
+    """Returns alias of a random usable replica, or None if there is none."""
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if ReplicaHealth.is_usable(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+def get_read_database():
+    """Returns replica alias reads of the current thread go to, or None."""
+    return getattr(_local, "replica", None)
+
+
+def set_read_database(alias):
+    _local.replica = alias
+
+
+class ReplicaRouter(object):
+    """
+    Sends reads to the replica chosen for the current request, all other
+    queries go to ``default``. Replicas hold copies of ``default`` and are
+    never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        return get_read_database()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware(object):
+    """
+    Sends reads of safe requests to ``DATABASE_REPLICA_VIEWS`` to one of
+    ``DATABASE_REPLICAS``, see :mod:`iotodolists.db.routers`.
+
+    A client which has just written gets a cookie keeping its reads on the
+    primary for ``DATABASE_PRIMARY_STICKY_SECONDS``, so it sees its own
+    writes despite replication lag. A view failing on a replica is marked
+    down and the view is run once more against the primary.
+    """
+    SAFE_METHODS = ("GET", "HEAD")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            set_read_database(None)
+        if (settings.DATABASE_REPLICAS and request.method not in self.SAFE_METHODS
+                and response.status_code < 400):
+            response.set_cookie(settings.DATABASE_PRIMARY_STICKY_COOKIE, "1", httponly=True,
+                                max_age=settings.DATABASE_PRIMARY_STICKY_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (not settings.DATABASE_REPLICAS or request.method not in self.SAFE_METHODS
+                or request.resolver_match.view_name not in settings.DATABASE_REPLICA_VIEWS
+                or settings.DATABASE_PRIMARY_STICKY_COOKIE in request.COOKIES):
+            return None
+        set_read_database(choose_replica())
+        request.replica_view = (view_func, view_args, view_kwargs)
+        return None
+
+    def process_exception(self, request, exception):
+        replica = get_read_database()
+        if replica is None or not isinstance(exception, DatabaseError):
+            return None
+        logger.warning("Replica %s failed, reading from the primary: %s", replica, exception)
+        ReplicaHealth.mark(replica, False)
+        connections[replica].close()
+        set_read_database(None)
+        view_func, view_args, view_kwargs = request.replica_view
+        response = view_func(request, *view_args, **view_kwargs)
+        # Exceptions raised while rendering arrive here after Django's
+        # own rendering step, so the response is rendered right away.
+        if hasattr(response, "render") and callable(response.render):
+            response = response.render()
+        return response
@@ -0,0 +1,90 @@
+"""
+In-process request metrics exported in Prometheus text format.
+
+Every worker process keeps its own histograms, the scraper is expected
+to sum them up over processes.
+"""
+import bisect
+import threading
+
+
+class Histogram(object):
+    """Cumulative histogram with fixed buckets, labelled by view name."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def observe(self, view, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(view, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self.values[view] = (counts, total + value)
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    def expose(self):
+        lines = [
+            "# HELP %s %s" % (self.name, self.documentation),
+            "# TYPE %s histogram" % self.name,
+        ]
+        with self.lock:
+            values = sorted((view, list(counts), total) for view, (counts, total) in self.values.items())
+        for view, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append('%s_bucket{view="%s",le="%s"} %d' % (self.name, view, le, cumulative))
+            lines.append('%s_sum{view="%s"} %r' % (self.name, view, float(total)))
+            lines.append('%s_count{view="%s"} %d' % (self.name, view, cumulative))
+        return lines
+
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUEST_DURATION = Histogram(
+    "superlists_request_duration_seconds", "Wall time of handling a request.", TIME_BUCKETS)
+DB_QUERIES = Histogram(
+    "superlists_db_queries", "Number of database queries run by a request.", QUERY_BUCKETS)
+DB_DURATION = Histogram(
+    "superlists_db_duration_seconds", "Time spent in database queries by a request.", TIME_BUCKETS)
+TEMPLATE_DURATION = Histogram(
+    "superlists_template_duration_seconds", "Time spent rendering the response template.", TIME_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    "superlists_response_size_bytes", "Size of response body.", SIZE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, TEMPLATE_DURATION, RESPONSE_SIZE)
+
+
+def gauge_lines(name, documentation, values):
+    """Formats ``values``, a dict of label tuples to numbers, as a gauge."""
+    lines = [
+        "# HELP %s %s" % (name, documentation),
+        "# TYPE %s gauge" % name,
+    ]
+    for labels, value in sorted(values.items()):
+        label_text = ",".join('%s="%s"' % label for label in labels)
+        lines.append("%s{%s} %r" % (name, label_text, value))
+    return lines
+
+
+def expose(extra_gauges=()):
+    """
+    Returns all metrics in Prometheus text exposition format.
+    ``extra_gauges`` are ``(name, documentation, values)`` triples.
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    for name, documentation, values in extra_gauges:
+        lines.extend(gauge_lines(name, documentation, values))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,142 @@
+"""
+Per-request performance metrics: wall time, number and time of database
+queries, template rendering time and response size, see ``PERFORMANCE_BUDGETS``.
+"""
+import contextlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorDebugWrapper, CursorWrapper
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RequestStats(object):
+    """Database and template timings of the request handled by current thread."""
+    __slots__ = ("queries", "db_time", "template_time", "template_depth")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+class TimedCursorMixin(object):
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return super(TimedCursorMixin, self).execute(sql, params)
+        finally:
+            self.record(time.perf_counter() - started)
+
+    def executemany(self, sql, param_list):
+        started = time.perf_counter()
+        try:
+            return super(TimedCursorMixin, self).executemany(sql, param_list)
+        finally:
+            self.record(time.perf_counter() - started)
+
+    def record(self, elapsed):
+        stats = getattr(_local, "stats", None)
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+
+class TimedCursorWrapper(TimedCursorMixin, CursorWrapper):
+    pass
+
+
+class TimedCursorDebugWrapper(TimedCursorMixin, CursorDebugWrapper):
+    pass
+
+
+@contextlib.contextmanager
+def timed_template():
+    """
+    Adds time spent in the block to template time of :class:`RequestStats`.
+    Templates rendered while another one renders are counted only once.
+    """
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        yield
+        return
+    stats.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.template_depth -= 1
+        if not stats.template_depth:
+            stats.template_time += time.perf_counter() - started
+
+
+def instrument_connection(connection):
+    """Makes cursors of ``connection`` report queries to :class:`RequestStats`."""
+    if getattr(connection, "instrumented", False):
+        return
+    connection.make_cursor = lambda cursor: TimedCursorWrapper(cursor, connection)
+    connection.make_debug_cursor = lambda cursor: TimedCursorDebugWrapper(cursor, connection)
+    connection.instrumented = True
+
+
+class PerformanceMiddleware(object):
+    """
+    Records wall time, number and time of database queries, template
+    rendering time and response size of every request in histograms
+    labelled by URL name, see :mod:`iotodolists.metrics`. Templates are
+    timed by :class:`iotodolists.template_backends.TimedDjangoTemplates`, both
+    the response template and fragments rendered by the view.
+
+    Requests going over ``PERFORMANCE_BUDGETS`` of their URL name
+    (or ``PERFORMANCE_DEFAULT_BUDGET``) are logged as warnings. A view
+    doing occasional extra work may set ``request.performance_budget``
+    to the name of another budget.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for connection in connections.all():
+            instrument_connection(connection)
+        _local.stats = stats = RequestStats()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.stats = None
+        elapsed = time.perf_counter() - started
+        view = self.get_view_name(request)
+        metrics.REQUEST_DURATION.observe(view, elapsed)
+        metrics.DB_QUERIES.observe(view, stats.queries)
+        metrics.DB_DURATION.observe(view, stats.db_time)
+        metrics.TEMPLATE_DURATION.observe(view, stats.template_time)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(view, len(response.content))
+        self.check_budget(getattr(request, "performance_budget", view), elapsed, stats)
+        return response
+
+    def get_view_name(self, request):
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is None or not resolver_match.url_name:
+            return "unmatched"
+        return resolver_match.view_name
+
+    def check_budget(self, view, elapsed, stats):
+        budget = settings.PERFORMANCE_BUDGETS.get(view, settings.PERFORMANCE_DEFAULT_BUDGET)
+        if elapsed > budget.get("time", float("inf")) or stats.queries > budget.get("queries", float("inf")):
+            logger.warning(
+                "View %s over budget: %.3fs, %d queries (%.3fs), template %.3fs",
+                view, elapsed, stats.queries, stats.db_time, stats.template_time,
+            )
@@ -0,0 +1,181 @@
+"""
+Token bucket rate limiting of POST requests, see ``RATE_LIMITS``.
+
+Every bucket holds up to ``requests`` tokens, refilled continuously over
+``period`` seconds; a request takes one token. Only the token count and
+time of the last update are stored per bucket, so a check is a single
+lookup and write whatever the rate.
+"""
+import collections
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+
+def refill(state, capacity, rate, now):
+    """Returns tokens in bucket last updated as ``state`` at ``now``."""
+    if state is None:
+        return capacity
+    tokens, updated = state
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+def take(state, capacity, rate, now):
+    """
+    Takes a token from bucket in ``state``. Returns the new state and
+    seconds to wait for a token, 0 if one was taken.
+    """
+    tokens = refill(state, capacity, rate, now)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+def give_back(state, capacity, rate, now):
+    """Returns bucket in ``state`` with a taken token put back."""
+    return (min(capacity, refill(state, capacity, rate, now) + 1), now)
+
+
+class LocalBackend(object):
+    """
+    Buckets kept in memory of the worker process, so every process allows
+    the full rate. Least recently used buckets beyond ``max_buckets`` are
+    dropped, which only makes their clients start with a full bucket.
+    """
+
+    def __init__(self, max_buckets=10000):
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+        self.buckets = collections.OrderedDict()
+
+    def take(self, key, capacity, rate):
+        with self.lock:
+            state, wait = take(self.buckets.pop(key, None), capacity, rate, time.time())
+            self.buckets[key] = state
+            if len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def give_back(self, key, capacity, rate):
+        with self.lock:
+            if key in self.buckets:
+                self.buckets[key] = give_back(self.buckets[key], capacity, rate, time.time())
+
+
+class CacheBackend(object):
+    """
+    Buckets shared by all processes through cache ``RATE_LIMIT_CACHE``.
+    Reading and writing a bucket is not atomic, concurrent requests of one
+    client may occasionally both get the last token.
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.RATE_LIMIT_CACHE]
+
+    def take(self, key, capacity, rate):
+        state, wait = take(self.cache.get(key), capacity, rate, time.time())
+        # A bucket refilled to capacity is the same as a missing one
+        self.cache.set(key, state, int(math.ceil(capacity / rate)))
+        return wait
+
+    def give_back(self, key, capacity, rate):
+        state = self.cache.get(key)
+        if state is not None:
+            self.cache.set(key, give_back(state, capacity, rate, time.time()), int(math.ceil(capacity / rate)))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the process-wide instance of ``RATE_LIMIT_BACKEND``."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.RATE_LIMIT_BACKEND)()
+        return _backend
+
+
+def bucket_key(view_name, kind, value):
+    # Hashed to keep user input out of cache keys
+    return "ratelimit:%s:%s:%s" % (view_name, kind, hashlib.sha1(value.encode()).hexdigest())
+
+
+def check(view_name, identities):
+    """
+    Takes a token for every ``(kind, value)`` identity of a client from
+    its bucket of ``view_name``. Returns seconds until the client may
+    retry, 0 if the request is allowed. A refused request puts tokens
+    already taken back, so e.g. a throttled user does not drain the
+    bucket of an address shared with other users.
+    """
+    limit = settings.RATE_LIMITS[view_name]
+    rate = limit["requests"] / limit["period"]
+    backend = get_backend()
+    taken = []
+    for kind, value in identities:
+        key = bucket_key(view_name, kind, value)
+        wait = backend.take(key, limit["requests"], rate)
+        if wait:
+            for key in taken:
+                backend.give_back(key, limit["requests"], rate)
+            return wait
+        taken.append(key)
+    return 0
+
+
+class RateLimitMiddleware(object):
+    """
+    Throttles POST requests to views listed in ``RATE_LIMITS`` per client IP
+    address and per username, answering 429 with ``Retry-After`` when the
+    client's bucket is empty, see :mod:`iotodolists.ratelimit`.
+    """
+    counters = collections.Counter()
+    lock = threading.Lock()
+    # Views taking the username from the form instead of the logged in user
+    USERNAME_FIELD_VIEWS = ("login", "register")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        if request.method != "POST" or view_name not in settings.RATE_LIMITS:
+            return None
+        wait = check(view_name, self.get_identities(request, view_name))
+        if not wait:
+            return None
+        with self.lock:
+            self.counters[view_name] += 1
+        response = HttpResponse("Too many requests, try again later.", status=429, content_type="text/plain")
+        response["Retry-After"] = str(int(math.ceil(wait)))
+        return response
+
+    def get_identities(self, request, view_name):
+        # Proxies append the address they received the request from
+        address = request.META.get(settings.RATE_LIMIT_CLIENT_IP_HEADER, "")
+        identities = [("ip", address.split(",")[-1].strip())]
+        if view_name in self.USERNAME_FIELD_VIEWS:
+            username = request.POST.get("username", "")
+        elif request.user.is_authenticated():
+            username = request.user.get_username()
+        else:
+            username = ""
+        if username:
+            identities.append(("user", username))
+        return identities
+
+    @classmethod
+    def stats(cls):
+        with cls.lock:
+            return dict(cls.counters)
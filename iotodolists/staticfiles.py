@@ -0,0 +1,247 @@
+"""
+Static files pipeline run by ``collectstatic``.
+
+:class:`CompressedManifestStaticFilesStorage` concatenates the sources of
+every bundle in ``STATIC_BUNDLES`` into one file, stores all files under
+names containing a hash of their content (see ManifestStaticFilesStorage)
+and writes gzip and, with the optional ``brotli`` package, brotli variants
+of text files next to them. :class:`StaticFilesMiddleware` serves the
+result.
+"""
+import collections
+import gzip
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Relative urls are rebased from the source to the bundle, data: and
+# absolute urls are left alone
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(['"]?)(?![a-z]+:|/|#)([^'"?#)]+)([^'")]*)\1\s*\)""")
+CSS_COMMENT_PATTERN = re.compile(r"/\*(?!!).*?\*/", re.DOTALL)
+CSS_WHITESPACE_PATTERN = re.compile(r"\s*([{};,>])\s*")
+# Whitespace before a colon separates a selector from a pseudo-class
+CSS_COLON_PATTERN = re.compile(r":\s+")
+SOURCE_MAP_PATTERN = re.compile(r"^\s*(?://|/\*)# sourceMappingURL=.*$", re.MULTILINE)
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".eot", ".ttf", ".json", ".txt", ".xml", ".html")
+# Tiny files and files compressing badly are not worth a variant
+COMPRESS_MIN_SIZE = 256
+COMPRESS_MIN_RATIO = 0.95
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def minify_css(content):
+    """Drops comments, except ``/*!`` licenses, and needless whitespace."""
+    content = CSS_COMMENT_PATTERN.sub("", content)
+    content = CSS_WHITESPACE_PATTERN.sub(r"\1", content)
+    content = CSS_COLON_PATTERN.sub(":", content)
+    return re.sub(r"\s+", " ", content).replace(";}", "}").strip()
+
+
+def rebase_css_urls(content, source, bundle):
+    """Rewrites relative urls of ``source`` to be relative to ``bundle``."""
+    source_dir = posixpath.dirname(source)
+    bundle_dir = posixpath.dirname(bundle) or "."
+
+    def rebase(match):
+        path = posixpath.normpath(posixpath.join(source_dir, match.group(2)))
+        return 'url("%s%s")' % (posixpath.relpath(path, bundle_dir), match.group(3))
+
+    return CSS_URL_PATTERN.sub(rebase, content)
+
+
+def build_bundle(name, sources, open_source):
+    """
+    Returns content of bundle ``name`` concatenated from ``sources``,
+    read as text with ``open_source(source)``. Sources not minified yet
+    (without ``.min.`` in the name) are minified if they are CSS.
+    """
+    is_css = name.endswith(".css")
+    parts = []
+    for source in sources:
+        with open_source(source) as source_file:
+            content = source_file.read().decode("utf-8")
+        # Maps of the sources do not match the bundle
+        content = SOURCE_MAP_PATTERN.sub("", content)
+        if is_css:
+            if ".min." not in source:
+                content = minify_css(content)
+            content = rebase_css_urls(content, source, name)
+        parts.append(content.strip())
+    # Scripts without a trailing semicolon must not run into the next one
+    return ("\n" if is_css else ";\n").join(parts) + "\n"
+
+
+def compress(content):
+    """Returns ``(encoding, compressed content)`` pairs worth storing."""
+    variants = []
+    if brotli is not None:
+        variants.append(("br", brotli.compress(content)))
+    buffer = io.BytesIO()
+    # Fixed mtime keeps the output identical for identical content
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=9, mtime=0) as gzip_file:
+        gzip_file.write(content)
+    variants.append(("gzip", buffer.getvalue()))
+    return [(encoding, compressed) for encoding, compressed in variants
+            if len(compressed) < len(content) * COMPRESS_MIN_RATIO]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage also building ``STATIC_BUNDLES`` and precompressed
+    variants of hashed files, see module documentation.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name, sources in settings.STATIC_BUNDLES.items():
+            content = build_bundle(name, sources, lambda source: paths[source][0].open(paths[source][1]))
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(content.encode("utf-8")))
+            paths[name] = (self, name)
+        for processed in super(CompressedManifestStaticFilesStorage, self).post_process(paths, **options):
+            yield processed
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress_file(name)
+
+    def compress_file(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+        suffixes = dict(ENCODINGS)
+        for encoding, compressed in compress(content):
+            compressed_name = name + suffixes[encoding]
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+
+
+def accepted_encodings(accept_encoding):
+    """Returns set of content codings allowed by ``Accept-Encoding`` header value."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        encoding, _, parameters = part.partition(";")
+        quality = parameters.replace(" ", "").lower()
+        if quality.startswith("q=") and not quality[2:].strip("0."):
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+StaticFile = collections.namedtuple("StaticFile", "content_type cache_control variants")
+StaticFileVariant = collections.namedtuple("StaticFileVariant", "path size etag last_modified")
+
+
+class StaticFilesMiddleware(object):
+    """
+    Serves files collected to ``STATIC_ROOT`` without reaching the views.
+    Precompressed variants written by
+    :class:`iotodolists.staticfiles.CompressedManifestStaticFilesStorage`
+    are chosen by ``Accept-Encoding`` and files listed in its manifest,
+    whose names change with their content, are cached forever.
+
+    Files are indexed once when the process starts, so collectstatic has to
+    run before it. Unused with ``DEBUG``, when runserver serves static files.
+    """
+    IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+    CONTENT_TYPES = {".woff": "font/woff", ".woff2": "font/woff2"}
+
+    def __init__(self, get_response):
+        self.prefix = urlsplit(settings.STATIC_URL).path
+        if settings.DEBUG or not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.files = self.index(settings.STATIC_ROOT)
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD") and request.path_info.startswith(self.prefix):
+            static_file = self.files.get(request.path_info[len(self.prefix):])
+            if static_file is not None:
+                return self.serve(request, static_file)
+        return self.get_response(request)
+
+    @classmethod
+    def index(cls, root):
+        """Returns :class:`StaticFile` for every file in ``root`` by its relative name."""
+        hashed_names = set()
+        manifest = os.path.join(root, "staticfiles.json")
+        if os.path.exists(manifest):
+            with open(manifest) as manifest_file:
+                hashed_names.update(json.load(manifest_file)["paths"].values())
+        encodings = {suffix: encoding for encoding, suffix in ENCODINGS}
+        variants = collections.defaultdict(dict)
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                base_name, suffix = os.path.splitext(name)
+                encoding = encodings.get(suffix)
+                if encoding is None:
+                    base_name = name
+                stat = os.stat(path)
+                etag = '"%x-%x%s"' % (int(stat.st_mtime), stat.st_size, "-" + encoding if encoding else "")
+                variants[base_name][encoding] = StaticFileVariant(path, stat.st_size, etag, http_date(stat.st_mtime))
+        files = {}
+        for name, file_variants in variants.items():
+            if None not in file_variants:
+                continue
+            extension = os.path.splitext(name)[1]
+            content_type = cls.CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            if name in hashed_names:
+                cache_control = cls.IMMUTABLE_CACHE_CONTROL
+            else:
+                cache_control = "public, max-age=%d" % settings.STATIC_MAX_AGE
+            files[name] = StaticFile(content_type, cache_control, file_variants)
+        return files
+
+    def serve(self, request, static_file):
+        encoding = self.choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), static_file.variants)
+        variant = static_file.variants[encoding]
+        if request.META.get("HTTP_IF_NONE_MATCH") == variant.etag:
+            response = HttpResponseNotModified()
+        elif request.method == "HEAD":
+            response = HttpResponse(content_type=static_file.content_type)
+        else:
+            response = FileResponse(open(variant.path, "rb"), content_type=static_file.content_type)
+        if response.status_code == 200:
+            response["Content-Length"] = str(variant.size)
+        response["Cache-Control"] = static_file.cache_control
+        response["ETag"] = variant.etag
+        response["Last-Modified"] = variant.last_modified
+        if encoding is not None:
+            response["Content-Encoding"] = encoding
+        if len(static_file.variants) > 1:
+            response["Vary"] = "Accept-Encoding"
+        return response
+
+    def choose_encoding(self, accept_encoding, variants):
+        """Returns the preferred encoding of ``variants`` accepted by the client, None for identity."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in variants:
+                return encoding
+        return None
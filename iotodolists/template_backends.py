@@ -0,0 +1,32 @@
+"""
+Template backend reporting rendering time to
+:class:`iotodolists.performance.PerformanceMiddleware`.
+
+Timing every render, not only the response of a TemplateResponse, also
+counts fragments the views render themselves with ``render_to_string``,
+like the cached items of a list.
+"""
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .performance import timed_template
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with timed_template():
+            return super(TimedTemplate, self).render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose templates are timed by :func:`iotodolists.performance.timed_template`."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,27 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..staticfiles import CompressedManifestStaticFilesStorage
+
+
+register = template.Library()
+
+TAGS = {
+    ".css": '<link href="{}" rel="stylesheet">',
+    ".js": '<script src="{}"></script>',
+}
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    Includes static bundle ``name`` from ``STATIC_BUNDLES`` once it is
+    built by collectstatic, otherwise its sources one by one.
+    """
+    tag = TAGS[name[name.rindex("."):]]
+    if not settings.DEBUG and isinstance(staticfiles_storage, CompressedManifestStaticFilesStorage):
+        return format_html(tag, static(name))
+    return format_html_join("\n", tag, ((static(source),) for source in settings.STATIC_BUNDLES[name]))
@@ -1,7 +1,544 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3 import base as sqlite3_base
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.cache import caches
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from superlists.cache import get_list_fragment, get_list_version, set_list_fragment
+from superlists.models import ToDoList, ToDoListItem
+
+from . import metrics, ratelimit, staticfiles
+from .compression import CompressionMiddleware
+from .db import routers
+from .db.health import ConnectionHealthCheckMiddleware
+from .db.pool import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout
+from .db.routers import ReplicaMiddleware
+from .performance import PerformanceMiddleware
+from .ratelimit import RateLimitMiddleware
+from .staticfiles import StaticFilesMiddleware
 
 
 class SmokeTest(TestCase):
 
     def test_math(self):
         self.assertEqual(1 + 1, 2)
+
+
+class PooledSQLiteDatabaseWrapper(PooledDatabaseWrapperMixin, sqlite3_base.DatabaseWrapper):
+    pass
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """
+    Collection of tests for ConnectionPool class, using SQLite connections.
+    """
+
+    def connect(self):
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    def test_connection_is_reused(self):
+        """
+        Connection returned to the pool should be handed out again.
+        """
+        pool = ConnectionPool(max_size=2)
+        first = pool.checkout(self.connect)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(self.connect), first)
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["connects"], 1)
+        self.assertEqual(stats["in_use"], 1)
+
+    def test_exhausted_pool_times_out(self):
+        """
+        Checkout from exhausted pool should wait and give up after timeout.
+        """
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        pool.checkout(self.connect)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(self.connect)
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_broken_connection_is_replaced(self):
+        """
+        Idle connection failing the health check should be replaced by a new one.
+        """
+        pool = ConnectionPool(max_size=1, check=lambda connection: False, check_interval=0)
+        broken = pool.checkout(self.connect)
+        pool.checkin(broken)
+        self.assertIsNot(pool.checkout(self.connect), broken)
+        self.assertEqual(pool.stats()["reconnects"], 1)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_database_wrapper_returns_connection_to_pool(self):
+        """
+        Closing Django connection should return it to the pool of its alias.
+        """
+        database = tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False)
+        self.addCleanup(os.remove, database.name)
+        settings_dict = dict(connection.settings_dict, NAME=database.name, POOL={"MAX_SIZE": 1})
+        wrapper = PooledSQLiteDatabaseWrapper(settings_dict, alias="pool_test")
+        wrapper.ensure_connection()
+        raw_connection = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw_connection)
+        self.assertEqual(wrapper.pool.stats()["connects"], 1)
+
+
+class ConnectionHealthCheckMiddlewareTest(SimpleTestCase):
+    """
+    Collection of tests for ConnectionHealthCheckMiddleware class.
+    """
+
+    def make_connection(self, usable):
+        return Mock(settings_dict={"HEALTH_CHECK_INTERVAL": 0}, in_atomic_block=False,
+                    health_checked_at=0, **{"is_usable.return_value": usable})
+
+    def test_broken_connection_is_closed(self):
+        """
+        Connection failing the health check should be closed to reconnect.
+        """
+        broken = self.make_connection(usable=False)
+        ConnectionHealthCheckMiddleware.check(broken)
+        broken.close.assert_called_once_with()
+
+    def test_usable_connection_is_kept(self):
+        """
+        Healthy connection should be left open.
+        """
+        healthy = self.make_connection(usable=True)
+        ConnectionHealthCheckMiddleware.check(healthy)
+        healthy.close.assert_not_called()
+
+
+class PerformanceMiddlewareTest(TestCase):
+    """
+    Collection of tests for PerformanceMiddleware class and metrics endpoint.
+    """
+
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.reset()
+
+    def get_metrics(self):
+        User.objects.create_superuser("admin", "admin@test.test", "admin123")
+        self.client.login(username="admin", password="admin123")
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_is_recorded_by_view_name(self):
+        """
+        Handled request should be counted in every histogram under its URL name.
+        """
+        self.client.get(reverse("index"))
+        text = self.get_metrics()
+        self.assertIn('superlists_request_duration_seconds_count{view="index"} 1', text)
+        self.assertIn('superlists_db_queries_count{view="index"} 1', text)
+        self.assertIn('superlists_template_duration_seconds_count{view="index"} 1', text)
+        self.assertIn('superlists_response_size_bytes_count{view="index"} 1', text)
+        self.assertNotIn('superlists_db_queries_sum{view="index"} 0.0', text)
+
+    def test_metrics_forbidden_for_anonymous(self):
+        """
+        Metrics should be hidden from users who are not staff members.
+        """
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_with_token(self):
+        """
+        Metrics should be available with bearer token, e.g. for Prometheus.
+        """
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE superlists_request_duration_seconds histogram", response.content.decode())
+
+    @override_settings(PERFORMANCE_BUDGETS={"index": {"queries": 0}})
+    def test_over_budget_is_logged(self):
+        """
+        Request running more queries than allowed should log a warning.
+        """
+        with self.assertLogs("iotodolists.performance", "WARNING") as logs:
+            self.client.get(reverse("index"))
+        self.assertIn("View index over budget", logs.output[0])
+
+    def test_fragments_rendered_by_view_are_timed(self):
+        """
+        Templates rendered by the view itself should count as template time.
+        """
+        def view(request):
+            item = ToDoListItem(id=1, todo_list_id=1, name="Task")
+            return HttpResponse(render_to_string("superlists/list_item.html", {"todo_list_item": item}))
+
+        PerformanceMiddleware(view)(RequestFactory().get("/"))
+        _, total = metrics.TEMPLATE_DURATION.values["unmatched"]
+        self.assertGreater(total, 0)
+
+    @override_settings(PERFORMANCE_DEFAULT_BUDGET={}, PERFORMANCE_BUDGETS={"restore": {"queries": 0}})
+    def test_budget_picked_by_view(self):
+        """
+        Request should be held to the budget named by request.performance_budget.
+        """
+        def view(request):
+            request.performance_budget = "restore"
+            ToDoList.objects.exists()
+            return HttpResponse()
+
+        with self.assertLogs("iotodolists.performance", "WARNING") as logs:
+            PerformanceMiddleware(view)(RequestFactory().get("/"))
+        self.assertIn("View restore over budget", logs.output[0])
+
+
+@override_settings(DATABASE_REPLICAS=["default"])
+class ReplicaMiddlewareTest(TestCase):
+    """
+    Collection of tests for ReplicaMiddleware class and ReplicaRouter,
+    the default database stands in for a replica.
+    """
+
+    def setUp(self):
+        routers.ReplicaHealth.checked.clear()
+
+    def handle(self, request, view=None):
+        """Returns database the view would read from and the response."""
+        request.resolver_match = resolve(request.path)
+        used = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            used.append(routers.get_read_database())
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        response = middleware(request)
+        self.assertIsNone(routers.get_read_database())
+        return used[0], response
+
+    def test_read_view_uses_replica(self):
+        """
+        Safe request to a read-heavy view should read from a replica.
+        """
+        used, response = self.handle(RequestFactory().get(reverse("index")))
+        self.assertEqual(used, "default")
+        self.assertNotIn(settings.DATABASE_PRIMARY_STICKY_COOKIE, response.cookies)
+
+    def test_other_view_uses_primary(self):
+        """
+        Views not listed in DATABASE_REPLICA_VIEWS should read from the primary.
+        """
+        used, _ = self.handle(RequestFactory().get(reverse("export")))
+        self.assertIsNone(used)
+
+    def test_write_makes_client_sticky(self):
+        """
+        After a successful write the client should read from the primary.
+        """
+        used, response = self.handle(RequestFactory().post(reverse("create_list")))
+        self.assertIsNone(used)
+        cookie = response.cookies[settings.DATABASE_PRIMARY_STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.DATABASE_PRIMARY_STICKY_SECONDS)
+
+        request = RequestFactory().get(reverse("index"))
+        request.COOKIES[settings.DATABASE_PRIMARY_STICKY_COOKIE] = "1"
+        used, _ = self.handle(request)
+        self.assertIsNone(used)
+
+    def test_lagging_replica_is_skipped(self):
+        """
+        Replica failing the health check should not be used until checked again.
+        """
+        with patch.object(routers.ReplicaHealth, "check", return_value=False) as check:
+            used, _ = self.handle(RequestFactory().get(reverse("index")))
+            self.handle(RequestFactory().get(reverse("index")))
+        self.assertIsNone(used)
+        self.assertEqual(check.call_count, 1)
+
+    def test_failing_replica_falls_back_to_primary(self):
+        """
+        View failing on a replica should be run again on the primary.
+        """
+        used = []
+
+        def view(request):
+            used.append(routers.get_read_database())
+            if routers.get_read_database() is not None:
+                raise OperationalError("replica is down")
+            return HttpResponse("primary")
+
+        request = RequestFactory().get(reverse("index"))
+        request.resolver_match = resolve(request.path)
+        middleware = ReplicaMiddleware(lambda request: None)
+        middleware.process_view(request, view, (), {})
+        with self.assertLogs("iotodolists.db.routers", "WARNING"):
+            try:
+                view(request)
+            except OperationalError as exception:
+                response = middleware.process_exception(request, exception)
+        self.assertEqual(response.content, b"primary")
+        self.assertEqual(used, ["default", None])
+        self.assertFalse(routers.ReplicaHealth.checked["default"][0])
+
+    def test_list_page_from_replica_is_cached(self):
+        """
+        Items of the list page read from a replica should be cached.
+        """
+        todo_list = ToDoList.objects.create(name="Replicated")
+        ToDoListItem.objects.create(name="Task", todo_list=todo_list)
+        self.assertContains(self.client.get(reverse("list", args=[todo_list.id])), "Task")
+        todo_list.refresh_from_db()
+        self.assertIsNotNone(get_list_fragment(todo_list.id, get_list_version(todo_list.id), todo_list.last_modified))
+
+    def test_items_from_lagging_replica_are_not_shown_from_primary(self):
+        """
+        Items cached from a replica behind the primary should not be served to primary reads.
+        """
+        todo_list = ToDoList.objects.create(name="Replicated")
+        lagging = ToDoList.objects.get(pk=todo_list.pk).last_modified
+        ToDoListItem.objects.create(name="New task", todo_list=todo_list)
+        # Rendered by a replica not having the new task yet
+        set_list_fragment(todo_list.id, get_list_version(todo_list.id), lagging, "Stale items")
+        with self.settings(DATABASE_REPLICAS=[]):
+            response = self.client.get(reverse("list", args=[todo_list.id]))
+        self.assertContains(response, "New task")
+        self.assertNotContains(response, "Stale items")
+
+    def test_replicas_are_not_migrated(self):
+        """
+        Router should send writes to the primary and skip replicas in migrations.
+        """
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_write(ToDoList), "default")
+        self.assertFalse(router.allow_migrate("default", "superlists"))
+
+
+@override_settings(RATE_LIMITS={"login": {"requests": 2, "period": 60}})
+class RateLimitTest(TestCase):
+    """
+    Collection of tests for RateLimitMiddleware and token bucket backends.
+    """
+
+    def setUp(self):
+        ratelimit._backend = None
+        RateLimitMiddleware.counters.clear()
+
+    def tearDown(self):
+        ratelimit._backend = None
+
+    def login(self, username="alice", address="10.0.0.1"):
+        return self.client.post(reverse("login"), {"username": username, "password": "secret"},
+                                REMOTE_ADDR=address)
+
+    def test_exhausted_bucket_is_refused(self):
+        """
+        Request over the limit should get 429 with seconds until the next token.
+        """
+        self.assertEqual(self.login().status_code, 302)
+        self.assertEqual(self.login().status_code, 302)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(RateLimitMiddleware.stats().get("login"), 1)
+
+    def test_username_is_limited_across_addresses(self):
+        """
+        Guessing passwords of one user should be throttled from any address.
+        """
+        self.login(address="10.0.0.1")
+        self.login(address="10.0.0.2")
+        self.assertEqual(self.login(address="10.0.0.3").status_code, 429)
+        self.assertEqual(self.login(username="bob", address="10.0.0.4").status_code, 302)
+
+    def test_address_is_limited_across_usernames(self):
+        """
+        Trying many usernames from one address should be throttled.
+        """
+        self.login(username="alice")
+        self.login(username="bob")
+        self.assertEqual(self.login(username="carol").status_code, 429)
+
+    def test_refused_user_leaves_shared_address_alone(self):
+        """
+        Requests refused by the user's bucket should not use up tokens of the address.
+        """
+        self.login(address="10.0.0.1")
+        self.login(address="10.0.0.2")
+        self.assertEqual(self.login(address="10.0.0.3").status_code, 429)
+        self.assertEqual(self.login(address="10.0.0.3").status_code, 429)
+        self.assertEqual(self.login(username="bob", address="10.0.0.3").status_code, 302)
+        self.assertEqual(self.login(username="bob", address="10.0.0.3").status_code, 302)
+
+    def test_other_requests_are_not_limited(self):
+        """
+        Safe requests and views without a limit should never be throttled.
+        """
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse("login")).status_code, 302)
+            self.assertEqual(self.client.post(reverse("create_list"), {"name": "List"}).status_code, 302)
+
+    def test_bucket_refills_over_time(self):
+        """
+        Tokens should come back at the configured rate, up to the capacity.
+        """
+        state, wait = ratelimit.take(None, 2, 0.5, now=100)
+        state, wait = ratelimit.take(state, 2, 0.5, now=100)
+        self.assertEqual(wait, 0)
+        state, wait = ratelimit.take(state, 2, 0.5, now=100.5)
+        self.assertEqual(wait, 1.5)
+        state, wait = ratelimit.take(state, 2, 0.5, now=102)
+        self.assertEqual(wait, 0)
+        self.assertEqual(ratelimit.refill(state, 2, 0.5, now=1000), 2)
+
+    @override_settings(RATE_LIMIT_BACKEND="iotodolists.ratelimit.CacheBackend")
+    def test_cache_backend(self):
+        """
+        Buckets kept in the cache should limit requests like local ones.
+        """
+        caches["default"].clear()
+        self.login()
+        self.login()
+        self.assertEqual(self.login().status_code, 429)
+        self.assertIsInstance(ratelimit.get_backend(), ratelimit.CacheBackend)
+
+
+class StaticFilesTest(SimpleTestCase):
+    """
+    Collection of tests for static bundles, precompression and StaticFilesMiddleware.
+    """
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.root.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as static_file:
+            static_file.write(content)
+
+    def get_middleware(self):
+        with override_settings(STATIC_ROOT=self.root.name, DEBUG=False):
+            return StaticFilesMiddleware(lambda request: HttpResponse("view"))
+
+    def test_css_bundle_urls_are_rebased(self):
+        """
+        Relative urls in bundled CSS should point to the same files from the bundle.
+        """
+        sources = {
+            "vendor/lib/css/lib.min.css": b"a{background:url(../img/a.png?#x)}",
+            "css/style.css": b"/* comment */\nbody {\n    color: white;\n}\n",
+        }
+        content = staticfiles.build_bundle("css/site.css", list(sources), lambda source: io.BytesIO(sources[source]))
+        self.assertEqual(content, 'a{background:url("../vendor/lib/img/a.png?#x")}\nbody{color:white}\n')
+
+    def test_collectstatic_builds_compressed_bundles(self):
+        """
+        Collected bundles should be hashed, listed in the manifest and precompressed.
+        """
+        storage = "iotodolists.staticfiles.CompressedManifestStaticFilesStorage"
+        with override_settings(STATIC_ROOT=self.root.name, STATICFILES_STORAGE=storage):
+            call_command("collectstatic", interactive=False, verbosity=0)
+        with open(os.path.join(self.root.name, "staticfiles.json")) as manifest:
+            paths = json.load(manifest)["paths"]
+        self.assertTrue(os.path.exists(os.path.join(self.root.name, paths["js/site.js"] + ".gz")))
+        with open(os.path.join(self.root.name, paths["css/site.css"])) as bundle:
+            self.assertIn(paths["vendor/bootstrap/fonts/glyphicons-halflings-regular.woff2"], bundle.read())
+
+    def test_compressed_variant_is_served(self):
+        """
+        Client accepting gzip should get the precompressed variant, cached forever.
+        """
+        self.write("css/site.0123456789ab.css", b"body{}" * 100)
+        self.write("css/site.0123456789ab.css.gz", b"compressed")
+        self.write("staticfiles.json", json.dumps({"paths": {"css/site.css": "css/site.0123456789ab.css"}}).encode())
+        middleware = self.get_middleware()
+        request = RequestFactory().get("/static/css/site.0123456789ab.css", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        response = middleware(request)
+        self.assertEqual(b"".join(response.streaming_content), b"compressed")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Cache-Control"], StaticFilesMiddleware.IMMUTABLE_CACHE_CONTROL)
+        response.close()
+
+        request = RequestFactory().get("/static/css/site.0123456789ab.css", HTTP_ACCEPT_ENCODING="gzip;q=0",
+                                       HTTP_IF_NONE_MATCH=response["ETag"])
+        response = middleware(request)
+        self.assertEqual(b"".join(response.streaming_content), b"body{}" * 100)
+        self.assertNotIn("Content-Encoding", response)
+        response.close()
+
+    def test_unchanged_file_is_not_sent(self):
+        """
+        Request with the current ETag should get 304, unhashed names are cached briefly.
+        """
+        self.write("img/logo.svg", b"<svg></svg>")
+        middleware = self.get_middleware()
+        etag = middleware(RequestFactory().head("/static/img/logo.svg"))["ETag"]
+        response = middleware(RequestFactory().get("/static/img/logo.svg", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], "public, max-age=%d" % settings.STATIC_MAX_AGE)
+
+    def test_unknown_path_reaches_view(self):
+        """
+        Requests for files missing in STATIC_ROOT should be left to the views.
+        """
+        self.write("img/logo.svg", b"<svg></svg>")
+        response = self.get_middleware()(RequestFactory().get("/static/img/missing.svg"))
+        self.assertEqual(response.content, b"view")
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    """
+    Collection of tests for CompressionMiddleware class.
+    """
+
+    def compress(self, response, accept_encoding="gzip, deflate"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_large_page_is_compressed(self):
+        """
+        HTML page over the threshold should be gzipped for clients accepting it.
+        """
+        content = b"<p>Superlists</p>" * 100
+        response = HttpResponse(content)
+        response["ETag"] = '"abc"'
+        response = self.compress(response)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(gzip.decompress(response.content), content)
+
+    def test_small_or_streamed_responses_are_left_alone(self):
+        """
+        Small responses, event streams and other content types should be sent as they are.
+        """
+        small = self.compress(HttpResponse(b"<p>Small</p>"))
+        self.assertNotIn("Content-Encoding", small)
+        stream = self.compress(StreamingHttpResponse(iter([b"data\n\n"] * 1000), content_type="text/event-stream"))
+        self.assertNotIn("Content-Encoding", stream)
+        image = self.compress(HttpResponse(b"\x89PNG" * 1000, content_type="image/png"))
+        self.assertNotIn("Content-Encoding", image)
+
+    def test_identity_is_sent_when_not_accepted(self):
+        """
+        Client not accepting any supported coding should get the plain page.
+        """
+        response = self.compress(HttpResponse(b"<p>Superlists</p>" * 100), accept_encoding="gzip;q=0")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
@@ -1,10 +1,15 @@
 from django.conf.urls import url, include
 from django.contrib import admin
 
+from . import views
+
+
 urlpatterns = [
     url(r'^', include('superlists.urls')),
     url(r'^accounts/', include('accounts.urls')),
     # Django urls
+    url(r'^metrics/$', views.performance_metrics, name='metrics'),
     url(r'^admin/doc/', include('django.contrib.admindocs.urls')),
+    url(r'^admin/db-stats/$', views.database_stats, name='database_stats'),
     url(r'^admin/', admin.site.urls),
 ]
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+
+from accounts.sessions import SessionStore
+from . import metrics
+from .db import pool
+from .db.health import ConnectionHealthCheckMiddleware
+from .ratelimit import RateLimitMiddleware
+
+
+@staff_member_required
+def database_stats(request):
+    """
+    Returns statistics of connection pools, health checks and sessions
+    of the worker process serving the request.
+    """
+    return JsonResponse({
+        "pools": pool.get_stats(),
+        "health_checks": ConnectionHealthCheckMiddleware.stats(),
+        "sessions": SessionStore.stats(),
+    })
+
+
+def performance_metrics(request):
+    """
+    Returns request metrics of the worker process in Prometheus text format.
+    Available to staff members, or with ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    token_valid = bool(settings.METRICS_TOKEN) and constant_time_compare(
+        authorization, "Bearer %s" % settings.METRICS_TOKEN)
+    if not token_valid and not (request.user.is_active and request.user.is_staff):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    pool_stats = {
+        (("database", alias), ("stat", stat)): value
+        for alias, stats in pool.get_stats().items() for stat, value in stats.items()
+    }
+    health_stats = {
+        (("stat", stat),): value for stat, value in ConnectionHealthCheckMiddleware.stats().items()
+    }
+    session_stats = {(("stat", stat),): value for stat, value in SessionStore.stats().items()}
+    rate_limit_stats = {(("view", view),): value for view, value in RateLimitMiddleware.stats().items()}
+    text = metrics.expose(extra_gauges=(
+        ("superlists_db_pool", "Statistics of database connection pools.", pool_stats),
+        ("superlists_db_health_checks", "Statistics of persistent connection health checks.", health_stats),
+        ("superlists_sessions", "Session reads and writes of the accounts.sessions engine.", session_stats),
+        ("superlists_rate_limited", "Requests refused by RateLimitMiddleware.", rate_limit_stats),
+    ))
+    return HttpResponse(text, content_type="text/plain; version=0.0.4")
@@ -43,20 +43,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'iotodolists.staticfiles.StaticFilesMiddleware',
+    'iotodolists.performance.PerformanceMiddleware',
+    'iotodolists.compression.CompressionMiddleware',
+    'iotodolists.db.health.ConnectionHealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'iotodolists.ratelimit.RateLimitMiddleware',
+    'accounts.middleware.UserProfileMiddleware',
+    'iotodolists.db.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'iotodolists.urls'
 
+# Rendering time of every template is reported to PerformanceMiddleware
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'iotodolists.template_backends.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -66,12 +74,28 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'libraries': {
+                'bundles': 'iotodolists.templatetags.bundles',
+            },
         },
     },
 ]
 
 WSGI_APPLICATION = 'iotodolists.wsgi.application'
 
+# Safe requests to DATABASE_REPLICA_VIEWS read from one of DATABASE_REPLICAS
+# (aliases in DATABASES). Replicas lagging more than DATABASE_REPLICA_MAX_LAG
+# seconds or failing are skipped, their health is checked at most every
+# DATABASE_REPLICA_CHECK_INTERVAL seconds. Clients read from the primary for
+# DATABASE_PRIMARY_STICKY_SECONDS after a write to see their own changes.
+DATABASE_ROUTERS = ['iotodolists.db.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_VIEWS = ['index', 'list', 'user', 'search']
+DATABASE_REPLICA_MAX_LAG = 5
+DATABASE_REPLICA_CHECK_INTERVAL = 10
+DATABASE_PRIMARY_STICKY_COOKIE = 'primary_sticky'
+DATABASE_PRIMARY_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
@@ -115,6 +139,19 @@ STATICFILES_DIRS = (
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, '..', 'static')
 
+# Concatenated by collectstatic with CompressedManifestStaticFilesStorage,
+# templates include them with {% bundle %}. Vendored sources are minified
+# already, other CSS is minified when bundled.
+STATIC_BUNDLES = {
+    'css/site.css': ['vendor/bootstrap/css/bootstrap.min.css', 'css/style.css'],
+    'js/site.js': ['vendor/jquery/jquery.min.js', 'vendor/bootstrap/js/bootstrap.min.js'],
+}
+
+# StaticFilesMiddleware serves files from STATIC_ROOT when DEBUG is off.
+# Names with a content hash are cached by browsers forever, others
+# for STATIC_MAX_AGE seconds.
+STATIC_MAX_AGE = 60
+
 
 EMAIL_HOST = 'smtp.sendgrid.net'
 EMAIL_PORT = 587
@@ -122,4 +159,96 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('SENDGRID_USERNAME')
 EMAIL_HOST_PASSWORD = os.environ.get('SENDGRID_PASSWORD')
 
+# Outgoing emails are queued in the database and sent by
+# `manage.py send_queued_email`, failed ones are retried with
+# exponentially growing delay (in seconds)
+EMAIL_QUEUE_BATCH_SIZE = 50
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+EMAIL_QUEUE_RETRY_DELAY = 60
+
 LOGIN_URL = '/'
+
+# Profile of the logged in user is cached for this many seconds,
+# saving or deleting the profile drops it from the cache
+ACCOUNTS_USER_PROFILE_CACHE_TIMEOUT = 60 * 5
+
+# Requests slower than `time` seconds or running more than `queries`
+# queries are logged as warnings, budgets are set per URL name or per
+# name a view picks for occasional extra work
+PERFORMANCE_DEFAULT_BUDGET = {'time': 0.5, 'queries': 20}
+PERFORMANCE_BUDGETS = {
+    'index': {'time': 0.2, 'queries': 5},
+    'list': {'time': 0.2, 'queries': 5},
+    'create_item': {'time': 0.2, 'queries': 10},
+    'delete_item': {'time': 0.2, 'queries': 10},
+    'user': {'time': 0.3, 'queries': 8},
+    'restore_list': {'time': 0.5, 'queries': 15},
+    'delete_accounts': {'time': 1, 'queries': 30},
+}
+
+# POSTs to these views are limited per client IP and per username with token
+# buckets holding `requests` tokens, refilled over `period` seconds. Buckets
+# of LocalBackend are per process, CacheBackend shares them through
+# RATE_LIMIT_CACHE. Behind a proxy the client address comes from a header,
+# e.g. 'HTTP_X_FORWARDED_FOR'.
+RATE_LIMIT_BACKEND = 'iotodolists.ratelimit.LocalBackend'
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMIT_CLIENT_IP_HEADER = 'REMOTE_ADDR'
+RATE_LIMITS = {
+    'login': {'requests': 10, 'period': 60},
+    'register': {'requests': 5, 'period': 60 * 10},
+    'create_list': {'requests': 30, 'period': 60},
+    'create_item': {'requests': 60, 'period': 60},
+    'items': {'requests': 60, 'period': 60},
+}
+
+# Responses of these types larger than COMPRESSION_MIN_SIZE bytes are
+# compressed by CompressionMiddleware. Levels favour speed, they are paid
+# on every request unlike precompressed static files.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/csv',
+    'application/json', 'application/javascript',
+)
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+
+# Token allowing Prometheus to scrape /metrics/ without logging in
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Number of lists displayed on a single page of the public feed
+SUPERLISTS_PAGE_SIZE = 20
+
+# Admin changelists on PostgreSQL show the planner's estimate instead of
+# counting exactly when it is above this number of rows
+SUPERLISTS_ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Rendered items of a list are cached under a version bumped on every write,
+# so entries never go stale and may be kept for long
+SUPERLISTS_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Maximum number of item operations accepted in one batch request
+SUPERLISTS_BATCH_MAX_OPERATIONS = 1000
+
+# Number of exported rows sent to the client at once
+SUPERLISTS_EXPORT_CHUNK_SIZE = 500
+
+# Number of imported items inserted at once
+SUPERLISTS_IMPORT_BATCH_SIZE = 1000
+
+# Retention policy: lists not modified for this many days are moved with
+# their items to the archive by `manage.py archive_lists` and restored when
+# visited, see superlists.archive
+SUPERLISTS_ARCHIVE_AFTER_DAYS = 90
+
+# Live updates of lists sent as server-sent events. Every open stream holds
+# a worker thread, so their number per process and lifetime are limited;
+# browsers reconnect after SUPERLISTS_EVENTS_RETRY seconds. LocalBroker only
+# reaches viewers served by the same process, see superlists.events.
+# PostgresBroker finds viewers of other processes through the default
+# cache, which has to be shared by all of them.
+SUPERLISTS_EVENTS_BROKER = 'superlists.events.LocalBroker'
+SUPERLISTS_EVENTS_MAX_STREAMS = 10
+SUPERLISTS_EVENTS_STREAM_TIMEOUT = 60 * 5
+SUPERLISTS_EVENTS_HEARTBEAT = 15
+SUPERLISTS_EVENTS_RETRY = 3
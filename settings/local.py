@@ -13,4 +13,13 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': 'db.sqlite3',
     }
-}
\ No newline at end of file
+}
+
+# Reads of a replica can be tried with a copy of the database,
+# e.g. `cp db.sqlite3 replica.sqlite3 && LOCAL_REPLICA=replica.sqlite3 ...`
+if os.environ.get('LOCAL_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['LOCAL_REPLICA'],
+    }
+    DATABASE_REPLICAS = ['replica']
@@ -17,5 +17,68 @@ DATABASES = {
         'PASSWORD': os.environ['RDS_PASSWORD'],
         'HOST': os.environ['RDS_HOSTNAME'],
         'PORT': os.environ['RDS_PORT'],
+        # Keep connections open between requests, idle ones are pinged
+        # by ConnectionHealthCheckMiddleware before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'HEALTH_CHECK_INTERVAL': int(os.environ.get('DB_HEALTH_CHECK_INTERVAL', 30)),
     }
-}
\ No newline at end of file
+}
+
+# Optional in-process pool shared by all threads of a worker process,
+# connections are returned to it at the end of every request
+if os.environ.get('DB_POOL_MAX_SIZE'):
+    DATABASES['default'].update({
+        'ENGINE': 'iotodolists.db.backends.postgresql_pooled',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.environ['DB_POOL_MAX_SIZE']),
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            'CHECK_INTERVAL': int(os.environ.get('DB_HEALTH_CHECK_INTERVAL', 30)),
+        },
+    })
+
+# Read replicas of the default database, comma separated host names
+for number, host in enumerate(filter(None, os.environ.get('RDS_REPLICA_HOSTNAMES', '').split(','))):
+    DATABASES['replica%d' % number] = dict(DATABASES['default'], HOST=host.strip())
+    DATABASE_REPLICAS.append('replica%d' % number)
+
+# Bundled, hashed and precompressed static files, see iotodolists.staticfiles
+STATICFILES_STORAGE = 'iotodolists.staticfiles.CompressedManifestStaticFilesStorage'
+
+# List events have to reach viewers connected to any worker process
+SUPERLISTS_EVENTS_BROKER = 'superlists.events.PostgresBroker'
+
+# Caches have to be shared by all worker processes, otherwise versioned
+# fragments invalidated in one process would be served by another.
+if 'MEMCACHED_LOCATION' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'].split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+# Buckets have to be shared by all worker processes, which memcached does
+# cheaply; the database cache would add two queries to every limited POST.
+if 'MEMCACHED_LOCATION' in os.environ:
+    RATE_LIMIT_BACKEND = 'iotodolists.ratelimit.CacheBackend'
+RATE_LIMIT_CLIENT_IP_HEADER = os.environ.get('RATE_LIMIT_CLIENT_IP_HEADER', 'REMOTE_ADDR')
+
+# Sessions: "cached_db" reads them from the cache and writes through to the
+# database, "signed_cookies" keeps them in the client's cookie and "db" is
+# Django's default. Reading sessions from the database cache saves nothing,
+# so cached_db is only the default with memcached.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'accounts.sessions',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get(
+    'SESSION_MODE', 'cached_db' if 'MEMCACHED_LOCATION' in os.environ else 'db')]
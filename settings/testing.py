@@ -1 +1,5 @@
-from .local import *
\ No newline at end of file
+from .local import *
+
+# Token buckets live in the test process and would carry over between
+# tests, limiter tests enable limits with override_settings
+RATE_LIMITS = {}
@@ -1,7 +1,135 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 
-from .models import ToDoList, ToDoListItem
+from . import search
+from .archive import restore_list
+from .cache import invalidate_list
+from .deletion import delete_lists
+from .events import publish_list_event
+from .models import ArchivedToDoList, ToDoList, ToDoListItem, delete_rows, recount_lists
+from .pagination import EstimatedCountPaginator
 
 
-admin.site.register(ToDoList)
-admin.site.register(ToDoListItem)
+def _lists_changed(todo_list_ids, using=None):
+    """Replaces signal receivers skipped by bulk writes to items of the lists."""
+    for todo_list_id in todo_list_ids:
+        invalidate_list(todo_list_id, using)
+        publish_list_event(todo_list_id, {"type": "reset"}, using=using)
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    Admin of tables too large to count, to list without an index or to
+    delete row by row: the changelist never counts the whole table and
+    actions replace the default delete, which fetches every object.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def get_actions(self, request):
+        actions = super(ScalableModelAdmin, self).get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+
+@admin.register(ToDoList)
+class ToDoListAdmin(ScalableModelAdmin):
+    """
+    Lists newest first, matching the public feed index when filtered by
+    privacy. Owners are picked by id, not from a drop-down of all profiles.
+    """
+    list_display = ("name", "creation_date", "is_private", "item_count", "completed_item_count", "last_modified")
+    list_filter = ("is_private",)
+    date_hierarchy = "creation_date"
+    ordering = ("-creation_date", "-id")
+    raw_id_fields = ("user_profile",)
+    actions = ("make_private", "make_public", "delete_lists")
+
+    def set_private(self, request, queryset, is_private):
+        todo_list_ids = list(queryset.values_list("id", flat=True))
+        with transaction.atomic(using=queryset.db):
+            updated = ToDoList.objects.using(queryset.db).filter(pk__in=todo_list_ids).update(
+                is_private=is_private, last_modified=timezone.now())
+            _lists_changed(todo_list_ids, queryset.db)
+        self.message_user(request, "%d lists updated." % updated)
+
+    def make_private(self, request, queryset):
+        self.set_private(request, queryset, True)
+    make_private.short_description = "Make selected lists private"
+
+    def make_public(self, request, queryset):
+        self.set_private(request, queryset, False)
+    make_public.short_description = "Make selected lists public"
+
+    def has_delete_permission(self, request, obj=None):
+        # The delete view collects and shows every task of the list, lists
+        # are deleted by the action instead
+        return False
+
+    def delete_lists(self, request, queryset):
+        deleted = delete_lists(queryset.values_list("id", flat=True), using=queryset.db)
+        self.message_user(request, "%d lists deleted, their tasks will be purged." % deleted)
+    delete_lists.short_description = "Delete selected lists with their tasks"
+
+
+@admin.register(ToDoListItem)
+class ToDoListItemAdmin(ScalableModelAdmin):
+    """
+    Tasks newest first, with their list joined in the same query.
+    """
+    list_display = ("name", "todo_list", "completed")
+    list_select_related = ("todo_list",)
+    list_filter = ("completed",)
+    ordering = ("-id",)
+    raw_id_fields = ("todo_list",)
+    actions = ("mark_completed", "mark_not_completed", "delete_items")
+
+    def set_completed(self, request, queryset, completed):
+        todo_list_ids = set(queryset.values_list("todo_list_id", flat=True).order_by())
+        with transaction.atomic(using=queryset.db):
+            updated = queryset.update(completed=completed)
+            recount_lists(todo_list_ids, using=queryset.db)
+            _lists_changed(todo_list_ids, queryset.db)
+        self.message_user(request, "%d tasks updated." % updated)
+
+    def mark_completed(self, request, queryset):
+        self.set_completed(request, queryset, True)
+    mark_completed.short_description = "Mark selected tasks as completed"
+
+    def mark_not_completed(self, request, queryset):
+        self.set_completed(request, queryset, False)
+    mark_not_completed.short_description = "Mark selected tasks as not completed"
+
+    def delete_items(self, request, queryset):
+        rows = list(queryset.values_list("id", "todo_list_id").order_by())
+        todo_list_ids = {todo_list_id for _, todo_list_id in rows}
+        with transaction.atomic(using=queryset.db):
+            search.unindex_items([item_id for item_id, _ in rows], using=queryset.db)
+            deleted = delete_rows(queryset)
+            recount_lists(todo_list_ids, using=queryset.db)
+            _lists_changed(todo_list_ids, queryset.db)
+        self.message_user(request, "%d tasks deleted." % deleted)
+    delete_items.short_description = "Delete selected tasks"
+
+
+@admin.register(ArchivedToDoList)
+class ArchivedToDoListAdmin(ScalableModelAdmin):
+    """
+    Archived lists, newest first. Compressed documents are never loaded,
+    lists are restored by the action or by a visit.
+    """
+    list_display = ("id", "name", "creation_date", "last_modified", "archived_at")
+    ordering = ("-id",)
+    raw_id_fields = ("user_profile",)
+    exclude = ("data",)
+    actions = ("restore_lists",)
+
+    def get_queryset(self, request):
+        return super(ArchivedToDoListAdmin, self).get_queryset(request).defer("data")
+
+    def restore_lists(self, request, queryset):
+        restored = sum(restore_list(todo_list_id) for todo_list_id in queryset.values_list("id", flat=True))
+        self.message_user(request, "%d lists restored." % restored)
+    restore_lists.short_description = "Restore selected lists"
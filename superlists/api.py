@@ -0,0 +1,144 @@
+import hashlib
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import urlencode
+from django.views.generic import View
+
+from accounts.middleware import get_user_profile_or_none
+from .archive import get_or_restore
+from .cache import get_list_version, get_list_versions, peek_list_version
+from .models import ArchivedToDoList, ToDoList
+from .pagination import CursorPaginator
+
+
+def serialize_todo_list(todo_list):
+    return {
+        "id": todo_list.id,
+        "name": todo_list.name,
+        "creation_date": todo_list.creation_date.isoformat(),
+        "is_private": todo_list.is_private,
+        "item_count": todo_list.item_count,
+        "completed_item_count": todo_list.completed_item_count,
+        "last_modified": todo_list.last_modified.isoformat(),
+        "url": todo_list.get_absolute_url(),
+    }
+
+
+def serialize_todo_list_item(todo_list_item):
+    return {
+        "id": todo_list_item.id,
+        "name": todo_list_item.name,
+        "completed": todo_list_item.completed,
+    }
+
+
+class ConditionalJsonView(View):
+    """
+    Base for read-only JSON views answering ``If-None-Match`` requests.
+
+    ``get_etag`` runs first and must be cheap; ``get_data`` builds
+    the response body and runs only when the client's copy is stale.
+    """
+
+    def get_etag(self):
+        raise NotImplementedError
+
+    def get_data(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(self.get_data())
+        response["ETag"] = etag
+        return response
+
+
+class ToDoListApiView(ConditionalJsonView):
+    """
+    Returns :model:`superlists.ToDoList` with its items.
+    ETag is the list version, so unchanged lists are answered without queries.
+    """
+
+    def get_etag(self):
+        todo_list_id = int(self.kwargs["todo_list_id"])
+        # Versions are only created for lists that exist, not for every
+        # probed id
+        if peek_list_version(todo_list_id) is None and not (
+                ToDoList.objects.filter(pk=todo_list_id).exists() or
+                ArchivedToDoList.objects.filter(pk=todo_list_id).exists()):
+            raise Http404("List does not exist")
+        return '"list-%d-%d"' % (todo_list_id, get_list_version(todo_list_id))
+
+    def get_data(self):
+        queryset = ToDoList.objects.prefetch_related("todolistitem_set")
+        try:
+            todo_list = get_or_restore(queryset, self.kwargs["todo_list_id"])
+        except ToDoList.DoesNotExist:
+            raise Http404("List does not exist")
+        data = serialize_todo_list(todo_list)
+        data["items"] = [serialize_todo_list_item(item) for item in todo_list.todolistitem_set.all()]
+        return data
+
+
+class ToDoListCollectionApiView(ConditionalJsonView):
+    """
+    Base for paginated collections of :model:`superlists.ToDoList`\s.
+    ETag is built from ids and versions of lists on the page, which
+    costs one indexed query and one cache lookup.
+    """
+    cursor_kwarg = "cursor"
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_page_url(self, cursor):
+        if cursor is None:
+            return None
+        return "%s?%s" % (self.request.path, urlencode({self.cursor_kwarg: cursor}))
+
+    def get_etag(self):
+        paginator = CursorPaginator(self.get_queryset(), settings.SUPERLISTS_PAGE_SIZE)
+        self.page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        versions = get_list_versions([todo_list.id for todo_list in self.page])
+        state = ",".join("%d:%d" % (todo_list.id, versions[todo_list.id]) for todo_list in self.page)
+        state += "|%s|%s" % (self.page.has_next(), self.page.has_previous())
+        return '"lists-%s"' % hashlib.md5(state.encode()).hexdigest()
+
+    def get_data(self):
+        return {
+            "lists": [serialize_todo_list(todo_list) for todo_list in self.page],
+            "next": self.get_page_url(self.page.next_cursor),
+            "previous": self.get_page_url(self.page.previous_cursor),
+        }
+
+
+class PublicToDoListsApiView(ToDoListCollectionApiView):
+    """
+    Returns public :model:`superlists.ToDoList`\s, newest first.
+    """
+
+    def get_queryset(self):
+        return ToDoList.objects.filter(is_private=False)
+
+
+class UserToDoListsApiView(ToDoListCollectionApiView):
+    """
+    Returns :model:`superlists.ToDoList`\s of the logged in user, newest first.
+    """
+
+    def get_queryset(self):
+        return ToDoList.objects.filter(user_profile_id=self.user_profile.id)
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated():
+            return JsonResponse({"errors": ["Authentication required"]}, status=403)
+        self.user_profile = get_user_profile_or_none(request.user)
+        if self.user_profile is None:
+            return JsonResponse({"errors": ["Only users with a profile have lists"]}, status=403)
+        response = super().get(request, *args, **kwargs)
+        patch_vary_headers(response, ("Cookie",))
+        return response
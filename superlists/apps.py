@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SuperlistsConfig(AppConfig):
     name = "superlists"
     verbose_name = "SuperLists"
+
+    def ready(self):
+        from . import signals  # noqa: F401
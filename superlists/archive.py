@@ -0,0 +1,176 @@
+"""
+Archive of cold :model:`superlists.ToDoList`\s.
+
+Most lists are never opened again a few weeks after their last change,
+but would stay in the hot tables and their indexes forever. Lists not
+modified for ``SUPERLISTS_ARCHIVE_AFTER_DAYS`` days are moved by
+``manage.py archive_lists``, together with their items, to
+:model:`superlists.ArchivedToDoList`: one row with one zlib compressed
+JSON document per list. Visiting an archived list restores it in place,
+with the same ids, see :func:`get_or_restore`.
+
+Archived lists are not shown on the public feed and are not searchable.
+"""
+import collections
+import json
+import time
+import zlib
+from datetime import timedelta
+
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .cache import invalidate_list
+from .models import ArchivedToDoList, ToDoList, ToDoListItem, delete_rows
+
+# Bumped when the layout of archived documents changes
+ARCHIVE_VERSION = 1
+
+
+def dump(todo_list, items):
+    """
+    Returns :model:`superlists.ToDoList` and its ``(id, name, completed)``
+    item rows as compressed JSON.
+    """
+    document = {
+        "version": ARCHIVE_VERSION,
+        "list": {
+            "id": todo_list.id,
+            "name": todo_list.name,
+            "creation_date": todo_list.creation_date.isoformat(),
+            "is_private": todo_list.is_private,
+            "user_profile_id": todo_list.user_profile_id,
+            "last_modified": todo_list.last_modified.isoformat(),
+        },
+        "items": [list(item) for item in items],
+    }
+    return zlib.compress(json.dumps(document, separators=(",", ":")).encode("utf-8"))
+
+
+def load(data):
+    """Returns document stored by :func:`dump`."""
+    return json.loads(zlib.decompress(bytes(data)).decode("utf-8"))
+
+
+def archive_lists(todo_list_ids, cutoff, using=None):
+    """
+    Moves lists ``todo_list_ids`` not modified since ``cutoff`` with their
+    items to the archive in one transaction. Returns number of lists
+    archived.
+    """
+    using = using or router.db_for_write(ToDoList)
+    with transaction.atomic(using=using):
+        # Locked lists also keep items from being added meanwhile
+        todo_lists = list(ToDoList.objects.using(using).select_for_update().filter(
+            pk__in=todo_list_ids, last_modified__lt=cutoff).order_by("id"))
+        if not todo_lists:
+            return 0
+        todo_list_ids = [todo_list.pk for todo_list in todo_lists]
+        items = collections.defaultdict(list)
+        rows = ToDoListItem.objects.using(using).filter(todo_list_id__in=todo_list_ids).order_by("id")
+        for item_id, todo_list_id, name, completed in rows.values_list("id", "todo_list_id", "name", "completed"):
+            items[todo_list_id].append((item_id, name, completed))
+        ArchivedToDoList.objects.using(using).bulk_create([
+            ArchivedToDoList(
+                id=todo_list.pk,
+                name=todo_list.name,
+                is_private=todo_list.is_private,
+                user_profile_id=todo_list.user_profile_id,
+                creation_date=todo_list.creation_date,
+                last_modified=todo_list.last_modified,
+                data=dump(todo_list, items[todo_list.pk]),
+            )
+            for todo_list in todo_lists
+        ])
+        search.unindex_list_items(todo_list_ids, using=using)
+        search.unindex_lists(todo_list_ids, using=using)
+        delete_rows(ToDoListItem.objects.using(using).filter(todo_list_id__in=todo_list_ids))
+        delete_rows(ToDoList.objects.using(using).filter(pk__in=todo_list_ids))
+        for todo_list_id in todo_list_ids:
+            invalidate_list(todo_list_id, using)
+    return len(todo_lists)
+
+
+def archive_cold_lists(days, batch_size=100, sleep=0, using=None):
+    """
+    Archives all lists not modified for ``days``, at most ``batch_size``
+    per transaction and waiting ``sleep`` seconds between them. Returns
+    number of lists archived.
+    """
+    using = using or router.db_for_write(ToDoList)
+    cutoff = timezone.now() - timedelta(days=days)
+    # Walks the primary key instead of indexing last_modified, which
+    # changes on every write to the list
+    cold = ToDoList.objects.using(using).filter(last_modified__lt=cutoff).order_by("id")
+    archived = 0
+    last_id = 0
+    while True:
+        batch = list(cold.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+        if not batch:
+            return archived
+        last_id = batch[-1]
+        archived += archive_lists(batch, cutoff, using)
+        if sleep:
+            time.sleep(sleep)
+
+
+def restore_list(todo_list_id, using=None):
+    """
+    Moves list ``todo_list_id`` with its items back from the archive.
+    Returns False if it is not archived.
+    """
+    using = using or router.db_for_write(ToDoList)
+    with transaction.atomic(using=using):
+        archived = ArchivedToDoList.objects.using(using).select_for_update().filter(pk=todo_list_id).first()
+        if archived is None:
+            return False
+        todo_list_id = archived.pk
+        document = load(archived.data)
+        fields = document["list"]
+        items = document["items"]
+        # Bulk inserts keep the ids and skip signal receivers, counters
+        # and the search index are filled right here
+        ToDoList.objects.using(using).bulk_create([ToDoList(
+            id=todo_list_id,
+            name=fields["name"],
+            is_private=fields["is_private"],
+            user_profile_id=fields["user_profile_id"],
+            item_count=len(items),
+            completed_item_count=sum(1 for _, _, completed in items if completed),
+        )])
+        # Inserts set both dates to now, only the creation date is put back:
+        # restoring counts as a change, so the list is not archived again
+        ToDoList.objects.using(using).filter(pk=todo_list_id).update(
+            creation_date=parse_datetime(fields["creation_date"]))
+        ToDoListItem.objects.using(using).bulk_create([
+            ToDoListItem(id=item_id, name=name, completed=completed, todo_list_id=todo_list_id)
+            for item_id, name, completed in items
+        ])
+        archived.delete()
+        search.index_lists([todo_list_id], using=using)
+        search.index_list_items([todo_list_id], using=using)
+        invalidate_list(todo_list_id, using)
+    return True
+
+
+def get_or_restore(queryset, todo_list_id):
+    """
+    Returns list ``todo_list_id`` from ``queryset`` of
+    :model:`superlists.ToDoList`\s, restoring it first if it is archived.
+    Raises ``ToDoList.DoesNotExist`` if it is neither. Restored lists
+    have ``restored`` attribute set.
+    """
+    try:
+        return queryset.get(id=todo_list_id)
+    except ToDoList.DoesNotExist:
+        # A plain read, so probes of missing ids never lock on the primary
+        if not ArchivedToDoList.objects.using(queryset.db).filter(pk=todo_list_id).exists():
+            raise
+    restored = restore_list(todo_list_id)
+    # Restored now or by an earlier request, which a lagging replica
+    # has not seen yet
+    todo_list = queryset.using(router.db_for_write(ToDoList)).get(id=todo_list_id)
+    todo_list.restored = restored
+    return todo_list
@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _initial_version():
+    # A version key evicted from the cache must never restart at a number
+    # an older fragment was stored under, so versions start at the clock.
+    return int(time.time() * 1000)
+
+
+def list_version_key(todo_list_id):
+    return "superlists:list:%d:version" % int(todo_list_id)
+
+
+def list_fragment_key(todo_list_id, version, last_modified):
+    # last_modified comes from the database the items are read from, so a
+    # replica lagging behind stores its fragment where the primary never
+    # looks, and readers of the same replica state still share it
+    return "superlists:list:%d:items:%d:%d" % (int(todo_list_id), version, round(last_modified.timestamp() * 1000000))
+
+
+def get_list_version(todo_list_id):
+    """Returns current version of :model:`superlists.ToDoList` contents."""
+    key = list_version_key(todo_list_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def peek_list_version(todo_list_id):
+    """Returns current version of :model:`superlists.ToDoList`, or None if it has none yet."""
+    return cache.get(list_version_key(todo_list_id))
+
+
+def get_list_versions(todo_list_ids):
+    """Returns dict mapping ids of :model:`superlists.ToDoList`\s to their versions."""
+    keys = {list_version_key(todo_list_id): todo_list_id for todo_list_id in todo_list_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    for todo_list_id in keys.values():
+        if todo_list_id not in versions:
+            versions[todo_list_id] = get_list_version(todo_list_id)
+    return versions
+
+
+def bump_list_version(todo_list_id):
+    """
+    Invalidates every cached fragment of :model:`superlists.ToDoList`.
+    Must be called after each write touching the list or its items.
+    """
+    key = list_version_key(todo_list_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def invalidate_list(todo_list_id, using=None):
+    """
+    Bumps version of :model:`superlists.ToDoList` now and once more when the
+    surrounding transaction commits, so that a fragment rendered from
+    uncommitted state is never reused.
+    """
+    bump_list_version(todo_list_id)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: bump_list_version(todo_list_id), using=using)
+
+
+def get_list_fragment(todo_list_id, version, last_modified):
+    return cache.get(list_fragment_key(todo_list_id, version, last_modified))
+
+
+def set_list_fragment(todo_list_id, version, last_modified, fragment):
+    cache.set(list_fragment_key(todo_list_id, version, last_modified), fragment,
+              settings.SUPERLISTS_FRAGMENT_CACHE_TIMEOUT)
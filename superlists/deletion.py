@@ -0,0 +1,123 @@
+"""
+Deletion of :model:`superlists.ToDoList`\s of any size.
+
+Deleting a list through the ORM collects every one of its items into
+Python and deletes them row by row, with signals, in one long
+transaction. Instead :func:`delete_lists` only marks lists deleted, which
+hides them from all views at once (see ``ToDoList.objects``), and
+:func:`purge_list`, run in the background by ``manage.py purge_lists``,
+later deletes the items in bounded chunks of raw DELETEs and then the
+list itself.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import search
+from .cache import invalidate_list
+from .events import publish_list_event
+from .models import ToDoList, ToDoListItem, UserProfile, delete_rows
+
+
+def delete_lists(todo_list_ids, using=None):
+    """
+    Marks lists ``todo_list_ids`` deleted in a single UPDATE.
+    Returns number of lists marked.
+    """
+    todo_list_ids = list(todo_list_ids)
+    using = using or router.db_for_write(ToDoList)
+    with transaction.atomic(using=using):
+        deleted = ToDoList.objects.using(using).filter(pk__in=todo_list_ids).update(
+            deleted_at=timezone.now())
+        for todo_list_id in todo_list_ids:
+            invalidate_list(todo_list_id, using)
+            # Open pages reload and find the list gone
+            publish_list_event(todo_list_id, {"type": "reset"}, using=using)
+    return deleted
+
+
+def delete_user_lists(user_profile_ids, using=None):
+    """
+    Marks all lists of ``user_profile_ids`` deleted and detaches them, so
+    the profiles can be deleted without cascading to the lists. Returns
+    ids of the lists, to be purged.
+    """
+    using = using or router.db_for_write(ToDoList)
+    with transaction.atomic(using=using):
+        todo_list_ids = list(ToDoList.all_objects.using(using).filter(
+            user_profile_id__in=user_profile_ids).values_list("id", flat=True))
+        delete_lists(todo_list_ids, using=using)
+        ToDoList.all_objects.using(using).filter(pk__in=todo_list_ids).update(user_profile=None)
+    return todo_list_ids
+
+
+def delete_accounts(user_profiles, using=None):
+    """
+    Deletes :model:`accounts.UserProfile`\s in queryset ``user_profiles``
+    with their users, see :func:`delete_users`. Returns ids of the lists,
+    to be purged.
+    """
+    using = using or router.db_for_write(UserProfile)
+    return delete_users(User.objects.using(using).filter(pk__in=user_profiles.values("user_id")), using)
+
+
+def delete_users(users, using=None):
+    """
+    Deletes users in queryset ``users`` with their profiles, if they have
+    any. Their lists are marked deleted and detached first, so the cascade
+    does not reach them, archived lists are dropped. Returns ids of the
+    lists, to be purged.
+    """
+    using = using or router.db_for_write(User)
+    with transaction.atomic(using=using):
+        user_ids = list(users.values_list("id", flat=True))
+        user_profile_ids = list(UserProfile.objects.using(using).filter(
+            user_id__in=user_ids).values_list("id", flat=True))
+        todo_list_ids = delete_user_lists(user_profile_ids, using=using)
+        # Archived lists are single rows, the cascade deletes them in one DELETE
+        User.objects.using(using).filter(pk__in=user_ids).delete()
+    return todo_list_ids
+
+
+def purge_list(todo_list_id, batch_size=1000, sleep=0, using=None):
+    """
+    Deletes items of deleted list ``todo_list_id``, at most
+    ``batch_size`` per transaction and waiting ``sleep`` seconds between
+    them, then the list itself. Returns number of items deleted, 0 for
+    a list not marked deleted.
+    """
+    using = using or router.db_for_write(ToDoList)
+    if not ToDoList.all_objects.using(using).filter(pk=todo_list_id, deleted_at__isnull=False).exists():
+        return 0
+    items = ToDoListItem.objects.using(using).filter(todo_list_id=todo_list_id).order_by()
+    purged = 0
+    while True:
+        with transaction.atomic(using=using):
+            item_ids = list(items.values_list("id", flat=True)[:batch_size])
+            if not item_ids:
+                search.unindex_lists([todo_list_id], using=using)
+                delete_rows(ToDoList.all_objects.using(using).filter(pk=todo_list_id, deleted_at__isnull=False))
+                return purged
+            search.unindex_items(item_ids, using=using)
+            purged += delete_rows(items.filter(id__in=item_ids))
+        if sleep:
+            time.sleep(sleep)
+
+
+def purge_deleted_lists(batch_size=1000, sleep=0, using=None):
+    """
+    Purges all lists marked deleted, oldest first. Returns numbers of
+    lists and items deleted.
+    """
+    using = using or router.db_for_write(ToDoList)
+    deleted = ToDoList.all_objects.using(using).filter(deleted_at__isnull=False).order_by("deleted_at")
+    lists = items = 0
+    while True:
+        todo_list_ids = list(deleted.values_list("id", flat=True)[:batch_size])
+        if not todo_list_ids:
+            return lists, items
+        for todo_list_id in todo_list_ids:
+            items += purge_list(todo_list_id, batch_size, sleep, using)
+            lists += 1
@@ -0,0 +1,263 @@
+"""
+Server-sent events broadcasting changes of :model:`superlists.ToDoList` items.
+
+Every list has its own channel. Messages are published once the writing
+transaction commits, only while the list has viewers, and delivered by the
+broker configured with ``SUPERLISTS_EVENTS_BROKER``:
+
+* :class:`LocalBroker` reaches subscribers in the same worker process only,
+* :class:`PostgresBroker` relays messages through PostgreSQL
+  ``LISTEN``/``NOTIFY`` to every worker process.
+
+Messages carry item data only, streams render the item HTML for their
+viewers, so writes never render templates.
+"""
+import collections
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from .models import ToDoList, ToDoListItem
+
+
+logger = logging.getLogger(__name__)
+
+
+def list_channel(todo_list_id):
+    return "list:%d" % int(todo_list_id)
+
+
+def channel_subscribers_key(channel):
+    return "superlists:events:%s:subscribers" % channel
+
+
+class Subscription(object):
+    """
+    Queue of messages published on one channel. A subscriber too slow to
+    keep up gets a single ``reset`` message instead of the dropped ones.
+    """
+
+    def __init__(self, broker, channel, max_size=100):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(max_size)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            self.queue.put_nowait({"type": "reset"})
+
+    def get(self, timeout=None):
+        """Returns the next message, or None after ``timeout`` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker(object):
+    """
+    In-process publish/subscribe, only suitable for a single worker process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = collections.defaultdict(set)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.channel, None)
+
+    def has_subscribers(self, channel):
+        with self.lock:
+            return bool(self.subscriptions.get(channel))
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        """Hands ``message`` to subscribers of ``channel`` in this process."""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Publishes with ``NOTIFY`` on the default database, every worker process
+    runs one thread with its own connection listening for notifications
+    and dispatching them to local subscribers.
+
+    Subscribers of other processes are only known from a cache key set on
+    every subscribe for the longest life of a stream, so lists without
+    viewers are not notified.
+    """
+    NOTIFY_CHANNEL = "superlists_events"
+    RECONNECT_DELAY = 5
+
+    def __init__(self):
+        super(PostgresBroker, self).__init__()
+        self.listener = None
+
+    def subscribe(self, channel):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name="superlists-events", daemon=True)
+                self.listener.start()
+        subscription = super(PostgresBroker, self).subscribe(channel)
+        timeout = settings.SUPERLISTS_EVENTS_STREAM_TIMEOUT + settings.SUPERLISTS_EVENTS_HEARTBEAT
+        cache.set(channel_subscribers_key(channel), True, timeout)
+        return subscription
+
+    def has_subscribers(self, channel):
+        return cache.get(channel_subscribers_key(channel)) is not None
+
+    def publish(self, channel, message):
+        payload = json.dumps({"channel": channel, "message": message})
+        using = router.db_for_write(ToDoList)
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.NOTIFY_CHANNEL, payload])
+
+    def listen(self):
+        while True:
+            try:
+                self.listen_once()
+            except Exception:
+                logger.exception("Lost connection listening for list events")
+            time.sleep(self.RECONNECT_DELAY)
+
+    def listen_once(self):
+        connection = connections[router.db_for_write(ToDoList)]
+        database = connection.Database.connect(**connection.get_connection_params())
+        try:
+            database.autocommit = True
+            with database.cursor() as cursor:
+                cursor.execute("LISTEN %s" % self.NOTIFY_CHANNEL)
+            while True:
+                if select.select([database], [], [], self.RECONNECT_DELAY) == ([], [], []):
+                    continue
+                database.poll()
+                while database.notifies:
+                    payload = json.loads(database.notifies.pop(0).payload)
+                    self.dispatch(payload["channel"], payload["message"])
+        finally:
+            database.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Returns the process-wide instance of ``SUPERLISTS_EVENTS_BROKER``."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.SUPERLISTS_EVENTS_BROKER)()
+        return _broker
+
+
+def publish_list_event(todo_list_id, message, using=None):
+    """
+    Publishes ``message`` to viewers of :model:`superlists.ToDoList` once
+    the surrounding transaction commits, or right away outside of one.
+    Nothing is published while the list has no viewers.
+    """
+    channel = list_channel(todo_list_id)
+
+    def publish():
+        broker = get_broker()
+        if broker.has_subscribers(channel):
+            broker.publish(channel, message)
+
+    transaction.on_commit(publish, using=using)
+
+
+class EventStream(object):
+    """
+    Iterable of server-sent events of one list, for StreamingHttpResponse.
+
+    Every open stream occupies a worker thread, so their number is limited
+    by ``SUPERLISTS_EVENTS_MAX_STREAMS`` per process and each one ends
+    after ``SUPERLISTS_EVENTS_STREAM_TIMEOUT`` seconds; browsers reconnect.
+    """
+    active = 0
+    lock = threading.Lock()
+
+    def __init__(self, todo_list_id, subscription):
+        self.todo_list_id = todo_list_id
+        self.subscription = subscription
+        self.closed = False
+
+    @classmethod
+    def open(cls, todo_list_id):
+        """Returns a new stream, or None if too many streams are open."""
+        with cls.lock:
+            if cls.active >= settings.SUPERLISTS_EVENTS_MAX_STREAMS:
+                return None
+            cls.active += 1
+        try:
+            subscription = get_broker().subscribe(list_channel(todo_list_id))
+        except Exception:
+            with cls.lock:
+                cls.active -= 1
+            raise
+        return cls(todo_list_id, subscription)
+
+    def __iter__(self):
+        # Idle streams must not hold database connections, but connections
+        # inside a transaction (like in tests) are left alone
+        for connection in connections.all():
+            if not connection.in_atomic_block:
+                connection.close()
+        yield "retry: %d\n\n" % (settings.SUPERLISTS_EVENTS_RETRY * 1000)
+        deadline = time.time() + settings.SUPERLISTS_EVENTS_STREAM_TIMEOUT
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            message = self.subscription.get(timeout=min(settings.SUPERLISTS_EVENTS_HEARTBEAT, remaining))
+            if message is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield "event: %s\ndata: %s\n\n" % (message["type"], json.dumps(self.render(message)))
+
+    def render(self, message):
+        """Adds HTML of the created or updated item to ``message``."""
+        if message["type"] not in ("created", "updated"):
+            return message
+        item = ToDoListItem(todo_list_id=self.todo_list_id, **message["item"])
+        return dict(message, html=render_to_string("superlists/list_item.html", {"todo_list_item": item}))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.subscription.close()
+        with self.lock:
+            EventStream.active -= 1
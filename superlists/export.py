@@ -0,0 +1,89 @@
+import csv
+import json
+
+from django.conf import settings
+
+from .archive import load
+from .models import ArchivedToDoList, ToDoList
+
+
+EXPORT_FIELDS = (
+    "list_id", "list_name", "list_creation_date", "list_is_private",
+    "item_id", "item_name", "item_completed",
+)
+
+
+def export_rows(queryset, archived_queryset=None):
+    """
+    Yields one flat row per :model:`superlists.ToDoListItem` of lists in
+    ``queryset``, lists without items get one row with empty item columns.
+    Lists in ``archived_queryset`` of :model:`superlists.ArchivedToDoList`
+    follow.
+
+    Rows come from a single LEFT JOIN read through a server-side cursor,
+    without building model instances, so memory use does not depend on
+    the amount of exported data.
+    """
+    rows = queryset.order_by("id", "todolistitem__id").values_list(
+        "id", "name", "creation_date", "is_private",
+        "todolistitem__id", "todolistitem__name", "todolistitem__completed",
+    )
+    for row in rows.iterator():
+        yield row[:2] + (row[2].isoformat(),) + row[3:]
+    if archived_queryset is None:
+        return
+    for data in archived_queryset.order_by("id").values_list("data", flat=True).iterator():
+        document = load(data)
+        fields = document["list"]
+        todo_list = (fields["id"], fields["name"], fields["creation_date"], fields["is_private"])
+        for item in document["items"] or [(None, None, None)]:
+            yield todo_list + tuple(item)
+
+
+class _Echo(object):
+    """File-like object returning whatever is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def _chunked(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= settings.SUPERLISTS_EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def csv_stream(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    yield from _chunked(writer.writerow(row) for row in rows)
+
+
+def ndjson_stream(rows):
+    yield from _chunked(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows)
+
+
+# Export format name mapped to stream function and content type
+EXPORT_FORMATS = {
+    "csv": (csv_stream, "text/csv"),
+    "ndjson": (ndjson_stream, "application/x-ndjson"),
+}
+
+
+def export_queryset(user=None):
+    """Returns lists of ``user``, or all public lists if no user is given."""
+    if user is None:
+        return ToDoList.objects.filter(is_private=False)
+    return ToDoList.objects.filter(user_profile__user=user)
+
+
+def archived_export_queryset(user=None):
+    """Returns archived lists matching :func:`export_queryset`."""
+    if user is None:
+        return ArchivedToDoList.objects.filter(is_private=False)
+    return ArchivedToDoList.objects.filter(user_profile__user=user)
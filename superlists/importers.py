@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .forms import ToDoListItemForm
+from .models import ToDoList, ToDoListItem, update_list_counters
+
+
+# Fields are built once and reused for every row, validating a form
+# instance per row would dominate the import time.
+LIST_NAME_FIELD = ToDoList._meta.get_field("name").formfield()
+ITEM_NAME_FIELD = ToDoListItemForm.base_fields["name"]
+
+TRUE_VALUES = ("true", "1", "yes")
+FALSE_VALUES = ("false", "0", "no", "")
+
+
+def read_csv(stream):
+    """Yields rows of CSV file in export format as dicts."""
+    return csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    """
+    Yields rows of JSON lines file in export format as dicts.
+    Malformed lines are yielded as they are and rejected by the importer.
+    """
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+
+IMPORT_FORMATS = {
+    "csv": read_csv,
+    "ndjson": read_ndjson,
+}
+
+
+def text_stream(binary_file):
+    """Wraps uploaded or opened binary file for line by line reading."""
+    return io.TextIOWrapper(binary_file, encoding="utf-8", newline="")
+
+
+def _clean_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = "" if value is None else str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError("Expected true or false, got %r" % value)
+
+
+def _clean_text(value):
+    return "" if value is None else str(value)
+
+
+class ImportResult(object):
+    """Counters of a finished import."""
+    max_errors = 100
+
+    def __init__(self):
+        self.lists = 0
+        self.items = 0
+        self.skipped = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.items + self.skipped) / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, row_number, error):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append("Row %d: %s" % (row_number, "; ".join(error.messages)))
+
+
+class ListImporter(object):
+    """
+    Imports :model:`superlists.ToDoList`\s with their items from rows in
+    export format. Rows of one list have to be consecutive, as written by
+    the exporter; ``list_id`` only groups rows and is not kept.
+
+    Rows are validated like :class:`ToDoListItemForm` and inserted in
+    batches of at most ``batch_size`` lists and ``batch_size`` items, with
+    COPY instead of INSERT on PostgreSQL when ``use_copy`` is set. Only the
+    current batch is kept in memory. Every batch is committed on its own,
+    ``result`` counts what was committed when reading the file fails.
+    """
+
+    def __init__(self, user_profile=None, batch_size=None, use_copy=False):
+        self.user_profile = user_profile
+        self.batch_size = batch_size or settings.SUPERLISTS_IMPORT_BATCH_SIZE
+        self.use_copy = use_copy and connection.vendor == "postgresql"
+        self.result = ImportResult()
+        self.current_key = None
+        self.current_list = None
+        self.pending_lists = []
+        self.pending_items = []
+
+    def run(self, rows):
+        started = time.time()
+        for row_number, row in enumerate(rows, 1):
+            try:
+                self.add_row(row)
+            except ValidationError as error:
+                self.result.add_error(row_number, error)
+            if len(self.pending_items) >= self.batch_size or len(self.pending_lists) >= self.batch_size:
+                self.flush()
+        self.flush()
+        self.result.elapsed = time.time() - started
+        return self.result
+
+    def add_row(self, row):
+        if not isinstance(row, dict):
+            raise ValidationError("Expected an object")
+        key = _clean_text(row.get("list_id"))
+        if not key:
+            raise ValidationError("list_id is required")
+        if key != self.current_key:
+            name = LIST_NAME_FIELD.clean(_clean_text(row.get("list_name")))
+            is_private = _clean_bool(row.get("list_is_private"))
+            creation_date = parse_datetime(_clean_text(row.get("list_creation_date")))
+            self.current_key = key
+            self.current_list = ToDoList(name=name, is_private=is_private, user_profile=self.user_profile)
+            self.current_list.imported_creation_date = creation_date
+            self.pending_lists.append(self.current_list)
+        if row.get("item_name") in (None, "") and row.get("item_id") in (None, ""):
+            return
+        name = ITEM_NAME_FIELD.clean(_clean_text(row.get("item_name")))
+        completed = _clean_bool(row.get("item_completed"))
+        self.pending_items.append(ToDoListItem(todo_list=self.current_list, name=name, completed=completed))
+
+    @transaction.atomic
+    def flush(self):
+        # Counters of new lists are set before they are inserted, lists
+        # continued from previous batches are updated afterwards
+        counters = defaultdict(lambda: [0, 0])
+        for item in self.pending_items:
+            counter = counters[id(item.todo_list)]
+            counter[0] += 1
+            counter[1] += int(item.completed)
+        for todo_list in self.pending_lists:
+            todo_list.item_count, todo_list.completed_item_count = counters.pop(id(todo_list), (0, 0))
+        if self.pending_lists:
+            self.create_lists(self.pending_lists)
+            self.result.lists += len(self.pending_lists)
+        continued = {}
+        for item in self.pending_items:
+            item.todo_list_id = item.todo_list.pk
+            if id(item.todo_list) in counters:
+                continued[item.todo_list_id] = counters[id(item.todo_list)]
+        for todo_list_id, (items, completed) in continued.items():
+            update_list_counters(todo_list_id, items, completed)
+        if self.pending_items:
+            if self.use_copy:
+                self.copy_items(self.pending_items)
+            else:
+                ToDoListItem.objects.bulk_create(self.pending_items)
+            self.result.items += len(self.pending_items)
+            # Bulk inserts send no signals to update the search index
+            search.index_list_items({item.todo_list_id for item in self.pending_items})
+        self.pending_lists = []
+        self.pending_items = []
+
+    def create_lists(self, todo_lists):
+        if connection.features.can_return_ids_from_bulk_insert:
+            ToDoList.objects.bulk_create(todo_lists)
+            search.index_lists([todo_list.pk for todo_list in todo_lists])
+        else:
+            for todo_list in todo_lists:
+                todo_list.save()
+        # creation_date is auto_now_add, original dates are restored
+        # with a single UPDATE
+        dated = [todo_list for todo_list in todo_lists if todo_list.imported_creation_date]
+        if dated:
+            ToDoList.objects.filter(id__in=[todo_list.pk for todo_list in dated]).update(creation_date=Case(
+                *[When(id=todo_list.pk, then=Value(todo_list.imported_creation_date, output_field=DateTimeField())) for todo_list in dated],
+                output_field=DateTimeField()
+            ))
+
+    def copy_items(self, items):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for item in items:
+            writer.writerow((item.name, item.completed, item.todo_list_id))
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY %s (name, completed, todo_list_id) FROM STDIN WITH CSV" % ToDoListItem._meta.db_table,
+                buffer,
+            )
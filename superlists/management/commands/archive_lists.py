@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from superlists.archive import archive_cold_lists
+
+
+class Command(BaseCommand):
+    help = "Moves to-do lists not modified for a long time, with their tasks, to the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.SUPERLISTS_ARCHIVE_AFTER_DAYS,
+            help="Archive lists not modified for this many days.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=100,
+            help="Number of lists archived in one transaction.",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Seconds to wait between batches, to spread the load on the database.",
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_cold_lists(options["days"], options["batch_size"], options["sleep"])
+        self.stdout.write("Archived %d lists." % archived)
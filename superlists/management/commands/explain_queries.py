@@ -0,0 +1,69 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from superlists.models import ToDoList, ToDoListItem
+from superlists.pagination import CursorPaginator
+from superlists.views import PublicToDoListListView
+
+
+SEQ_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"^SCAN (?:TABLE )?(\w+)$"),
+}
+
+
+class Command(BaseCommand):
+    help = "Prints query plans of the hot view queries and reports sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-on-seq-scan", action="store_true", dest="fail_on_seq_scan",
+            help="Exit with an error when any query plan contains a sequential scan.",
+        )
+
+    def get_queries(self):
+        """Returns ``(view name, queryset)`` pairs mirroring the queries run by the views."""
+        paginator = CursorPaginator(PublicToDoListListView.queryset, settings.SUPERLISTS_PAGE_SIZE)
+        cursor = paginator.encode_cursor(CursorPaginator.AFTER, ToDoList(id=0, creation_date=timezone.now()))
+        return [
+            ("index", paginator.get_page_queryset()[1]),
+            ("index (next page)", paginator.get_page_queryset(cursor)[1]),
+            ("user", ToDoList.objects.filter(user_profile_id=0).order_by("-last_modified")),
+            ("list", ToDoListItem.objects.only("id", "name", "todo_list_id").filter(todo_list_id__in=[0])),
+            ("list (not completed)", ToDoListItem.objects.filter(todo_list_id=0, completed=False)),
+        ]
+
+    def explain(self, queryset):
+        """Returns query plan of ``queryset`` as a list of lines."""
+        connection = connections[queryset.db]
+        sql, params = queryset.query.sql_with_params()
+        with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Tiny tables are cheaper to scan, so make the planner
+                # fall back to a sequential scan only when it has to.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql, params)
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        seq_scans = []
+        for name, queryset in self.get_queries():
+            vendor = connections[queryset.db].vendor
+            if vendor not in SEQ_SCAN_PATTERNS:
+                raise CommandError("EXPLAIN is not supported on %s" % vendor)
+            self.stdout.write("== %s ==" % name)
+            for line in self.explain(queryset):
+                self.stdout.write(line)
+                if SEQ_SCAN_PATTERNS[vendor].search(line.strip()):
+                    seq_scans.append(name)
+        if seq_scans:
+            message = "Sequential scan in: %s" % ", ".join(sorted(set(seq_scans)))
+            if options["fail_on_seq_scan"]:
+                raise CommandError(message)
+            self.stderr.write(message)
@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from superlists.export import EXPORT_FORMATS, archived_export_queryset, export_queryset, export_rows
+
+
+class Command(BaseCommand):
+    help = "Streams lists with their items as CSV or NDJSON to standard output."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Username whose lists are exported, all public lists are exported by default.",
+        )
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_FORMATS), default="csv",
+            help="Output format.",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError("User %s does not exist" % options["user"])
+        stream, content_type = EXPORT_FORMATS[options["format"]]
+        for chunk in stream(export_rows(export_queryset(user), archived_export_queryset(user))):
+            self.stdout.write(chunk, ending="")
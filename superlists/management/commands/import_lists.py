@@ -0,0 +1,55 @@
+import csv
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import UserProfile
+from superlists.importers import IMPORT_FORMATS, ListImporter, text_stream
+
+
+class Command(BaseCommand):
+    help = "Imports lists with their items from CSV or NDJSON file in export format."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, '-' reads standard input.")
+        parser.add_argument(
+            "--format", choices=sorted(IMPORT_FORMATS),
+            help="Input format, guessed from file extension by default.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Username owning imported lists, lists are not owned by anyone by default.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.SUPERLISTS_IMPORT_BATCH_SIZE,
+            help="Number of items inserted at once.",
+        )
+        parser.add_argument(
+            "--copy", action="store_true",
+            help="Insert items with COPY, used on PostgreSQL only.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        import_format = options["format"] or path.rsplit(".", 1)[-1]
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError("Unknown import format %s, use --format" % import_format)
+        user_profile = None
+        if options["user"]:
+            try:
+                user_profile = UserProfile.objects.get(user__username=options["user"])
+            except UserProfile.DoesNotExist:
+                raise CommandError("User %s does not exist" % options["user"])
+        importer = ListImporter(user_profile, options["batch_size"], options["copy"])
+        stream = text_stream(sys.stdin.buffer if path == "-" else open(path, "rb"))
+        with stream:
+            try:
+                result = importer.run(IMPORT_FORMATS[import_format](stream))
+            except (ValueError, csv.Error) as error:
+                raise CommandError("File is not valid %s (%s), %d lists and %d items were imported before" % (
+                    import_format, error, importer.result.lists, importer.result.items))
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write("Imported %d lists and %d items, skipped %d rows in %.1fs (%.0f rows/s)" % (
+            result.lists, result.items, result.skipped, result.elapsed, result.rows_per_second))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from superlists.deletion import purge_deleted_lists
+
+
+class Command(BaseCommand):
+    help = "Deletes to-do lists marked deleted, with their tasks, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of tasks deleted in one transaction.",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Seconds to wait between batches, to spread the load on the database.",
+        )
+
+    def handle(self, *args, **options):
+        lists, items = purge_deleted_lists(options["batch_size"], options["sleep"])
+        self.stdout.write("Purged %d lists with %d tasks." % (lists, items))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from superlists.models import ToDoList, count_items, recount_lists
+
+
+class Command(BaseCommand):
+    help = "Recounts task counters of to-do lists and repairs the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of lists checked in one transaction.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            batch = list(ToDoList.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            checked += len(batch)
+            with transaction.atomic():
+                drifted = ToDoList.objects.filter(id__in=batch).annotate(
+                    actual_item_count=count_items(),
+                    actual_completed_item_count=count_items(completed=True),
+                ).filter(
+                    ~Q(item_count=F("actual_item_count")) | ~Q(completed_item_count=F("actual_completed_item_count"))
+                ).select_for_update().values_list("id", flat=True)
+                drifted = list(drifted)
+                if drifted:
+                    # Marked modified as well, pages showing the old counts are not reused
+                    recount_lists(drifted)
+            repaired += len(drifted)
+        self.stdout.write("Checked %d lists, repaired %d." % (checked, repaired))
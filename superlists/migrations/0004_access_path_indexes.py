@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 13:45
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Public feed: ``is_private = false ORDER BY creation_date DESC, id DESC``.
+# PostgreSQL gets a partial index that only holds public lists. SQLite cannot
+# match a partial index against a bound parameter, so it (and any other
+# backend) falls back to the composite index declared on the model.
+PUBLIC_FEED_INDEX = models.Index(fields=['is_private', '-creation_date', '-id'], name='todolist_public_feed_idx')
+PUBLIC_FEED_PARTIAL_INDEX_SQL = ('CREATE INDEX todolist_public_feed_idx ON superlists_todolist '
+                                 '(creation_date DESC, id DESC) WHERE NOT is_private')
+
+
+def create_public_feed_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(PUBLIC_FEED_PARTIAL_INDEX_SQL)
+    else:
+        schema_editor.add_index(apps.get_model('superlists', 'ToDoList'), PUBLIC_FEED_INDEX)
+
+
+def drop_public_feed_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX todolist_public_feed_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('superlists', '0003_auto_20170517_1319'),
+    ]
+
+    operations = [
+        # Both foreign keys lead the composite indexes below
+        migrations.AlterField(
+            model_name='todolist',
+            name='user_profile',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.UserProfile'),
+        ),
+        migrations.AlterField(
+            model_name='todolistitem',
+            name='todo_list',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='superlists.ToDoList'),
+        ),
+        migrations.AddIndex(
+            model_name='todolist',
+            index=models.Index(fields=['user_profile', '-creation_date'], name='todolist_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todolistitem',
+            index=models.Index(fields=['todo_list', 'completed'], name='todolistitem_list_done_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_public_feed_index, drop_public_feed_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='todolist', index=PUBLIC_FEED_INDEX),
+            ],
+        ),
+    ]
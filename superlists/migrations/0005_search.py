@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# Full-text search, see superlists/search.py. PostgreSQL indexes the
+# ``to_tsvector`` expression used by the search query. SQLite gets an FTS5
+# table filled with existing names, later kept in sync by signals.
+POSTGRESQL_INDEXES_SQL = [
+    "CREATE INDEX todolist_name_search_idx ON superlists_todolist "
+    "USING gin (to_tsvector('english', name))",
+    "CREATE INDEX todolistitem_name_search_idx ON superlists_todolistitem "
+    "USING gin (to_tsvector('english', name))",
+]
+SQLITE_TABLE_SQL = [
+    "CREATE VIRTUAL TABLE superlists_search USING fts5"
+    "(name, todo_list_id UNINDEXED, tokenize = 'porter unicode61')",
+    "INSERT INTO superlists_search (rowid, name, todo_list_id) "
+    "SELECT id * 2, name, id FROM superlists_todolist",
+    "INSERT INTO superlists_search (rowid, name, todo_list_id) "
+    "SELECT id * 2 + 1, name, todo_list_id FROM superlists_todolistitem",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRESQL_INDEXES_SQL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_TABLE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX todolist_name_search_idx')
+        schema_editor.execute('DROP INDEX todolistitem_name_search_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE superlists_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlists', '0004_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_items(ToDoListItem, **filters):
+    items = ToDoListItem.objects.filter(todo_list=OuterRef('pk'), **filters).order_by()
+    counts = items.values('todo_list').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    ToDoList = apps.get_model('superlists', 'ToDoList')
+    ToDoListItem = apps.get_model('superlists', 'ToDoListItem')
+    ToDoList.objects.using(schema_editor.connection.alias).update(
+        item_count=count_items(ToDoListItem),
+        completed_item_count=count_items(ToDoListItem, completed=True),
+        last_modified=F('creation_date'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlists', '0005_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='completed_item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='maintained on every task change, repaired by recount_lists command', verbose_name='Number of completed tasks'),
+        ),
+        migrations.AddField(
+            model_name='todolist',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='maintained on every task change, repaired by recount_lists command', verbose_name='Number of tasks'),
+        ),
+        migrations.AddField(
+            model_name='todolist',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, help_text='time of the last change of the list or any of its tasks', verbose_name='Last modified'),
+        ),
+        migrations.AddIndex(
+            model_name='todolist',
+            index=models.Index(fields=['user_profile', '-last_modified'], name='todolist_user_modified_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
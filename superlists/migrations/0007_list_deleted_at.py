@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# Only the few lists waiting to be purged are indexed. Both PostgreSQL and
+# SQLite match the partial index against ``deleted_at IS NOT NULL``, other
+# backends get a plain index.
+DELETED_INDEX_SQL = ('CREATE INDEX todolist_deleted_idx ON superlists_todolist '
+                     '(deleted_at) WHERE deleted_at IS NOT NULL')
+
+
+def create_deleted_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(DELETED_INDEX_SQL)
+    else:
+        schema_editor.execute('CREATE INDEX todolist_deleted_idx ON superlists_todolist (deleted_at)')
+
+
+def drop_deleted_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX todolist_deleted_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superlists', '0006_list_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='set when the list is deleted, its tasks are purged later', null=True, verbose_name='Deleted at'),
+        ),
+        migrations.RunPython(create_deleted_index, drop_deleted_index),
+    ]
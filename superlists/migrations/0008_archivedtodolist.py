@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_queuedemail'),
+        ('superlists', '0007_list_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedToDoList',
+            fields=[
+                ('id', models.IntegerField(help_text='id of the archived list', primary_key=True, serialize=False, verbose_name='List id')),
+                ('name', models.CharField(max_length=200, verbose_name='Name of the to-do list')),
+                ('is_private', models.BooleanField(default=False, verbose_name='Private')),
+                ('creation_date', models.DateTimeField(verbose_name='Creation date')),
+                ('last_modified', models.DateTimeField(verbose_name='Last modified')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archived at')),
+                ('data', models.BinaryField(help_text='the list with its tasks as zlib compressed JSON')),
+                ('user_profile', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.UserProfile')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtodolist',
+            index=models.Index(fields=['user_profile', '-last_modified'], name='archivedlist_user_idx'),
+        ),
+    ]
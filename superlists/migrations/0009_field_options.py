@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('superlists', '0008_archivedtodolist'),
+    ]
+
+    # Help texts and verbose names only. SQLite would rebuild the tables
+    # for them, dropping indexes created with raw SQL by earlier migrations.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='todolist',
+                    name='creation_date',
+                    field=models.DateTimeField(auto_now_add=True, help_text='saved on the first time the list was created', verbose_name='Creation date'),
+                ),
+                migrations.AlterField(
+                    model_name='todolist',
+                    name='is_private',
+                    field=models.BooleanField(default=False, help_text='determines whether list was created by user or not', verbose_name='Private'),
+                ),
+                migrations.AlterField(
+                    model_name='todolist',
+                    name='name',
+                    field=models.CharField(help_text='defined by user', max_length=200, verbose_name='Name of the to-do list'),
+                ),
+                migrations.AlterField(
+                    model_name='todolist',
+                    name='user_profile',
+                    field=models.ForeignKey(db_index=False, help_text='associated to user by one-to-one relation', null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.UserProfile'),
+                ),
+                migrations.AlterField(
+                    model_name='todolistitem',
+                    name='completed',
+                    field=models.BooleanField(default=False, help_text='determines whether the owner set a task as completed', verbose_name='Completed'),
+                ),
+                migrations.AlterField(
+                    model_name='todolistitem',
+                    name='name',
+                    field=models.CharField(help_text='user defined task name', max_length=200, verbose_name='Name'),
+                ),
+                migrations.AlterField(
+                    model_name='todolistitem',
+                    name='todo_list',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='superlists.ToDoList', verbose_name='To-Do list'),
+                ),
+            ],
+        ),
+    ]
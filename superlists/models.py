@@ -1,9 +1,22 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.urls import reverse
+from django.utils import timezone
 
 from accounts.models import UserProfile
 
 
+class LiveToDoListManager(models.Manager):
+    """
+    Manager of lists not marked deleted. Deleted lists wait for
+    ``purge_lists`` command, see :mod:`superlists.deletion`.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class ToDoList(models.Model):
     """
     The ToDoList class defines the main storage unit in the application.
@@ -29,8 +42,48 @@ class ToDoList(models.Model):
         UserProfile,
         null=True,
         on_delete=models.CASCADE,
+        db_index=False,
         help_text="associated to user by one-to-one relation"
     )
+    item_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Number of tasks",
+        help_text="maintained on every task change, repaired by recount_lists command"
+    )
+    completed_item_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Number of completed tasks",
+        help_text="maintained on every task change, repaired by recount_lists command"
+    )
+    last_modified = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Last modified",
+        help_text="time of the last change of the list or any of its tasks"
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Deleted at",
+        help_text="set when the list is deleted, its tasks are purged later"
+    )
+
+    objects = LiveToDoListManager()
+    # Includes deleted lists, for purging them
+    all_objects = models.Manager()
+
+    class Meta:
+        # On PostgreSQL the public feed index is created as a partial index
+        # over public lists only, see migration 0004_access_path_indexes.
+        # Deleted lists are found by a partial index created in migration
+        # 0007_list_deleted_at.
+        indexes = [
+            models.Index(fields=["is_private", "-creation_date", "-id"], name="todolist_public_feed_idx"),
+            models.Index(fields=["user_profile", "-creation_date"], name="todolist_user_created_idx"),
+            models.Index(fields=["user_profile", "-last_modified"], name="todolist_user_modified_idx"),
+        ]
 
     def __str__(self):
         return str(self.creation_date) + ' ' + self.name
@@ -40,6 +93,50 @@ class ToDoList(models.Model):
         return reverse('list', kwargs={"todo_list_id": self.id})
 
 
+def update_list_counters(todo_list_id, items=0, completed=0, using=None):
+    """
+    Adds ``items`` and ``completed`` to task counters of
+    :model:`superlists.ToDoList` in a single UPDATE and marks it modified.
+    """
+    ToDoList.objects.using(using).filter(pk=todo_list_id).update(
+        item_count=F("item_count") + items,
+        completed_item_count=F("completed_item_count") + completed,
+        last_modified=timezone.now(),
+    )
+
+
+def count_items(**filters):
+    """Subquery counting items of the outer :model:`superlists.ToDoList`."""
+    items = ToDoListItem.objects.filter(todo_list=OuterRef("pk"), **filters).order_by()
+    counts = items.values("todo_list").annotate(count=Count("id")).values("count")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_lists(todo_lists, using=None):
+    """
+    Recounts task counters of ``todo_lists`` (ids or a queryset) in a
+    single UPDATE and marks them modified, for writes changing items of
+    many lists at once.
+    """
+    return ToDoList.objects.using(using).filter(pk__in=todo_lists).update(
+        item_count=count_items(),
+        completed_item_count=count_items(completed=True),
+        last_modified=timezone.now(),
+    )
+
+
+def delete_rows(queryset):
+    """
+    Deletes rows of ``queryset`` with a single DELETE and returns their
+    number. Unlike ``QuerySet.delete()`` no rows are fetched, no signals
+    are sent and nothing cascades: callers update list counters, caches
+    and the search index themselves.
+    """
+    # The one place relying on private QuerySet._raw_delete(), the public
+    # delete() collects every row and its relations into Python first
+    return queryset._raw_delete(queryset.db)
+
+
 class ToDoListItem(models.Model):
     """
     The ToDoListItem class represents one task on :model:`superlists.ToDoList`.
@@ -57,12 +154,108 @@ class ToDoListItem(models.Model):
     todo_list = models.ForeignKey(
         ToDoList,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name="To-Do list",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["todo_list", "completed"], name="todolistitem_list_done_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Loaded values tell how save() changes counters of the list
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the task and updates counters of its list in one transaction.
+        """
+        using = kwargs.get("using") or router.db_for_write(ToDoListItem, instance=self)
+        adding = self._state.adding
+        loaded = getattr(self, "_loaded_values", {})
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if adding:
+                update_list_counters(self.todo_list_id, 1, int(self.completed), using)
+            elif loaded.get("todo_list_id", self.todo_list_id) != self.todo_list_id:
+                update_list_counters(loaded["todo_list_id"], -1, -int(loaded.get("completed", self.completed)), using)
+                update_list_counters(self.todo_list_id, 1, int(self.completed), using)
+            else:
+                completed = int(self.completed) - int(loaded.get("completed", self.completed))
+                update_list_counters(self.todo_list_id, 0, completed, using)
+        self._loaded_values = {"todo_list_id": self.todo_list_id, "completed": self.completed}
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the task and updates counters of its list in one transaction.
+        """
+        using = kwargs.get("using") or router.db_for_write(ToDoListItem, instance=self)
+        todo_list_id, completed = self.todo_list_id, self.completed
+        with transaction.atomic(using=using):
+            result = super().delete(*args, **kwargs)
+            update_list_counters(todo_list_id, -1, -int(completed), using)
+        return result
+
     def get_absolute_url(self):
         """Returns URL associated with ToDoListItem"""
-        return reverse('list', kwargs={"todo_list_id": self.todo_list.id})
+        return reverse('list', kwargs={"todo_list_id": self.todo_list_id})
+
+
+class ArchivedToDoList(models.Model):
+    """
+    :model:`superlists.ToDoList` moved out of the hot tables with its
+    :model:`superlists.ToDoListItem`\s after ``SUPERLISTS_ARCHIVE_AFTER_DAYS``
+    days without changes, see :mod:`superlists.archive`. Keeps the id of
+    the list and is restored when the list is visited.
+    """
+    id = models.IntegerField(
+        primary_key=True,
+        verbose_name="List id",
+        help_text="id of the archived list"
+    )
+    name = models.CharField(
+        max_length=200,
+        verbose_name="Name of the to-do list"
+    )
+    is_private = models.BooleanField(
+        default=False,
+        verbose_name="Private"
+    )
+    user_profile = models.ForeignKey(
+        UserProfile,
+        null=True,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    creation_date = models.DateTimeField(
+        verbose_name="Creation date"
+    )
+    last_modified = models.DateTimeField(
+        verbose_name="Last modified"
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Archived at"
+    )
+    data = models.BinaryField(
+        help_text="the list with its tasks as zlib compressed JSON"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_profile", "-last_modified"], name="archivedlist_user_idx"),
+        ]
+
+    def __str__(self):
+        return str(self.creation_date) + ' ' + self.name
+
+    def get_absolute_url(self):
+        """Returns URL of the list, visiting it restores the list"""
+        return reverse('list', kwargs={"todo_list_id": self.id})
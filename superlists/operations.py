@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+
+from . import search
+from .cache import invalidate_list
+from .events import publish_list_event
+from .forms import ToDoListItemForm
+from .models import ToDoList, ToDoListItem, delete_rows, update_list_counters
+
+
+def _clean_name(operation):
+    form = ToDoListItemForm(data={"name": operation.get("name")})
+    if not form.is_valid():
+        raise ValidationError(form.errors["name"])
+    return form.cleaned_data["name"]
+
+
+def _clean_completed(operation):
+    completed = operation.get("completed", False)
+    if not isinstance(completed, bool):
+        raise ValidationError("completed must be true or false")
+    return completed
+
+
+def _clean_id(operation):
+    item_id = operation.get("id")
+    if not isinstance(item_id, int) or isinstance(item_id, bool):
+        raise ValidationError("id must be an integer")
+    return item_id
+
+
+class ItemOperations(object):
+    """
+    Batch of create, update and delete operations on items of one
+    :model:`superlists.ToDoList`, decoded from a JSON array like::
+
+        [{"op": "create", "name": "Milk", "completed": false},
+         {"op": "update", "id": 4, "completed": true, "name": "Bread"},
+         {"op": "delete", "id": 5}]
+    """
+
+    def __init__(self, data):
+        self.creates = []
+        self.completed = {}
+        self.names = {}
+        self.deletes = set()
+        self.parse(data)
+
+    def parse(self, data):
+        if not isinstance(data, list):
+            raise ValidationError("Expected a list of operations")
+        if len(data) > settings.SUPERLISTS_BATCH_MAX_OPERATIONS:
+            raise ValidationError("At most %d operations are allowed" % settings.SUPERLISTS_BATCH_MAX_OPERATIONS)
+        errors = []
+        for index, operation in enumerate(data):
+            try:
+                self.parse_operation(operation)
+            except ValidationError as error:
+                errors.extend("Operation %d: %s" % (index, message) for message in error.messages)
+        if errors:
+            raise ValidationError(errors)
+
+    def parse_operation(self, operation):
+        if not isinstance(operation, dict):
+            raise ValidationError("Expected an object")
+        op = operation.get("op")
+        if op == "create":
+            self.creates.append((_clean_name(operation), _clean_completed(operation)))
+        elif op == "update":
+            item_id = _clean_id(operation)
+            if "completed" not in operation and "name" not in operation:
+                raise ValidationError("update needs name or completed")
+            if "completed" in operation:
+                self.completed[item_id] = _clean_completed(operation)
+            if "name" in operation:
+                self.names[item_id] = _clean_name(operation)
+        elif op == "delete":
+            self.deletes.add(_clean_id(operation))
+        else:
+            raise ValidationError("op must be one of create, update, delete")
+
+    @transaction.atomic
+    def apply(self, todo_list):
+        """
+        Applies all operations to items of ``todo_list`` in one transaction,
+        with a constant number of queries. Deletes are applied last.
+        """
+        ToDoList.objects.select_for_update().only("id").get(pk=todo_list.pk)
+        items = ToDoListItem.objects.filter(todo_list=todo_list)
+        referenced = set(self.completed) | set(self.names) | self.deletes
+        if referenced:
+            missing = referenced - set(items.filter(id__in=referenced).values_list("id", flat=True))
+            if missing:
+                raise ValidationError(["Task %d does not exist" % item_id for item_id in sorted(missing)])
+        items_added = len(self.creates)
+        completed_added = sum(1 for _, completed in self.creates if completed)
+        if self.creates:
+            ToDoListItem.objects.bulk_create([
+                ToDoListItem(todo_list=todo_list, name=name, completed=completed)
+                for name, completed in self.creates
+            ])
+        for completed in (True, False):
+            ids = [item_id for item_id, value in self.completed.items() if value == completed]
+            if ids:
+                changed = items.filter(id__in=ids).exclude(completed=completed).update(completed=completed)
+                completed_added += changed if completed else -changed
+        if self.names:
+            items.filter(id__in=self.names).update(name=Case(
+                *[When(id=item_id, then=Value(name)) for item_id, name in self.names.items()],
+                output_field=CharField()
+            ))
+        if self.deletes:
+            # Signal receivers are replaced by the calls below. Split by
+            # completion to tell how list counters change.
+            deleted = items.filter(id__in=self.deletes)
+            for completed in (True, False):
+                count = delete_rows(deleted.filter(completed=completed))
+                items_added -= count
+                completed_added -= count if completed else 0
+            search.unindex_items(self.deletes)
+        if self.creates or self.names:
+            # Ids of created items are not known on every backend
+            search.index_list_items([todo_list.pk])
+        update_list_counters(todo_list.pk, items_added, completed_added)
+        invalidate_list(todo_list.pk)
+        # Viewers reload all items rather than replaying every operation
+        publish_list_event(todo_list.pk, {"type": "reset"})
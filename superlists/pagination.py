@@ -0,0 +1,137 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+class CursorPage(object):
+    """
+    One page of objects returned by :class:`CursorPaginator`.
+    Cursors point at the boundary objects and are safe to put in URLs.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(CursorPaginator.AFTER, self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(CursorPaginator.BEFORE, self.object_list[0])
+
+
+class CursorPaginator(object):
+    """
+    Keyset paginator over ``(creation_date, id)``, newest first.
+
+    Unlike OFFSET paging every page is fetched with a single range query
+    on the ordering columns, so the cost does not grow with page depth.
+    """
+    AFTER = "n"
+    BEFORE = "p"
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+    def encode_cursor(self, direction, obj):
+        """Builds an opaque cursor pointing just after/before ``obj``."""
+        raw = "|".join((direction, obj.creation_date.isoformat(), str(obj.pk)))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """Returns ``(direction, creation_date, id)`` encoded in ``cursor``."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, creation_date, pk = raw.split("|")
+            creation_date = parse_datetime(creation_date)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise Http404("Invalid cursor")
+        if direction not in (self.AFTER, self.BEFORE) or creation_date is None:
+            raise Http404("Invalid cursor")
+        return direction, creation_date, pk
+
+    def get_page_queryset(self, cursor=None):
+        """
+        Returns ``(direction, queryset)`` fetching the page at ``cursor``.
+        The queryset holds one extra row used to detect further pages.
+        """
+        if not cursor:
+            return self.AFTER, self.queryset.order_by("-creation_date", "-id")[:self.per_page + 1]
+        direction, creation_date, pk = self.decode_cursor(cursor)
+        if direction == self.AFTER:
+            queryset = self.queryset.filter(
+                Q(creation_date__lt=creation_date) | Q(creation_date=creation_date, id__lt=pk)
+            ).order_by("-creation_date", "-id")
+        else:
+            queryset = self.queryset.filter(
+                Q(creation_date__gt=creation_date) | Q(creation_date=creation_date, id__gt=pk)
+            ).order_by("creation_date", "id")
+        return direction, queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        """Returns the :class:`CursorPage` starting at ``cursor``."""
+        direction, queryset = self.get_page_queryset(cursor)
+        object_list = list(queryset)
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if direction == self.AFTER:
+            return CursorPage(object_list, self, has_more, bool(cursor))
+        object_list.reverse()
+        return CursorPage(object_list, self, True, has_more)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of large querysets, e.g. in the admin. On PostgreSQL the
+    number of objects is taken from the planner's estimate instead of a
+    COUNT(*) visiting every row, once the estimate exceeds
+    ``SUPERLISTS_ESTIMATED_COUNT_THRESHOLD``. Smaller counts and other
+    databases are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql":
+            sql, params = queryset.order_by().query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0]
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+            if estimate > settings.SUPERLISTS_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super(EstimatedCountPaginator, self).count
@@ -0,0 +1,233 @@
+"""
+Full-text search over :model:`superlists.ToDoList` and
+:model:`superlists.ToDoListItem` names.
+
+On PostgreSQL both tables carry GIN indexes over ``to_tsvector`` of the
+name, maintained by the database itself. On SQLite names are copied to the
+``superlists_search`` FTS5 table, kept in sync by the signal receivers in
+:mod:`superlists.signals` and explicitly by bulk operations that bypass
+them. Other backends fall back to unindexed ``LIKE`` lookups.
+
+See migration 0005_search.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import ToDoList
+
+SEARCH_CONFIG = "english"
+SEARCH_TABLE = "superlists_search"
+MAX_TERMS = 10
+# Matches on the list name count more than matches on one of its items
+LIST_NAME_WEIGHT = 2
+
+# One FTS5 table holds both lists and items. Rowids are derived from
+# primary keys so rows can be replaced and deleted without a lookup.
+LIST_ROWID = "%s * 2"
+ITEM_ROWID = "%s * 2 + 1"
+
+POSTGRESQL_SEARCH_SQL = """
+    SELECT todo_list.id, MAX(matches.rank) AS search_rank
+    FROM (
+        SELECT id AS todo_list_id, {weight} * ts_rank(to_tsvector('{config}', name), query) AS rank
+        FROM superlists_todolist, plainto_tsquery('{config}', %s) query
+        WHERE to_tsvector('{config}', name) @@ query
+        UNION ALL
+        SELECT todo_list_id, ts_rank(to_tsvector('{config}', name), query)
+        FROM superlists_todolistitem, plainto_tsquery('{config}', %s) query
+        WHERE to_tsvector('{config}', name) @@ query
+    ) matches
+    JOIN superlists_todolist todo_list ON todo_list.id = matches.todo_list_id
+    WHERE todo_list.deleted_at IS NULL AND {visibility}
+    GROUP BY todo_list.id
+    ORDER BY search_rank DESC, todo_list.id DESC
+    LIMIT %s OFFSET %s
+"""
+
+# FTS5 rank (bm25) is lower for better matches, it is negated to sort like ts_rank
+SQLITE_SEARCH_SQL = """
+    SELECT todo_list.id, MAX(matches.rank) AS search_rank
+    FROM (
+        SELECT todo_list_id, -rank * (CASE rowid %% 2 WHEN 0 THEN {weight} ELSE 1 END) AS rank
+        FROM {table}
+        WHERE {table} MATCH %s
+    ) matches
+    JOIN superlists_todolist todo_list ON todo_list.id = matches.todo_list_id
+    WHERE todo_list.deleted_at IS NULL AND {visibility}
+    GROUP BY todo_list.id
+    ORDER BY search_rank DESC, todo_list.id DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+def search_terms(query):
+    """Splits user input into at most ``MAX_TERMS`` words, operators are dropped."""
+    return re.findall(r"\w+", query)[:MAX_TERMS]
+
+
+class SearchPage(object):
+    """
+    One page of :model:`superlists.ToDoList`\s matching a search, best
+    matches first. Every list has its ``search_rank`` set, if known.
+    """
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def search_lists(query, user_profile=None, page=1, per_page=20, using=None):
+    """
+    Returns :class:`SearchPage` of lists whose name, or name of any of their
+    items, contains all words of ``query``. Private lists are only
+    searched when owned by ``user_profile``.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return SearchPage([], page, False)
+    using = using or router.db_for_read(ToDoList)
+    connection = connections[using]
+    offset = (page - 1) * per_page
+    if connection.vendor == "postgresql":
+        sql = POSTGRESQL_SEARCH_SQL.format(config=SEARCH_CONFIG, weight=LIST_NAME_WEIGHT, visibility="{visibility}")
+        text = " ".join(terms)
+        params = [text, text]
+    elif connection.vendor == "sqlite":
+        sql = SQLITE_SEARCH_SQL.format(table=SEARCH_TABLE, weight=LIST_NAME_WEIGHT, visibility="{visibility}")
+        # Quoted terms are matched as plain words, implicitly joined by AND
+        params = [" ".join('"%s"' % term for term in terms)]
+    else:
+        return _search_lists_unindexed(terms, user_profile, page, per_page, using)
+    if user_profile is None:
+        sql = sql.format(visibility="NOT todo_list.is_private")
+    else:
+        sql = sql.format(visibility="(NOT todo_list.is_private OR todo_list.user_profile_id = %s)")
+        params.append(user_profile.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [per_page + 1, offset])
+        ranks = cursor.fetchall()
+    todo_lists = ToDoList.objects.using(using).in_bulk([todo_list_id for todo_list_id, _ in ranks[:per_page]])
+    object_list = []
+    for todo_list_id, rank in ranks[:per_page]:
+        # Deleted or archived after it was ranked
+        todo_list = todo_lists.get(todo_list_id)
+        if todo_list is None:
+            continue
+        todo_list.search_rank = rank
+        object_list.append(todo_list)
+    return SearchPage(object_list, page, len(ranks) > per_page)
+
+
+def _search_lists_unindexed(terms, user_profile, page, per_page, using):
+    queryset = ToDoList.objects.using(using)
+    visible = Q(is_private=False)
+    if user_profile is not None:
+        visible |= Q(user_profile=user_profile)
+    queryset = queryset.filter(visible)
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(todolistitem__name__icontains=term))
+    offset = (page - 1) * per_page
+    object_list = list(queryset.distinct().order_by("-creation_date", "-id")[offset:offset + per_page + 1])
+    for todo_list in object_list:
+        todo_list.search_rank = None
+    return SearchPage(object_list[:per_page], page, len(object_list) > per_page)
+
+
+def _uses_search_table(using):
+    return connections[using or router.db_for_write(ToDoList)].vendor == "sqlite"
+
+
+def _chunks(ids, size=500):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _execute(using, sql, ids):
+    connection = connections[using or router.db_for_write(ToDoList)]
+    with connection.cursor() as cursor:
+        for chunk in _chunks(ids):
+            cursor.execute(sql % ", ".join(["%s"] * len(chunk)), chunk)
+
+
+def index_lists(todo_list_ids, using=None):
+    """Copies names of lists ``todo_list_ids`` to the search table."""
+    if not todo_list_ids or not _uses_search_table(using):
+        return
+    _execute(using, (
+        "INSERT OR REPLACE INTO {table} (rowid, name, todo_list_id) "
+        "SELECT {rowid}, name, id FROM superlists_todolist WHERE id IN (%s)"
+    ).format(table=SEARCH_TABLE, rowid=LIST_ROWID % "id"), todo_list_ids)
+
+
+def index_list_items(todo_list_ids, using=None):
+    """Copies names of all items of lists ``todo_list_ids`` to the search table."""
+    if not todo_list_ids or not _uses_search_table(using):
+        return
+    _execute(using, (
+        "INSERT OR REPLACE INTO {table} (rowid, name, todo_list_id) "
+        "SELECT {rowid}, name, todo_list_id FROM superlists_todolistitem WHERE todo_list_id IN (%s)"
+    ).format(table=SEARCH_TABLE, rowid=ITEM_ROWID % "id"), todo_list_ids)
+
+
+def index_items(item_ids, using=None):
+    """Copies names of items ``item_ids`` to the search table."""
+    if not item_ids or not _uses_search_table(using):
+        return
+    _execute(using, (
+        "INSERT OR REPLACE INTO {table} (rowid, name, todo_list_id) "
+        "SELECT {rowid}, name, todo_list_id FROM superlists_todolistitem WHERE id IN (%s)"
+    ).format(table=SEARCH_TABLE, rowid=ITEM_ROWID % "id"), item_ids)
+
+
+def unindex_lists(todo_list_ids, using=None):
+    """Removes lists ``todo_list_ids``, not their items, from the search table."""
+    if not todo_list_ids or not _uses_search_table(using):
+        return
+    _execute(using, "DELETE FROM %s WHERE rowid IN (%%s)" % SEARCH_TABLE,
+             [int(todo_list_id) * 2 for todo_list_id in todo_list_ids])
+
+
+def unindex_list_items(todo_list_ids, using=None):
+    """
+    Removes all items of lists ``todo_list_ids`` from the search table,
+    must be called before the items are deleted.
+    """
+    if not todo_list_ids or not _uses_search_table(using):
+        return
+    _execute(using, (
+        "DELETE FROM {table} WHERE rowid IN "
+        "(SELECT {rowid} FROM superlists_todolistitem WHERE todo_list_id IN (%s))"
+    ).format(table=SEARCH_TABLE, rowid=ITEM_ROWID % "id"), todo_list_ids)
+
+
+def unindex_items(item_ids, using=None):
+    """Removes items ``item_ids`` from the search table."""
+    if not item_ids or not _uses_search_table(using):
+        return
+    _execute(using, "DELETE FROM %s WHERE rowid IN (%%s)" % SEARCH_TABLE,
+             [int(item_id) * 2 + 1 for item_id in item_ids])
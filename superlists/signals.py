@@ -0,0 +1,53 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .api import serialize_todo_list_item
+from .cache import invalidate_list
+from .events import publish_list_event
+from .models import ToDoList, ToDoListItem
+
+
+@receiver(post_save, sender=ToDoList)
+@receiver(post_delete, sender=ToDoList)
+def invalidate_todo_list(sender, instance, using, **kwargs):
+    invalidate_list(instance.pk, using)
+
+
+@receiver(post_save, sender=ToDoListItem)
+@receiver(post_delete, sender=ToDoListItem)
+def invalidate_todo_list_item(sender, instance, using, **kwargs):
+    invalidate_list(instance.todo_list_id, using)
+
+
+@receiver(post_save, sender=ToDoList)
+def index_todo_list(sender, instance, using, **kwargs):
+    search.index_lists([instance.pk], using=using)
+
+
+@receiver(post_save, sender=ToDoListItem)
+def index_todo_list_item(sender, instance, using, **kwargs):
+    search.index_items([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=ToDoList)
+def unindex_todo_list(sender, instance, using, **kwargs):
+    search.unindex_lists([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=ToDoListItem)
+def unindex_todo_list_item(sender, instance, using, **kwargs):
+    search.unindex_items([instance.pk], using=using)
+
+
+@receiver(post_save, sender=ToDoListItem)
+def publish_todo_list_item_saved(sender, instance, created, using, **kwargs):
+    publish_list_event(instance.todo_list_id, {
+        "type": "created" if created else "updated",
+        "item": serialize_todo_list_item(instance),
+    }, using)
+
+
+@receiver(post_delete, sender=ToDoListItem)
+def publish_todo_list_item_deleted(sender, instance, using, **kwargs):
+    publish_list_event(instance.todo_list_id, {"type": "deleted", "item": {"id": instance.pk}}, using)
@@ -1,8 +1,32 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import ToDoList, ToDoListItem
+from .admin import ToDoListAdmin
+from .archive import restore_list
+from .cache import get_list_versions, peek_list_version
+from .deletion import purge_list
+from .events import get_broker, list_channel
+from .importers import ListImporter
+from .models import ArchivedToDoList, ToDoList, ToDoListItem, UserProfile
+from .pagination import EstimatedCountPaginator
+from .search import search_lists
 
 
 def create_todo_list(name, is_private, user_profile=None):
@@ -28,6 +52,24 @@ def create_todo_list_item(name, completed, todo_list):
     return ToDoListItem.objects.create(name=name, completed=completed, todo_list=todo_list)
 
 
+class MaxQueriesMixin(object):
+    """
+    Mixin for TestCase limiting number of database queries run by a view.
+    """
+
+    def assertMaxQueries(self, num, url):
+        """
+        Get url with test client and assert that at most num queries were run.
+        Returns the response.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        queries = "\n".join(query["sql"] for query in context.captured_queries)
+        self.assertLessEqual(len(context), num, "%d queries executed, at most %d expected:\n%s" % (
+            len(context), num, queries))
+        return response
+
+
 class IndexViewTests(TestCase):
     """
     Collection of tests for PublicToDoListListView class.
@@ -51,8 +93,35 @@ class IndexViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Test todo list")
 
+    @override_settings(SUPERLISTS_PAGE_SIZE=2)
+    def test_pagination_next_and_previous(self):
+        """
+        Main page should be split into pages walked with next/previous cursors.
+        """
+        todo_lists = [create_todo_list("List %d" % i, False) for i in range(5)]
+        response = self.client.get(reverse("index"))
+        self.assertEqual(list(response.context["todo_lists"]), todo_lists[:2:-1])
+        self.assertFalse(response.context["page_obj"].has_previous())
+        next_cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("index"), {"cursor": next_cursor})
+        self.assertEqual(list(response.context["todo_lists"]), todo_lists[2:0:-1])
+        previous_cursor = response.context["page_obj"].previous_cursor
+        next_cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("index"), {"cursor": next_cursor})
+        self.assertEqual(list(response.context["todo_lists"]), todo_lists[:1])
+        self.assertFalse(response.context["page_obj"].has_next())
+        response = self.client.get(reverse("index"), {"cursor": previous_cursor})
+        self.assertEqual(list(response.context["todo_lists"]), todo_lists[:2:-1])
+
+    def test_pagination_invalid_cursor(self):
+        """
+        Malformed cursor should result in 404.
+        """
+        response = self.client.get(reverse("index"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
 
-class DetailViewTests(TestCase):
+class DetailViewTests(MaxQueriesMixin, TestCase):
     """
     Collection of tests for ToDoListDetailView class.
     """
@@ -79,6 +148,106 @@ class DetailViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Test todo list item")
 
+    def test_nonexistent_todo_list(self):
+        """
+        Nonexistent ToDo List should result in 404.
+        """
+        response = self.client.get(reverse("list", args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_number_of_queries_does_not_depend_on_items(self):
+        """
+        Detailed view should fetch the list and its tasks with two queries.
+        """
+        todo_list = create_todo_list("Test todo list", False)
+        for i in range(10):
+            create_todo_list_item("Test todo list item %d" % i, False, todo_list)
+        response = self.assertMaxQueries(2, reverse("list", args=(todo_list.id,)))
+        self.assertContains(response, "Test todo list item 9")
+
+
+class ListFragmentCacheTests(MaxQueriesMixin, TestCase):
+    """
+    Collection of tests for cached items block of ToDoListDetailView.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+        self.url = reverse("list", args=(self.todo_list.id,))
+
+    def test_cached_items_fetch_only_list(self):
+        """
+        Second view of unchanged list should not query its tasks.
+        """
+        create_todo_list_item("Test todo list item", False, self.todo_list)
+        self.client.get(self.url)
+        response = self.assertMaxQueries(1, self.url)
+        self.assertContains(response, "Test todo list item")
+
+    def test_item_created_by_view_is_displayed(self):
+        """
+        Task added through the view should be displayed right away.
+        """
+        self.client.get(self.url)
+        self.client.post(reverse("create_item", args=(self.todo_list.id,)), {"name": "New task"})
+        self.assertContains(self.client.get(self.url), "New task")
+
+    def test_item_saved_outside_views_is_displayed(self):
+        """
+        Task saved directly, e.g. from admin, should invalidate cached items.
+        """
+        task = create_todo_list_item("Test todo list item", False, self.todo_list)
+        self.client.get(self.url)
+        task.name = "Renamed task"
+        task.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Renamed task")
+        self.assertNotContains(response, "Test todo list item")
+
+
+class ListConditionalGetTests(TestCase):
+    """
+    Collection of tests for Last-Modified and ETag of ToDoListDetailView.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+        self.url = reverse("list", args=(self.todo_list.id,))
+
+    def revalidate(self, response):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"],
+                               HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+
+    def test_current_copy_is_not_modified(self):
+        """
+        Revalidating unchanged page should answer 304 after a single query.
+        """
+        # The first visit sets the CSRF cookie, which is part of the ETag
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertIn("no-cache", response["Cache-Control"])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(response).status_code, 304)
+
+    def test_changed_list_is_sent_again(self):
+        """
+        Page of a list changed since, even within a second, should be rendered.
+        """
+        response = self.client.get(self.url)
+        create_todo_list_item("New task", False, self.todo_list)
+        revalidated = self.revalidate(response)
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertContains(revalidated, "New task")
+
+    def test_copy_of_another_user_is_sent_again(self):
+        """
+        Page rendered for an anonymous user should not be reused after log in.
+        """
+        response = self.client.get(self.url)
+        User.objects.create_user("alice", "alice@test.test", "secret123")
+        self.client.login(username="alice", password="secret123")
+        self.assertEqual(self.revalidate(response).status_code, 200)
+
 
 class DeleteToDoListViewTest(TestCase):
     """
@@ -106,6 +275,49 @@ class DeleteToDoListViewTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
 
+    def test_deleted_list_is_hidden(self):
+        """
+        Deleted list should disappear from every view while its tasks wait to be purged.
+        """
+        todo_list = create_todo_list("Groceries", False)
+        item = create_todo_list_item("Milk", False, todo_list)
+        self.client.post(reverse("delete_list", args=(todo_list.id,)))
+        self.assertTrue(ToDoListItem.objects.filter(todo_list=todo_list).exists())
+        self.assertEqual(self.client.get(reverse("list", args=(todo_list.id,))).status_code, 404)
+        self.assertNotContains(self.client.get(reverse("index")), "Groceries")
+        self.assertEqual(len(search_lists("milk")), 0)
+        url = reverse("item", args=(todo_list.id, item.id))
+        self.assertEqual(self.client.post(url, {"completed": "true"}).status_code, 404)
+        url = reverse("create_item", args=(todo_list.id,))
+        self.assertEqual(self.client.post(url, {"name": "Bread"}).status_code, 404)
+
+    def test_purge_lists(self):
+        """
+        purge_lists command should delete deleted lists with their tasks only.
+        """
+        todo_list = create_todo_list("Groceries", False)
+        other_list = create_todo_list("Chores", False)
+        for number in range(5):
+            create_todo_list_item("Task %d" % number, False, todo_list)
+        create_todo_list_item("Dust", False, other_list)
+        self.client.post(reverse("delete_list", args=(todo_list.id,)))
+        out = StringIO()
+        call_command("purge_lists", batch_size=2, stdout=out)
+        self.assertIn("Purged 1 lists with 5 tasks.", out.getvalue())
+        self.assertFalse(ToDoList.all_objects.filter(pk=todo_list.pk).exists())
+        self.assertEqual(list(ToDoListItem.objects.values_list("name", flat=True)), ["Dust"])
+        self.assertEqual(len(search_lists("task")), 0)
+        self.assertEqual(len(search_lists("dust")), 1)
+
+    def test_purge_live_list(self):
+        """
+        purge_list should leave tasks of a list which is not deleted alone.
+        """
+        todo_list = create_todo_list("Groceries", False)
+        create_todo_list_item("Milk", False, todo_list)
+        self.assertEqual(purge_list(todo_list.id), 0)
+        self.assertTrue(ToDoListItem.objects.filter(todo_list=todo_list).exists())
+
 
 class DeleteToDoListItemViewTest(TestCase):
     """
@@ -148,3 +360,811 @@ class DeleteToDoListItemViewTest(TestCase):
         url = reverse("delete_item", args=(todo_list.id, 0))
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
+
+
+class ToDoListItemViewsTest(TestCase):
+    """
+    Collection of tests for ToDoListItemsView and ToDoListItemView classes.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+        self.task = create_todo_list_item("Test task", False, self.todo_list)
+        self.url = reverse("item", args=(self.todo_list.id, self.task.id))
+
+    def test_create_returns_fragment(self):
+        """
+        Created task should be answered with its <li>, without a redirect.
+        """
+        response = self.client.post(reverse("items", args=(self.todo_list.id,)), {"name": "New task"})
+        self.assertEqual(response.status_code, 201)
+        task = ToDoListItem.objects.get(name="New task")
+        self.assertTrue(response.content.decode().startswith('<li class="list-group-item" data-item-id="%d"' % task.id))
+
+    def test_create_invalid_name(self):
+        """
+        Task with an invalid name should not be created.
+        """
+        response = self.client.post(reverse("items", args=(self.todo_list.id,)), {"name": ""})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ToDoListItem.objects.count(), 1)
+
+    def test_toggle_and_rename(self):
+        """
+        Task should be toggled and renamed, JSON returned when accepted.
+        """
+        response = self.client.post(self.url, {"completed": "true"})
+        self.assertContains(response, "list-group-item-success")
+        response = self.client.post(self.url, {"name": "Renamed"}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.json(), {"id": self.task.id, "name": "Renamed", "completed": True})
+        self.assertEqual(self.client.post(self.url, {"completed": "maybe"}).status_code, 400)
+
+    def test_delete(self):
+        """
+        Task should be deleted with DELETE, but only through its own list.
+        """
+        other_list = create_todo_list("Other todo list", False)
+        self.assertEqual(self.client.delete(reverse("item", args=(other_list.id, self.task.id))).status_code, 404)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertFalse(ToDoListItem.objects.exists())
+
+
+class ToDoListItemBatchViewTest(TestCase):
+    """
+    Collection of tests for ToDoListItemBatchView class.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+        self.url = reverse("batch_items", args=(self.todo_list.id,))
+
+    def post(self, operations):
+        return self.client.post(self.url, json.dumps(operations), content_type="application/json")
+
+    def test_batch_of_operations(self):
+        """
+        All operations should be applied and resulting tasks returned.
+        """
+        renamed = create_todo_list_item("Renamed", False, self.todo_list)
+        completed = create_todo_list_item("Completed", False, self.todo_list)
+        deleted = create_todo_list_item("Deleted", False, self.todo_list)
+        with self.assertNumQueries(14):
+            response = self.post([
+                {"op": "create", "name": "New 1"},
+                {"op": "create", "name": "New 2", "completed": True},
+                {"op": "update", "id": renamed.id, "name": "Bread"},
+                {"op": "update", "id": completed.id, "completed": True},
+                {"op": "delete", "id": deleted.id},
+            ])
+        self.assertEqual(response.status_code, 200)
+        items = [(item["name"], item["completed"]) for item in response.json()["items"]]
+        self.assertEqual(items, [("Bread", False), ("Completed", True), ("New 1", False), ("New 2", True)])
+        self.assertFalse(ToDoListItem.objects.filter(id=deleted.id).exists())
+
+    def test_invalid_operation_applies_nothing(self):
+        """
+        Batch with an invalid operation should be rejected as a whole.
+        """
+        response = self.post([{"op": "create", "name": "New"}, {"op": "create", "name": "x" * 201}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Operation 1", response.json()["errors"][0])
+        self.assertFalse(ToDoListItem.objects.exists())
+
+    def test_update_without_changes(self):
+        """
+        Update changing neither name nor completion should be rejected.
+        """
+        task = create_todo_list_item("Task", False, self.todo_list)
+        response = self.post([{"op": "update", "id": task.id}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Operation 0", response.json()["errors"][0])
+
+    def test_csrf_token_from_get(self):
+        """
+        Clients enforcing CSRF checks should get a token from GET and post with it.
+        """
+        client = Client(enforce_csrf_checks=True)
+        operations = json.dumps([{"op": "create", "name": "New"}])
+        self.assertEqual(client.post(self.url, operations, content_type="application/json").status_code, 403)
+        response = client.get(self.url)
+        self.assertEqual(response.json(), {"items": []})
+        token = response.cookies[settings.CSRF_COOKIE_NAME].value
+        response = client.post(self.url, operations, content_type="application/json", HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["name"] for item in response.json()["items"]], ["New"])
+
+    def test_task_of_other_list(self):
+        """
+        Operations may only refer to tasks of the list from URL.
+        """
+        other_list = create_todo_list("Other todo list", False)
+        task = create_todo_list_item("Other task", False, other_list)
+        response = self.post([{"op": "create", "name": "New"}, {"op": "delete", "id": task.id}])
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(ToDoListItem.objects.filter(id=task.id).exists())
+        self.assertFalse(ToDoListItem.objects.filter(todo_list=self.todo_list).exists())
+
+
+class ToDoListApiViewTest(MaxQueriesMixin, TestCase):
+    """
+    Collection of tests for ToDoListApiView class.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+        create_todo_list_item("Test todo list item", False, self.todo_list)
+        self.url = reverse("api_list", args=(self.todo_list.id,))
+
+    def test_missing_list_gets_no_version(self):
+        """
+        Probing a missing list should answer 404 without creating a cache version for it.
+        """
+        response = self.client.get(reverse("api_list", args=(999999,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(peek_list_version(999999))
+
+    def test_todo_list_with_items(self):
+        """
+        Response should contain the list and its tasks.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Test todo list")
+        self.assertEqual(response.json()["items"][0]["name"], "Test todo list item")
+
+    def test_not_modified(self):
+        """
+        Request with current ETag should get 304 without touching the database.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_etag_changes_with_items(self):
+        """
+        Adding a task should change the ETag of the list.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        create_todo_list_item("Another item", False, self.todo_list)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class ToDoListCollectionApiViewTest(TestCase):
+    """
+    Collection of tests for PublicToDoListsApiView and UserToDoListsApiView classes.
+    """
+
+    def test_public_lists(self):
+        """
+        Only public lists should be returned, renaming one should change the ETag.
+        """
+        todo_list = create_todo_list("Public list", False)
+        create_todo_list("Private list", True)
+        url = reverse("api_lists")
+        response = self.client.get(url)
+        self.assertEqual([data["name"] for data in response.json()["lists"]], ["Public list"])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        todo_list.name = "Renamed list"
+        todo_list.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+    def test_user_lists(self):
+        """
+        Logged in user should get their own lists only.
+        """
+        user = User.objects.create_user("test_user", "test_user@test.test", "test123")
+        create_todo_list("User list", True, UserProfile.objects.create(user=user))
+        create_todo_list("Public list", False)
+        url = reverse("api_user_lists")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.login(username="test_user", password="test123")
+        response = self.client.get(url)
+        self.assertEqual([data["name"] for data in response.json()["lists"]], ["User list"])
+
+    def test_user_lists_without_profile(self):
+        """
+        Users without a profile, such as superusers, should be refused.
+        """
+        # A profile cached by an earlier test could belong to the same user id
+        cache.clear()
+        User.objects.create_superuser("admin", "admin@test.test", "admin123")
+        self.client.login(username="admin", password="admin123")
+        self.assertEqual(self.client.get(reverse("api_user_lists")).status_code, 403)
+
+
+class ExportTest(TestCase):
+    """
+    Collection of tests for ToDoListExportView class and export_lists command.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user("test_user", "test_user@test.test", "test123")
+        self.todo_list = create_todo_list("User list", True, UserProfile.objects.create(user=user))
+        create_todo_list_item("First, item", False, self.todo_list)
+        create_todo_list_item("Second item", True, self.todo_list)
+        create_todo_list("Empty public list", False)
+
+    def test_export_user_lists_csv(self):
+        """
+        CSV export should contain one row per task of the user's lists.
+        """
+        self.client.login(username="test_user", password="test123")
+        response = self.client.get(reverse("export"), {"format": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "list_id,list_name,list_creation_date,list_is_private,"
+                                   "item_id,item_name,item_completed")
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"First, item",False', lines[1])
+
+    def test_export_requires_login(self):
+        """
+        Exporting own lists without logging in should redirect to login page.
+        """
+        response = self.client.get(reverse("export"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_public_lists_command(self):
+        """
+        Command should export public lists, including ones without tasks.
+        """
+        out = StringIO()
+        call_command("export_lists", format="ndjson", stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["list_name"], "Empty public list")
+        self.assertIsNone(rows[0]["item_id"])
+
+
+class ImportTest(TestCase):
+    """
+    Collection of tests for ToDoListImportView class and import_lists command.
+    """
+
+    def test_export_import_round_trip(self):
+        """
+        Imported export should recreate lists with the same tasks and dates.
+        """
+        todo_list = create_todo_list("Exported list", False)
+        create_todo_list_item("First item", False, todo_list)
+        create_todo_list_item("Second item", True, todo_list)
+        create_todo_list("Empty list", False)
+        out = StringIO()
+        call_command("export_lists", format="csv", stdout=out)
+        ToDoList.objects.all().delete()
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as exported:
+            exported.write(out.getvalue())
+            exported.flush()
+            out = StringIO()
+            call_command("import_lists", exported.name, batch_size=1, stdout=out)
+        self.assertIn("Imported 2 lists and 2 items", out.getvalue())
+        imported = ToDoList.objects.get(name="Exported list")
+        self.assertEqual(imported.creation_date, todo_list.creation_date)
+        self.assertEqual(sorted(imported.todolistitem_set.values_list("name", "completed")),
+                         [("First item", False), ("Second item", True)])
+        self.assertEqual((imported.item_count, imported.completed_item_count), (2, 1))
+        self.assertFalse(ToDoList.objects.get(name="Empty list").todolistitem_set.exists())
+
+    def test_upload_skips_invalid_rows(self):
+        """
+        Rows violating ToDoListItemForm constraints should be reported and skipped.
+        """
+        user = User.objects.create_user("test_user", "test_user@test.test", "test123")
+        user_profile = UserProfile.objects.create(user=user)
+        self.client.login(username="test_user", password="test123")
+        rows = [
+            {"list_id": 1, "list_name": "Imported", "item_name": "Valid item"},
+            {"list_id": 1, "list_name": "Imported", "item_name": "x" * 201},
+        ]
+        upload = SimpleUploadedFile("lists.ndjson", "\n".join(json.dumps(row) for row in rows).encode())
+        response = self.client.post(reverse("import"), {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["items"], 1)
+        self.assertEqual(response.json()["skipped"], 1)
+        self.assertIn("Row 2", response.json()["errors"][0])
+        self.assertEqual(ToDoList.objects.get().user_profile, user_profile)
+
+    def test_lists_without_items_are_flushed_in_batches(self):
+        """
+        Lists without items should be inserted once a batch of lists is full.
+        """
+        importer = ListImporter(batch_size=2)
+        pending = []
+
+        def rows():
+            for number in range(5):
+                pending.append(len(importer.pending_lists))
+                yield {"list_id": number, "list_name": "List %d" % number}
+
+        importer.run(rows())
+        self.assertLessEqual(max(pending), 1)
+        self.assertEqual(importer.result.lists, 5)
+        self.assertEqual(ToDoList.objects.count(), 5)
+
+    def test_malformed_csv_reports_committed_rows(self):
+        """
+        Malformed CSV should answer 400 with the number of already committed lists.
+        """
+        user = User.objects.create_user("test_user", "test_user@test.test", "test123")
+        UserProfile.objects.create(user=user)
+        self.client.login(username="test_user", password="test123")
+        # Fields over the csv module's limit are rejected by every version
+        content = "list_id,list_name\n1,First\n2,%s\n" % ("x" * (csv.field_size_limit() + 1))
+        upload = SimpleUploadedFile("lists.csv", content.encode())
+        with self.settings(SUPERLISTS_IMPORT_BATCH_SIZE=1):
+            response = self.client.post(reverse("import"), {"file": upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["lists"], 1)
+
+    def test_upload_without_profile(self):
+        """
+        Users without a profile, such as superusers, should be refused.
+        """
+        # A profile cached by an earlier test could belong to the same user id
+        cache.clear()
+        User.objects.create_superuser("admin", "admin@test.test", "admin123")
+        self.client.login(username="admin", password="admin123")
+        upload = SimpleUploadedFile("lists.ndjson", b'{"list_id": 1, "list_name": "Imported"}')
+        response = self.client.post(reverse("import"), {"file": upload})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ToDoList.objects.exists())
+
+
+class ListCountersTest(TestCase):
+    """
+    Collection of tests for task counters of ToDoList.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+
+    def assertCounters(self, item_count, completed_item_count):
+        self.todo_list.refresh_from_db()
+        self.assertEqual((self.todo_list.item_count, self.todo_list.completed_item_count),
+                         (item_count, completed_item_count))
+
+    def test_single_task_changes(self):
+        """
+        Creating, completing and deleting a task should update counters of its list.
+        """
+        last_modified = self.todo_list.last_modified
+        item = create_todo_list_item("Task", False, self.todo_list)
+        create_todo_list_item("Done", True, self.todo_list)
+        self.assertCounters(2, 1)
+        self.assertGreater(self.todo_list.last_modified, last_modified)
+        item = ToDoListItem.objects.get(id=item.id)
+        item.completed = True
+        item.save()
+        self.assertCounters(2, 2)
+        item.delete()
+        self.assertCounters(1, 1)
+        self.client.post(reverse("create_item", args=(self.todo_list.id,)), {"name": "From view"})
+        self.assertCounters(2, 1)
+
+    def test_batch_operations(self):
+        """
+        Batch operations should update counters by the number of changed tasks.
+        """
+        done = create_todo_list_item("Done", True, self.todo_list)
+        not_done = create_todo_list_item("Not done", False, self.todo_list)
+        response = self.client.post(reverse("batch_items", args=(self.todo_list.id,)), json.dumps([
+            {"op": "create", "name": "New", "completed": True},
+            {"op": "update", "id": not_done.id, "completed": True},
+            {"op": "update", "id": done.id, "completed": True},
+            {"op": "delete", "id": done.id},
+        ]), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(2, 2)
+
+    def test_recount_lists(self):
+        """
+        recount_lists command should repair drifted counters only.
+        """
+        create_todo_list_item("Done", True, self.todo_list)
+        create_todo_list("Empty list", False)
+        ToDoList.objects.filter(id=self.todo_list.id).update(item_count=5, completed_item_count=0)
+        last_modified = ToDoList.objects.get(id=self.todo_list.id).last_modified
+        out = StringIO()
+        call_command("recount_lists", batch_size=1, stdout=out)
+        self.assertIn("Checked 2 lists, repaired 1.", out.getvalue())
+        self.assertCounters(1, 1)
+        self.assertGreater(ToDoList.objects.get(id=self.todo_list.id).last_modified, last_modified)
+
+
+class ListEventsTest(TestCase):
+    """
+    Collection of tests for ToDoListEventsView class.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+        self.url = reverse("list_events", args=(self.todo_list.id,))
+
+    def test_published_event_is_streamed(self):
+        """
+        Message published on the list channel should be sent as an event.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b"retry:"))
+        get_broker().publish(list_channel(self.todo_list.id), {"type": "deleted", "item": {"id": 1}})
+        self.assertEqual(next(stream), b'event: deleted\ndata: {"type": "deleted", "item": {"id": 1}}\n\n')
+        response.close()
+        self.assertFalse(get_broker().subscriptions)
+
+    @override_settings(SUPERLISTS_EVENTS_MAX_STREAMS=1)
+    def test_too_many_streams(self):
+        """
+        Streams over SUPERLISTS_EVENTS_MAX_STREAMS should be refused.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 503)
+        response.close()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_created_item_is_rendered_by_stream(self):
+        """
+        Stream should add HTML of created items, which publishers leave out.
+        """
+        response = self.client.get(self.url)
+        stream = iter(response.streaming_content)
+        next(stream)
+        message = {"type": "created", "item": {"id": 7, "name": "Milk", "completed": False}}
+        get_broker().publish(list_channel(self.todo_list.id), message)
+        data = json.loads(next(stream).decode().split("data: ", 1)[1])
+        self.assertEqual(data["item"], message["item"])
+        self.assertIn('data-item-id="7"', data["html"])
+        response.close()
+
+    @override_settings(SUPERLISTS_EVENTS_MAX_STREAMS=1)
+    def test_failed_subscribe_frees_stream(self):
+        """
+        Stream failing to subscribe should not keep its slot.
+        """
+        with patch.object(get_broker(), "subscribe", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+
+class ListEventsPublishTest(TransactionTestCase):
+    """
+    Collection of tests for events published on item changes, after commit.
+    """
+
+    def setUp(self):
+        self.todo_list = create_todo_list("Test todo list", False)
+        self.subscription = get_broker().subscribe(list_channel(self.todo_list.id))
+
+    def tearDown(self):
+        self.subscription.close()
+
+    def test_item_changes(self):
+        """
+        Created and deleted items should be published.
+        """
+        self.client.post(reverse("create_item", args=(self.todo_list.id,)), {"name": "New task"})
+        message = self.subscription.get(timeout=0)
+        self.assertEqual(message["type"], "created")
+        self.assertEqual(message["item"]["name"], "New task")
+        item = ToDoListItem.objects.get()
+        item_id = item.id
+        item.delete()
+        self.assertEqual(self.subscription.get(timeout=0), {"type": "deleted", "item": {"id": item_id}})
+
+    def test_batch_operations_reset(self):
+        """
+        Batch operations should publish a single reset.
+        """
+        self.client.post(reverse("batch_items", args=(self.todo_list.id,)),
+                         json.dumps([{"op": "create", "name": "New"}]), content_type="application/json")
+        self.assertEqual(self.subscription.get(timeout=0), {"type": "reset"})
+        self.assertIsNone(self.subscription.get(timeout=0))
+
+    def test_lists_without_viewers_are_not_published(self):
+        """
+        Changes of lists nobody watches should not reach the broker.
+        """
+        other_list = create_todo_list("Unwatched list", False)
+        with patch.object(get_broker(), "publish") as publish:
+            create_todo_list_item("New task", False, other_list)
+        publish.assert_not_called()
+
+
+class SearchViewTest(TestCase):
+    """
+    Collection of tests for ToDoListSearchView class.
+    """
+
+    def search(self, query, **params):
+        params["q"] = query
+        response = self.client.get(reverse("search"), params)
+        self.assertEqual(response.status_code, 200)
+        return [todo_list.name for todo_list in response.context["page_obj"]]
+
+    def test_search_list_and_item_names(self):
+        """
+        Lists should be found by their name or names of their tasks,
+        with list name matches ranked first.
+        """
+        by_item = create_todo_list("Groceries", False)
+        create_todo_list_item("Buy milk", False, by_item)
+        create_todo_list("Milk", False)
+        create_todo_list("Unrelated", False)
+        self.assertEqual(self.search("milk"), ["Milk", "Groceries"])
+        self.assertEqual(self.search("buying"), ["Groceries"])
+        self.assertEqual(self.search("milk bread"), [])
+
+    def test_search_index_follows_changes(self):
+        """
+        Renamed, deleted and batch created tasks should be searchable right away.
+        """
+        todo_list = create_todo_list("Groceries", False)
+        item = create_todo_list_item("Buy milk", False, todo_list)
+        item.name = "Buy bread"
+        item.save()
+        self.assertEqual(self.search("milk"), [])
+        self.assertEqual(self.search("bread"), ["Groceries"])
+        item.delete()
+        self.assertEqual(self.search("bread"), [])
+        self.client.post(reverse("batch_items", args=(todo_list.id,)), json.dumps([{"op": "create", "name": "Eggs"}]),
+                         content_type="application/json")
+        self.assertEqual(self.search("eggs"), ["Groceries"])
+
+    def test_private_lists(self):
+        """
+        Private lists should only be found by their owner.
+        """
+        user = User.objects.create_user("test_user", "test_user@test.test", "test123")
+        create_todo_list("Private milk", True, UserProfile.objects.create(user=user))
+        create_todo_list("Public milk", False)
+        self.assertEqual(self.search("milk"), ["Public milk"])
+        self.client.login(username="test_user", password="test123")
+        self.assertEqual(sorted(self.search("milk")), ["Private milk", "Public milk"])
+
+    @override_settings(SUPERLISTS_PAGE_SIZE=2)
+    def test_pagination(self):
+        """
+        Results should be split into pages of SUPERLISTS_PAGE_SIZE lists.
+        """
+        for number in range(3):
+            create_todo_list("Milk %d" % number, False)
+        first_page = self.search("milk")
+        self.assertEqual(len(first_page), 2)
+        self.assertEqual(len(self.search("milk", page=2)), 1)
+        self.assertNotIn(self.search("milk", page=2)[0], first_page)
+        self.assertEqual(self.client.get(reverse("search"), {"q": "milk", "page": "x"}).status_code, 404)
+
+    def test_superuser_without_profile(self):
+        """
+        Users without a profile should search public lists only.
+        """
+        User.objects.create_superuser("admin", "admin@test.test", "test123")
+        create_todo_list("Public milk", False)
+        self.client.login(username="admin", password="test123")
+        self.assertEqual(self.search("milk"), ["Public milk"])
+
+    def test_list_deleted_after_ranking(self):
+        """
+        Lists gone between ranking and fetching should be left out.
+        """
+        gone = create_todo_list("Milk", False)
+        create_todo_list("Milk and bread", False)
+        in_bulk = QuerySet.in_bulk
+
+        def delete_then_fetch(queryset, id_list):
+            ToDoList.objects.filter(id=gone.id).update(deleted_at=timezone.now())
+            return in_bulk(queryset, id_list)
+
+        with patch.object(QuerySet, "in_bulk", autospec=True, side_effect=delete_then_fetch):
+            self.assertEqual(self.search("milk"), ["Milk and bread"])
+
+
+class ExplainQueriesCommandTest(TestCase):
+    """
+    Collection of tests for explain_queries management command.
+    """
+
+    def test_hot_queries_use_indexes(self):
+        """
+        None of the hot view queries should fall back to a sequential scan.
+        """
+        out = StringIO()
+        call_command("explain_queries", fail_on_seq_scan=True, stdout=out)
+        self.assertIn("todolist_public_feed_idx", out.getvalue())
+
+
+class AdminTest(TestCase):
+    """
+    Collection of tests for ToDoList and ToDoListItem admins.
+    """
+
+    def setUp(self):
+        User.objects.create_superuser("admin", "admin@test.test", "admin123")
+        self.client.login(username="admin", password="admin123")
+        self.todo_list = create_todo_list("Groceries", False)
+        self.other_list = create_todo_list("Chores", True)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context)
+
+    def run_action(self, model, action, objects):
+        url = reverse("admin:superlists_%s_changelist" % model)
+        return self.client.post(url, {"action": action, "_selected_action": [obj.pk for obj in objects]})
+
+    def test_item_changelist_queries_do_not_grow(self):
+        """
+        Rendering lists of tasks should not run a query per row.
+        """
+        url = reverse("admin:superlists_todolistitem_changelist")
+        create_todo_list_item("Milk", False, self.todo_list)
+        queries = self.changelist_queries(url)
+        for number in range(10):
+            create_todo_list_item("Task %d" % number, False, self.other_list)
+        self.assertEqual(self.changelist_queries(url), queries)
+
+    def test_list_changelist_with_date_hierarchy(self):
+        """
+        Lists should be listed and filtered by privacy and creation date.
+        """
+        url = reverse("admin:superlists_todolist_changelist")
+        response = self.client.get(url, {"is_private__exact": "1", "creation_date__year": timezone.now().year})
+        self.assertContains(response, "Chores")
+        self.assertNotContains(response, "Groceries")
+
+    def test_mark_completed_updates_counters(self):
+        """
+        Marking tasks of many lists completed should keep counters of every list right.
+        """
+        items = [create_todo_list_item("Milk", False, self.todo_list),
+                 create_todo_list_item("Dust", False, self.other_list)]
+        self.run_action("todolistitem", "mark_completed", items)
+        self.assertEqual(ToDoListItem.objects.filter(completed=True).count(), 2)
+        for todo_list in ToDoList.objects.all():
+            self.assertEqual((todo_list.item_count, todo_list.completed_item_count), (1, 1))
+
+    def test_delete_items_updates_counters(self):
+        """
+        Deleted tasks should leave the counters and search.
+        """
+        item = create_todo_list_item("Milk", True, self.todo_list)
+        create_todo_list_item("Bread", False, self.todo_list)
+        self.run_action("todolistitem", "delete_items", [item])
+        self.todo_list.refresh_from_db()
+        self.assertEqual((self.todo_list.item_count, self.todo_list.completed_item_count), (1, 0))
+        self.assertEqual(len(search_lists("milk")), 0)
+
+    def test_delete_lists_with_items(self):
+        """
+        Deleting lists should mark them deleted and leave their tasks to
+        purge_lists, without the default action or delete view.
+        """
+        create_todo_list_item("Milk", False, self.todo_list)
+        response = self.client.get(reverse("admin:superlists_todolist_changelist"))
+        self.assertNotContains(response, 'value="delete_selected"')
+        delete_url = reverse("admin:superlists_todolist_delete", args=(self.todo_list.pk,))
+        self.assertEqual(self.client.post(delete_url, {"post": "yes"}).status_code, 403)
+        self.run_action("todolist", "delete_lists", [self.todo_list])
+        self.assertFalse(ToDoList.objects.filter(pk=self.todo_list.pk).exists())
+        self.assertTrue(ToDoListItem.objects.exists())
+        self.assertEqual(len(search_lists("milk")), 0)
+        self.assertEqual(len(search_lists("groceries")), 0)
+        call_command("purge_lists", stdout=StringIO())
+        self.assertFalse(ToDoListItem.objects.exists())
+
+    def test_make_private(self):
+        """
+        Lists should be made private with a single update and get new versions.
+        """
+        versions = get_list_versions([self.todo_list.pk, self.other_list.pk])
+        with CaptureQueriesContext(connection) as context:
+            ToDoListAdmin(ToDoList, admin.site).set_private(Mock(), ToDoList.objects.all(), True)
+        self.assertEqual(len([query for query in context.captured_queries if "UPDATE" in query["sql"]]), 1)
+        self.assertEqual(ToDoList.objects.filter(is_private=True).count(), 2)
+        new_versions = get_list_versions([self.todo_list.pk, self.other_list.pk])
+        for todo_list_id, version in versions.items():
+            self.assertNotEqual(new_versions[todo_list_id], version)
+
+    def test_estimated_count_is_exact_on_sqlite(self):
+        """
+        Paginator should count exactly where the database has no estimates.
+        """
+        paginator = EstimatedCountPaginator(ToDoList.objects.order_by("id"), 1)
+        self.assertEqual(paginator.count, 2)
+
+
+class ArchiveTest(TestCase):
+    """
+    Collection of tests for archive_lists command and restoring archived lists.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user("owner", "owner@test.test", "owner123")
+        self.user_profile = UserProfile.objects.create(user=user)
+        self.todo_list = create_todo_list("Groceries", False, self.user_profile)
+        self.items = [create_todo_list_item("Milk", True, self.todo_list),
+                      create_todo_list_item("Bread", False, self.todo_list)]
+        self.recent_list = create_todo_list("Chores", False)
+        last_modified = timezone.now() - timedelta(days=settings.SUPERLISTS_ARCHIVE_AFTER_DAYS + 1)
+        ToDoList.objects.filter(pk=self.todo_list.pk).update(last_modified=last_modified)
+        out = StringIO()
+        call_command("archive_lists", batch_size=1, stdout=out)
+        self.assertIn("Archived 1 lists.", out.getvalue())
+
+    def test_archive_moves_cold_lists(self):
+        """
+        Lists not modified for the retention period should leave the hot tables and search.
+        """
+        self.assertEqual(list(ToDoList.objects.all()), [self.recent_list])
+        self.assertFalse(ToDoListItem.objects.exists())
+        self.assertEqual(ArchivedToDoList.objects.get().name, "Groceries")
+        self.assertNotContains(self.client.get(reverse("index")), "Groceries")
+        self.assertEqual(len(search_lists("milk")), 0)
+
+    def test_visit_restores_list(self):
+        """
+        Visiting an archived list should restore it with its tasks, ids and counters.
+        """
+        response = self.client.get(reverse("list", args=(self.todo_list.id,)))
+        self.assertContains(response, "Bread")
+        self.assertFalse(ArchivedToDoList.objects.exists())
+        todo_list = ToDoList.objects.get(pk=self.todo_list.pk)
+        self.assertEqual(todo_list.creation_date, self.todo_list.creation_date)
+        self.assertEqual(todo_list.user_profile, self.user_profile)
+        self.assertEqual((todo_list.item_count, todo_list.completed_item_count), (2, 1))
+        self.assertEqual(set(ToDoListItem.objects.values_list("id", flat=True)), {item.id for item in self.items})
+        self.assertEqual(len(search_lists("milk")), 1)
+
+    def test_missing_list_does_not_lock_archive(self):
+        """
+        Visiting a list that is neither live nor archived should not open a restore.
+        """
+        with patch("superlists.archive.restore_list") as restore_list:
+            response = self.client.get(reverse("list", args=(self.todo_list.id + 100,)))
+        self.assertEqual(response.status_code, 404)
+        restore_list.assert_not_called()
+
+    def test_list_restored_elsewhere_is_read_from_primary(self):
+        """
+        List restored by an earlier request should be found even if this restore finds nothing.
+        """
+        with patch("superlists.archive.restore_list", return_value=False):
+            restore_list(self.todo_list.id)
+            response = self.client.get(reverse("list", args=(self.todo_list.id,)))
+        self.assertContains(response, "Bread")
+
+    def test_api_restores_list(self):
+        """
+        API detail of an archived list should restore it.
+        """
+        response = self.client.get(reverse("api_list", args=(self.todo_list.id,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(item["name"] for item in response.json()["items"]), ["Bread", "Milk"])
+
+    def test_archived_lists_are_exported(self):
+        """
+        Export should include archived lists with their tasks.
+        """
+        self.client.login(username="owner", password="owner123")
+        response = self.client.get(reverse("export"), {"format": "ndjson"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["item_name"] for row in rows], ["Milk", "Bread"])
+        self.assertFalse(ToDoList.objects.filter(pk=self.todo_list.pk).exists())
+
+    def test_user_page_lists_archived_lists(self):
+        """
+        User page should link archived lists of the user.
+        """
+        self.client.login(username="owner", password="owner123")
+        response = self.client.get(reverse("user"))
+        self.assertContains(response, reverse("list", args=(self.todo_list.id,)))
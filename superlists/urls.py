@@ -1,16 +1,30 @@
 from django.conf.urls import url
 
-from . import views
+from . import api, views
 
 
 urlpatterns = [
     url(r'^$', views.IndexMixin.as_view(), name='index'),
     url(r'^create/$', views.ToDoListCreateView.as_view(), name='create_list'),
+    url(r'^search/$', views.ToDoListSearchView.as_view(), name='search'),
+    url(r'^export/$', views.ToDoListExportView.as_view(), name='export'),
+    url(r'^import/$', views.ToDoListImportView.as_view(), name='import'),
     url(r'^(?P<pk>[0-9]+)/delete/$', views.ToDoListDeleteView.as_view(), name='delete_list'),
     url(r'^(?P<todo_list_id>[0-9]+)/$',
         views.ToDoListDetailView.as_view(), name='list'),
+    url(r'^(?P<todo_list_id>[0-9]+)/events/$',
+        views.ToDoListEventsView.as_view(), name='list_events'),
     url(r'^(?P<todo_list_id>[0-9]+)/create_item/$',
         views.ToDoListItemCreateView.as_view(), name='create_item'),
     url(r'^(?P<todo_list_id>[0-9]+)/delete_item/(?P<todo_list_item_id>[0-9]+)/$',
         views.ToDoListItemDeleteView.as_view(), name='delete_item'),
+    url(r'^(?P<todo_list_id>[0-9]+)/items/$',
+        views.ToDoListItemsView.as_view(), name='items'),
+    url(r'^(?P<todo_list_id>[0-9]+)/items/(?P<todo_list_item_id>[0-9]+)/$',
+        views.ToDoListItemView.as_view(), name='item'),
+    url(r'^(?P<todo_list_id>[0-9]+)/items/batch/$',
+        views.ToDoListItemBatchView.as_view(), name='batch_items'),
+    url(r'^api/lists/$', api.PublicToDoListsApiView.as_view(), name='api_lists'),
+    url(r'^api/lists/(?P<todo_list_id>[0-9]+)/$', api.ToDoListApiView.as_view(), name='api_list'),
+    url(r'^api/user/lists/$', api.UserToDoListsApiView.as_view(), name='api_user_lists'),
 ]
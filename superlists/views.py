@@ -1,9 +1,37 @@
-from django.http import HttpResponseRedirect, Http404
+import csv
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, prefetch_related_objects
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.views.generic import CreateView, ListView, TemplateView, FormView, DeleteView
+from django.utils.decorators import method_decorator
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition
+from django.views.generic import CreateView, ListView, TemplateView, FormView, DeleteView, View
 
+from accounts.middleware import get_user_profile_or_none
+from .api import serialize_todo_list_item
+from .archive import get_or_restore
+from .cache import get_list_fragment, get_list_version, set_list_fragment
+from .deletion import delete_lists
+from .events import EventStream
+from .export import EXPORT_FORMATS, archived_export_queryset, export_queryset, export_rows
 from .forms import ToDoListItemForm
-from .models import ToDoList, ToDoListItem, UserProfile
+from .importers import IMPORT_FORMATS, ListImporter, text_stream
+from .models import ToDoList, ToDoListItem
+from .operations import ItemOperations
+from .pagination import CursorPaginator
+from .search import search_lists
 
 
 class ToDoListCreateView(CreateView):
@@ -15,15 +43,27 @@ class ToDoListCreateView(CreateView):
 
     def form_valid(self, form):
         if self.request.user.is_authenticated():
-            user = self.request.user
-            form.instance.user_profile = UserProfile.objects.get(user=user)
+            form.instance.user_profile_id = self.request.user.user_profile.id
         return super(ToDoListCreateView, self).form_valid(form)
 
 
 class PublicToDoListListView(ListView):
+    """
+    Lists public :model:`superlists.ToDoList`\s, newest first.
+    Paginated with an opaque keyset cursor passed in the ``cursor`` GET parameter.
+    """
     queryset = ToDoList.objects.all().filter(is_private__exact=False)
     fields = "__all__"
     context_object_name = "todo_lists"
+    cursor_kwarg = "cursor"
+
+    def get_paginate_by(self, queryset):
+        return settings.SUPERLISTS_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
 
 
 class IndexMixin(ToDoListCreateView, PublicToDoListListView):
@@ -33,37 +73,149 @@ class IndexMixin(ToDoListCreateView, PublicToDoListListView):
     template_name = "superlists/index.html"
 
 
+class ToDoListSearchView(TemplateView):
+    """
+    Searches :model:`superlists.ToDoList`\s by their name and names of their
+    items. Public lists are searched, together with private lists of the
+    logged in user.
+
+    **Context**
+
+    ``query``
+        searched text, the ``q`` GET parameter
+
+    ``page_obj``
+        :class:`superlists.search.SearchPage`, selected by the ``page`` GET parameter
+    """
+    template_name = "superlists/search.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "")
+        try:
+            page = int(self.request.GET.get("page", 1))
+        except ValueError:
+            raise Http404("Invalid page")
+        if page < 1:
+            raise Http404("Invalid page")
+        context["query"] = query
+        user_profile = get_user_profile_or_none(self.request.user)
+        context["page_obj"] = search_lists(query, user_profile, page, settings.SUPERLISTS_PAGE_SIZE)
+        return context
+
+
+def get_page_todo_list(request, todo_list_id):
+    """
+    Returns :model:`superlists.ToDoList` displayed by the list page, or
+    None if it does not exist. Fetched once per request, both for the
+    conditional GET validators and the view. Archived lists are restored.
+    """
+    if not hasattr(request, "page_todo_list"):
+        try:
+            request.page_todo_list = get_or_restore(ToDoList.objects.only("id", "name", "last_modified"), todo_list_id)
+        except ToDoList.DoesNotExist:
+            request.page_todo_list = None
+        if getattr(request.page_todo_list, "restored", False):
+            # A dozen writes, once per archived list
+            request.performance_budget = "restore_list"
+    return request.page_todo_list
+
+
+def get_list_last_modified(request, todo_list_id):
+    """
+    Returns time of the last change of :model:`superlists.ToDoList`, or
+    None when its page has to be rendered anyway.
+    """
+    todo_list = get_page_todo_list(request, todo_list_id)
+    # Pending messages are only shown, and consumed, by a rendered page
+    if todo_list is None or len(messages.get_messages(request)):
+        return None
+    return todo_list.last_modified
+
+
+def get_list_etag(request, todo_list_id):
+    """
+    Returns ETag of the page of :model:`superlists.ToDoList`. Unlike
+    Last-Modified it tells apart changes within a second, and pages of
+    other users or with another CSRF token.
+    """
+    last_modified = get_list_last_modified(request, todo_list_id)
+    if last_modified is None:
+        return None
+    key = "%s:%s:%s" % (last_modified.isoformat(), request.user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+@method_decorator(cache_control(private=True, no_cache=True), name="get")
+@method_decorator(condition(etag_func=get_list_etag, last_modified_func=get_list_last_modified), name="get")
 class ToDoListDetailView(TemplateView):
     """
     Displays details of :model:`superlists.ToDoList`.
+    Rendered block of items is cached per list version, on a cache hit
+    only the list itself is fetched. Browsers revalidate their copy on
+    every visit and get 304 after a single query when it is current.
 
     **Context**
 
     ``todo_list``
         :model:`superlists.ToDoList`
 
-    ``to_do_list_items``
-        :model:`superlists.ToDoListItem`\s associated with this ToDoList
+    ``todo_list_items``
+        rendered ``superlists/list_items.html`` block
     """
     template_name = "superlists/list.html"
+    items_template_name = "superlists/list_items.html"
+
+    def get_todo_list(self):
+        todo_list = get_page_todo_list(self.request, self.kwargs["todo_list_id"])
+        if todo_list is None:
+            raise Http404("List does not exist")
+        return todo_list
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         todo_list_id = self.kwargs["todo_list_id"]
-        todo_list = ToDoList.objects.get(id=todo_list_id)
+        # Version has to be read before the items, a write in between
+        # bumps it and the fragment stored below is never used. Fragments
+        # are also keyed on last_modified of the list as read from the
+        # same database as the items, so replicas may fill the cache too.
+        version = get_list_version(todo_list_id)
+        todo_list = self.get_todo_list()
+        fragment = get_list_fragment(todo_list_id, version, todo_list.last_modified)
+        if fragment is None:
+            items = ToDoListItem.objects.only("id", "name", "completed", "todo_list_id")
+            prefetch_related_objects([todo_list], Prefetch("todolistitem_set", queryset=items))
+            fragment = render_to_string(self.items_template_name, {"todo_list": todo_list})
+            set_list_fragment(todo_list_id, version, todo_list.last_modified, fragment)
         context["todo_list"] = todo_list
-        context["to_do_list_items"] = ToDoListItem.objects.all().filter(
-            todo_list=todo_list.pk)
+        context["todo_list_items"] = mark_safe(fragment)
         context["form"] = ToDoListItemForm()
         return context
 
 
+class ToDoListEventsView(View):
+    """
+    Streams changes of items of :model:`superlists.ToDoList` as
+    server-sent events, see :mod:`superlists.events`.
+    """
+
+    def get(self, request, todo_list_id):
+        get_object_or_404(ToDoList.objects.only("id"), id=todo_list_id)
+        stream = EventStream.open(todo_list_id)
+        if stream is None:
+            return HttpResponse("Too many open streams", status=503, content_type="text/plain")
+        response = StreamingHttpResponse(stream, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Keeps proxies like nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class ToDoListItemCreateView(FormView):
     form_class = ToDoListItemForm
 
     def form_valid(self, form):
-        form.instance.todo_list = ToDoList.objects.get(
-            id=self.kwargs["todo_list_id"])
+        form.instance.todo_list = get_object_or_404(ToDoList.objects.only("id"), id=self.kwargs["todo_list_id"])
         form.save()
         result = super(ToDoListItemCreateView, self).form_valid(form)
         return result
@@ -89,9 +241,174 @@ class ToDoListItemDeleteView(TemplateView):
         return HttpResponseRedirect(reverse("list", kwargs={"todo_list_id": todo_list_id}))
 
 
+class ToDoListItemFragmentMixin(object):
+    """
+    Answers with the changed :model:`superlists.ToDoListItem` rendered as
+    ``<li>`` of the list page, or as JSON if the client accepts it.
+    """
+    item_template_name = "superlists/list_item.html"
+
+    def render_item(self, todo_list_item, status=200):
+        if "application/json" in self.request.META.get("HTTP_ACCEPT", ""):
+            return JsonResponse(serialize_todo_list_item(todo_list_item), status=status)
+        html = render_to_string(self.item_template_name, {"todo_list_item": todo_list_item})
+        return HttpResponse(html, status=status)
+
+
+class ToDoListItemsView(ToDoListItemFragmentMixin, View):
+    """
+    Creates :model:`superlists.ToDoListItem` from POSTed ``name`` without
+    redirecting, answers 201 with the new item.
+    """
+
+    def post(self, request, todo_list_id):
+        todo_list = get_object_or_404(ToDoList.objects.only("id"), id=todo_list_id)
+        form = ToDoListItemForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors["name"]}, status=400)
+        form.instance.todo_list = todo_list
+        return self.render_item(form.save(), status=201)
+
+
+class ToDoListItemView(ToDoListItemFragmentMixin, View):
+    """
+    Renames or toggles :model:`superlists.ToDoListItem` with POSTed ``name``
+    and ``completed`` (``true`` or ``false``), or deletes it with DELETE.
+    """
+
+    def get_item(self):
+        return get_object_or_404(ToDoListItem, id=self.kwargs["todo_list_item_id"],
+                                 todo_list_id=self.kwargs["todo_list_id"], todo_list__deleted_at__isnull=True)
+
+    def post(self, request, todo_list_id, todo_list_item_id):
+        todo_list_item = self.get_item()
+        if "name" in request.POST:
+            form = ToDoListItemForm(request.POST, instance=todo_list_item)
+            if not form.is_valid():
+                return JsonResponse({"errors": form.errors["name"]}, status=400)
+        if "completed" in request.POST:
+            completed = request.POST["completed"]
+            if completed not in ("true", "false"):
+                return JsonResponse({"errors": ["completed must be true or false"]}, status=400)
+            todo_list_item.completed = completed == "true"
+        todo_list_item.save()
+        return self.render_item(todo_list_item)
+
+    def delete(self, request, todo_list_id, todo_list_item_id):
+        self.get_item().delete()
+        return HttpResponse(status=204)
+
+
+@method_decorator(ensure_csrf_cookie, name="get")
+class ToDoListItemBatchView(View):
+    """
+    Applies a JSON array of item operations (see :class:`ItemOperations`)
+    to :model:`superlists.ToDoList` and returns all of its items as JSON.
+
+    POSTs are CSRF protected like every other form. Clients other than
+    the list page, like importers and mobile apps, GET the same URL
+    first: it answers with the items and sets the ``csrftoken`` cookie,
+    which is sent back with the POST together with its value in the
+    ``X-CSRFToken`` header.
+    """
+
+    def get(self, request, todo_list_id):
+        todo_list = get_object_or_404(ToDoList.objects.only("id"), id=todo_list_id)
+        return self.render_items(todo_list)
+
+    def post(self, request, todo_list_id):
+        todo_list = get_object_or_404(ToDoList.objects.only("id"), id=todo_list_id)
+        try:
+            data = json.loads(request.body.decode("utf-8"))
+        except ValueError:
+            return JsonResponse({"errors": ["Invalid JSON"]}, status=400)
+        try:
+            ItemOperations(data).apply(todo_list)
+        except ValidationError as error:
+            return JsonResponse({"errors": error.messages}, status=400)
+        return self.render_items(todo_list)
+
+    def render_items(self, todo_list):
+        items = ToDoListItem.objects.filter(todo_list=todo_list).order_by("id")
+        return JsonResponse({"items": list(items.values("id", "name", "completed"))})
+
+
 class ToDoListDeleteView(DeleteView):
+    """
+    Deletes :model:`superlists.ToDoList`. The list is only marked deleted
+    and disappears at once, its items are purged later by ``purge_lists``
+    command instead of being deleted one by one here.
+    """
     template_name="superlists/delete_list.html"
     model = ToDoList
 
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        delete_lists([self.object.pk])
+        return HttpResponseRedirect(self.get_success_url())
+
     def get_success_url(self):
         return reverse("index")
+
+
+class ToDoListExportView(View):
+    """
+    Streams :model:`superlists.ToDoList`\s with their items as CSV or NDJSON.
+    Exports lists of the logged in user, or all public lists with ``scope=public``.
+    """
+
+    def get(self, request):
+        export_format = request.GET.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest("Unknown export format")
+        if request.GET.get("scope") == "public":
+            user = None
+        elif request.user.is_authenticated():
+            user = request.user
+        else:
+            return redirect_to_login(request.get_full_path())
+        stream, content_type = EXPORT_FORMATS[export_format]
+        rows = export_rows(export_queryset(user), archived_export_queryset(user))
+        response = StreamingHttpResponse(stream(rows), content_type=content_type)
+        response["Content-Disposition"] = 'attachment; filename="superlists.%s"' % export_format
+        return response
+
+
+class ToDoListImportView(View):
+    """
+    Imports uploaded CSV or NDJSON file in export format as
+    :model:`superlists.ToDoList`\s of the logged in user.
+    The file is read as a stream and inserted in batches. When the file
+    turns out to be malformed, batches before the error stay committed
+    and are counted in the 400 response.
+    """
+
+    @method_decorator(login_required)
+    def dispatch(self, *args, **kwargs):
+        return super(ToDoListImportView, self).dispatch(*args, **kwargs)
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return JsonResponse({"errors": ["No file uploaded"]}, status=400)
+        export_format = request.POST.get("format") or upload.name.rsplit(".", 1)[-1]
+        if export_format not in IMPORT_FORMATS:
+            return JsonResponse({"errors": ["Unknown import format"]}, status=400)
+        user_profile = get_user_profile_or_none(request.user)
+        if user_profile is None:
+            return JsonResponse({"errors": ["Only users with a profile can import lists"]}, status=403)
+        importer = ListImporter(user_profile)
+        try:
+            result = importer.run(IMPORT_FORMATS[export_format](text_stream(upload)))
+        except (ValueError, csv.Error):
+            return JsonResponse({
+                "errors": ["File is not valid %s" % export_format],
+                "lists": importer.result.lists,
+                "items": importer.result.items,
+            }, status=400)
+        return JsonResponse({
+            "lists": result.lists,
+            "items": result.items,
+            "skipped": result.skipped,
+            "errors": result.errors,
+        })